@@ -0,0 +1,70 @@
+from sqlalchemy import select, or_
+
+import rollups
+from models import Entry, Sentiment
+
+# Per-user analytics shared by the insight endpoints. Windowed statistics
+# come from the daily rollups as aggregate queries (no per-entry rows reach
+# Python); the prediction history is one joined query.
+PREDICTION_HISTORY_SIZE = 14
+TOP_TRIGGERS = 3
+
+
+def stability(variance):
+    return "High" if variance < 1 else "Moderate" if variance < 4 else "Low"
+
+
+def insights(db, user_id, days=7, top_triggers=TOP_TRIGGERS):
+    """
+    Returns count, mean and variance of intensity, the most frequent emotion
+    and the leading triggers over the window, or None without data.
+    """
+    count, mean, variance = rollups.mood_summary(db, user_id, days)
+    if not count:
+        return None
+    emotions = rollups.emotion_counts(db, user_id, days)
+    triggers = rollups.trigger_counts(db, user_id, days)
+    return {
+        "count": count,
+        "mean": mean,
+        "variance": variance,
+        "top_emotion": emotions.most_common(1)[0][0] if emotions else "Neutral",
+        "top_triggers": [name for name, _ in triggers.most_common(top_triggers)]
+    }
+
+
+def trigger_frequency(db, user_id, days=7, limit=10):
+    """[(trigger, count)] over the window, most frequent first."""
+    return rollups.trigger_counts(db, user_id, days).most_common(limit)
+
+
+def prediction_history(db, user_id, limit=PREDICTION_HISTORY_SIZE):
+    """
+    [(created_at, emotion, intensity)] for the user's first `limit` analysed
+    entries, oldest first: entries and their sentiments in a single query.
+    """
+    return db.execute(
+        select(Entry.created_at, Sentiment.primary_emotion, Sentiment.intensity_score)
+        .join(Sentiment, Entry.id == Sentiment.entry_id)
+        .where(Entry.user_id == user_id)
+        .order_by(Entry.created_at.asc(), Entry.id.asc())
+        .limit(limit)
+    ).all()
+
+
+def prediction_rows(db, user_id, recent, entry_ids=()):
+    """
+    [(created_at, emotion, intensity)] for the user's latest `recent` analysed
+    entries plus the entries in `entry_ids`, oldest first, in a single query.
+    """
+    latest = select(Entry.id)\
+        .join(Sentiment, Entry.id == Sentiment.entry_id)\
+        .where(Entry.user_id == user_id)\
+        .order_by(Entry.created_at.desc(), Entry.id.desc())\
+        .limit(recent)
+    return db.execute(
+        select(Entry.created_at, Sentiment.primary_emotion, Sentiment.intensity_score)
+        .join(Sentiment, Entry.id == Sentiment.entry_id)
+        .where(Entry.user_id == user_id, or_(Entry.id.in_(latest), Entry.id.in_(list(entry_ids))))
+        .order_by(Entry.created_at.asc(), Entry.id.asc())
+    ).all()
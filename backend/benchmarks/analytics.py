@@ -0,0 +1,204 @@
+"""
+Insight analytics benchmark and parity check.
+
+Seeds a throwaway SQLite database with --entries entries for each of
+--users users, then for every user computes the insights, the trigger
+distribution and the mood-prediction history twice: with the per-request
+code the endpoints used to run (full ORM rows, max(set(...)) for the top
+emotion, one sentiment query per prediction entry) and with analytics.py.
+Reports time and SQL statements for both and checks that they agree; the
+script exits with status 1 on any mismatch.
+
+The old endpoints looked back exactly 168 hours; the rollups cover whole
+days from midnight seven days ago. The two only differ on entries from that
+first, partial day, so the seed leaves it empty and the untouched original
+query is compared against the new code.
+
+Run from backend/:  python -m benchmarks.analytics --entries 10000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+import analytics
+import rollups
+from models import Base, User, Entry, Sentiment, SentimentTrigger
+
+EMOTIONS = ["Anxious", "Calm", "Sad", "Hopeful", "Frustrated", "Content", "Overwhelmed"]
+TRIGGERS = ["Work", "Family", "Sleep", "Health", "Money", "Friends", "Exercise", "School"]
+
+
+def partial_day(now):
+    """[midnight, cutoff): the part of the first day the rollup window has and the 168-hour window does not."""
+    cutoff = now - timedelta(days=7)
+    return datetime.combine(rollups.window_start(7), datetime.min.time()), cutoff
+
+
+def seed(db, users, entries, days, seed_value, skip_partial_day=True):
+    """Seeds the entries; with skip_partial_day, none fall in (a minute past) partial_day(), so both windows agree."""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    gap_start, gap_end = partial_day(now)
+    gap_end += timedelta(minutes=1)  # The legacy cutoff moves on while the benchmark runs
+    db.execute(insert(User), [{"id": u, "username": f"user{u}", "hashed_password": "x"} for u in range(1, users + 1)])
+    next_id = 1
+    for user_id in range(1, users + 1):
+        # Whole-millisecond offsets keep timestamps unique, so entry order is unambiguous
+        created = [now - timedelta(milliseconds=rng.randrange(days * 86400 * 1000)) for _ in range(entries)]
+        if skip_partial_day:
+            created = [at for at in created if not gap_start <= at < gap_end]
+        ids = range(next_id, next_id + len(created))
+        next_id += len(created)
+        db.execute(insert(Entry), [
+            {"id": i, "user_id": user_id, "content": "entry", "ai_response": "reply", "created_at": at}
+            for i, at in zip(ids, created)
+        ])
+        sentiments = [
+            {"id": i, "entry_id": i, "primary_emotion": rng.choice(EMOTIONS), "intensity_score": rng.randint(1, 10),
+             "triggers": ", ".join(rng.sample(TRIGGERS, rng.randint(1, 3)))}
+            for i in ids
+        ]
+        db.execute(insert(Sentiment), sentiments)
+        db.execute(insert(SentimentTrigger), [
+            {"sentiment_id": s["id"], "name": name} for s in sentiments for name in rollups.split_triggers(s["triggers"])
+        ])
+    db.commit()
+    rollups.backfill(db)
+
+
+def legacy_insights(db, user_id):
+    """The original /insights and /trigger-distribution computation, over exactly the last 168 hours."""
+    seven_days_ago = datetime.utcnow() - timedelta(days=7)
+    entries = db.query(Sentiment, Entry)\
+        .join(Entry, Sentiment.entry_id == Entry.id)\
+        .filter(Entry.user_id == user_id)\
+        .filter(Entry.created_at >= seven_days_ago)\
+        .all()
+    if not entries:
+        return None
+    emotions = [e[0].primary_emotion for e in entries]
+    intensities = [e[0].intensity_score for e in entries]
+    avg_intensity = sum(intensities) / len(intensities)
+    return {
+        "count": len(entries),
+        "mean": avg_intensity,
+        "variance": sum((x - avg_intensity) ** 2 for x in intensities) / len(intensities),
+        "top_emotion": max(set(emotions), key=emotions.count),
+        "emotions": Counter(emotions),
+        "triggers": Counter(t for e in entries for t in rollups.split_triggers(e[0].triggers))
+    }
+
+
+def legacy_prediction_history(db, user_id):
+    entries = db.query(Entry)\
+        .join(Sentiment, Entry.id == Sentiment.entry_id)\
+        .filter(Entry.user_id == user_id)\
+        .order_by(Entry.created_at.asc())\
+        .limit(14)\
+        .all()
+    history = []
+    for e in entries:
+        s = db.query(Sentiment).filter(Sentiment.entry_id == e.id).first()
+        history.append(f"Date: {e.created_at.date()}, Emotion: {s.primary_emotion}, Intensity: {s.intensity_score}")
+    return history
+
+
+def new_insights(db, user_id):
+    return analytics.insights(db, user_id), dict(analytics.trigger_frequency(db, user_id, limit=None))
+
+
+def new_prediction_history(db, user_id):
+    return [
+        f"Date: {created_at.date()}, Emotion: {emotion}, Intensity: {intensity}"
+        for created_at, emotion, intensity in analytics.prediction_history(db, user_id)
+    ]
+
+
+def mismatches(legacy, new, legacy_history, history):
+    summary, triggers = new
+    problems = []
+    if (legacy is None) != (summary is None):
+        return ["one side has no data"]
+    if legacy is not None:
+        if legacy["count"] != summary["count"]:
+            problems.append(f"count {legacy['count']} != {summary['count']}")
+        if abs(legacy["mean"] - summary["mean"]) > 1e-9:
+            problems.append(f"mean {legacy['mean']} != {summary['mean']}")
+        if abs(legacy["variance"] - summary["variance"]) > 1e-6:
+            problems.append(f"variance {legacy['variance']} != {summary['variance']}")
+        # Ties may be broken differently; the chosen emotion just has to be a most frequent one
+        if legacy["emotions"][summary["top_emotion"]] != legacy["emotions"][legacy["top_emotion"]]:
+            problems.append(f"top emotion {legacy['top_emotion']} != {summary['top_emotion']}")
+        if legacy["triggers"] != Counter(triggers):
+            problems.append("trigger counts differ")
+    if legacy_history != history:
+        problems.append("prediction history differs")
+    return problems
+
+
+def measure(engine, fn):
+    """Returns (result, ms, SQL statements)."""
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    event.remove(engine, "before_cursor_execute", count)
+    return result, elapsed, statements[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000, help="Entries per user.")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        seed(db, args.users, args.entries, args.days, args.seed)
+        db.close()
+        print(f"seeded {args.entries} entries for each of {args.users} users over {args.days} days\n")
+
+        timings = {label: ([], []) for label in ("insights", "prediction")}
+        failures = 0
+        for user_id in range(1, args.users + 1):
+            db = Session()
+            legacy, legacy_ms, legacy_sql = measure(engine, lambda: legacy_insights(db, user_id))
+            new, new_ms, new_sql = measure(engine, lambda: new_insights(db, user_id))
+            timings["insights"][0].append((legacy_ms, legacy_sql))
+            timings["insights"][1].append((new_ms, new_sql))
+            legacy_history, legacy_ms, legacy_sql = measure(engine, lambda: legacy_prediction_history(db, user_id))
+            history, new_ms, new_sql = measure(engine, lambda: new_prediction_history(db, user_id))
+            timings["prediction"][0].append((legacy_ms, legacy_sql))
+            timings["prediction"][1].append((new_ms, new_sql))
+            db.close()
+
+            problems = mismatches(legacy, new, legacy_history, history)
+            failures += bool(problems)
+            print(f"user {user_id}: parity {'ok' if not problems else 'MISMATCH: ' + '; '.join(problems)}")
+
+        print(f"\n{'computation':<12} {'legacy ms':>10} {'stmts':>6} {'analytics ms':>13} {'stmts':>6}")
+        for label, (legacy, new) in timings.items():
+            print(f"{label:<12} {statistics.median(ms for ms, _ in legacy):>10.2f} {legacy[0][1]:>6} "
+                  f"{statistics.median(ms for ms, _ in new):>13.2f} {new[0][1]:>6}")
+
+    if failures:
+        sys.exit(1)
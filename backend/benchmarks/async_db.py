@@ -0,0 +1,150 @@
+"""
+Concurrency benchmark: sync sessions inside async handlers vs. the async read path.
+
+Seeds a throwaway SQLite database, then for each mode runs --concurrency
+simulated requests in one event loop for --seconds. A request does what the
+dashboard reads do (history page, 7-day summary, recent entries) and then
+awaits --io-ms of other I/O, standing in for the LLM or a network call. A
+heartbeat task sleeps 5 ms in a loop and records how late it wakes up: that
+lag is what every other request on the worker (SSE streams included) sees.
+
+Modes:
+  sync-in-async  the previous handlers: sync Session calls on the event loop
+  async          database.get_async_db(): AsyncSession over aiosqlite
+
+Run from backend/:  python -m benchmarks.async_db --concurrency 50 --seconds 10
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import history
+import rollups
+from database import create_engines, create_async_read_engine
+from models import Base, User, Entry, Sentiment
+
+EMOTIONS = ["Anxious", "Calm", "Sad", "Hopeful", "Frustrated", "Content"]
+HEARTBEAT_MS = 5
+
+
+def seed(url, entries, users):
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(14)
+    now = datetime.utcnow()
+    db = sessionmaker(bind=engine)()
+    db.execute(insert(User), [{"id": u, "username": f"user{u}", "hashed_password": "x"} for u in range(1, users + 1)])
+    db.execute(insert(Entry), [
+        {"id": i, "user_id": rng.randint(1, users), "content": "entry text " * 30, "ai_response": "reply " * 40,
+         "created_at": now - timedelta(seconds=rng.uniform(0, 60 * 86400))}
+        for i in range(1, entries + 1)
+    ])
+    db.execute(insert(Sentiment), [
+        {"entry_id": i, "primary_emotion": rng.choice(EMOTIONS), "intensity_score": rng.randint(1, 10), "triggers": "Work"}
+        for i in range(1, entries + 1)
+    ])
+    db.commit()
+    rollups.backfill(db)
+    db.close()
+    engine.dispose()
+
+
+def recent_entries_query(user_id):
+    return select(Entry).filter(Entry.user_id == user_id).order_by(Entry.created_at.desc()).limit(5)
+
+
+def sync_request(Session, user_id):
+    db = Session()
+    try:
+        history.history_page(db, user_id, 20)
+        rollups.mood_summary(db, user_id)
+        db.execute(recent_entries_query(user_id)).scalars().all()
+    finally:
+        db.close()
+
+
+async def async_request(AsyncSession, user_id):
+    async with AsyncSession() as db:
+        await db.run_sync(history.history_page, user_id, 20)
+        await db.run_sync(rollups.mood_summary, user_id)
+        (await db.execute(recent_entries_query(user_id))).scalars().all()
+
+
+async def heartbeat(stop_at, lags):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_MS / 1000)
+        lags.append((time.perf_counter() - start) * 1000 - HEARTBEAT_MS)
+
+
+async def client(handle, users, io_ms, stop_at, seed_value, latencies):
+    rng = random.Random(seed_value)
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        await handle(rng.randint(1, users))
+        await asyncio.sleep(io_ms / 1000)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_mode(mode, url, args):
+    if mode == "sync-in-async":
+        _, read_engine = create_engines(url)
+        Session = sessionmaker(bind=read_engine)
+
+        async def handle(user_id):
+            sync_request(Session, user_id)
+    else:
+        read_engine = create_async_read_engine(url)
+        AsyncSession = async_sessionmaker(read_engine, expire_on_commit=False)
+
+        async def handle(user_id):
+            await async_request(AsyncSession, user_id)
+
+    await handle(1)  # Open a connection before timing starts
+    latencies, lags = [], []
+    stop_at = time.perf_counter() + args.seconds
+    await asyncio.gather(
+        heartbeat(stop_at, lags),
+        *(client(handle, args.users, args.io_ms, stop_at, i, latencies) for i in range(args.concurrency))
+    )
+    if mode == "sync-in-async":
+        read_engine.dispose()
+    else:
+        await read_engine.dispose()
+    return len(latencies) / args.seconds, latencies, lags
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else float("nan")
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--io-ms", type=float, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(url, args.entries, args.users)
+        print(f"seeded {args.entries} entries for {args.users} users; "
+              f"{args.concurrency} concurrent requests, {args.io_ms:.0f} ms of other I/O each, {args.seconds:.0f}s per mode\n")
+        print(f"{'mode':<14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'loop lag p50':>13} {'loop lag p99':>13}")
+        for mode in ("sync-in-async", "async"):
+            throughput, latencies, lags = asyncio.run(run_mode(mode, url, args))
+            print(f"{mode:<14} {throughput:>8.1f} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f} "
+                  f"{percentile(lags, 50):>13.1f} {percentile(lags, 99):>13.1f}")
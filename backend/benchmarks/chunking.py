@@ -0,0 +1,114 @@
+"""
+Offline chunking benchmark: retrieval quality and throughput.
+
+Compares the legacy 500-character slicer with the sentence-aware chunker on
+the knowledge_base/*.txt corpus:
+  - sentences kept intact (no chunk boundary through the middle)
+  - chunk count and token sizes
+  - hit@k for a fixed set of questions, using the real MiniLM embeddings in
+    an in-memory Chroma collection (skip with --no-retrieval)
+  - chunking throughput on the corpus repeated to --throughput-mb megabytes
+
+Run from backend/:  python -m benchmarks.chunking
+"""
+import os
+import time
+import glob
+import argparse
+import statistics
+
+from chunking import FixedSizeChunker, SentenceChunker, iter_sentences, iter_txt_segments, get_token_counter
+
+KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", "knowledge_base")
+
+# (question, phrase the retrieved context must contain)
+QUERIES = [
+    ("Can therapy change the structure of the brain?", "structural changes in the brain"),
+    ("Does mindfulness lower stress hormones?", "reduce cortisol levels"),
+    ("How long should I meditate each day to help anxiety?", "10 minutes of daily mindfulness"),
+    ("How do childhood relationships affect adult emotions?", "early relationships with caregivers"),
+    ("Why does poor sleep make me more reactive?", "increased amygdala reactivity"),
+    ("What are the four skill areas of DBT?", "distress tolerance"),
+    ("Which brain regions manage the fear response?", "prefrontal cortex and the hippocampus"),
+    ("Can reframing my thoughts make me more resilient?", "cognitive reappraisal"),
+    ("Why do irregular daily routines trigger mood episodes?", "disruption in these social rhythms"),
+    ("Is exercise as good as antidepressants?", "as effective as some antidepressants"),
+    ("What does exercise do for neurons?", "Brain-Derived Neurotrophic Factor"),
+]
+
+
+def corpus_files():
+    return sorted(glob.glob(os.path.join(KNOWLEDGE_BASE_DIR, "*.txt")))
+
+
+def chunk_corpus(chunker):
+    return [(os.path.basename(path), chunk) for path in corpus_files() for chunk in chunker.chunks(iter_txt_segments(path))]
+
+
+def structure_report(chunks, count_tokens):
+    sentences = [s for path in corpus_files() for s, _ in iter_sentences(iter_txt_segments(path))]
+    intact = sum(1 for s in sentences if any(s in chunk for _, chunk in chunks))
+    sizes = [count_tokens(chunk) for _, chunk in chunks]
+    return (
+        f"{len(chunks)} chunks, tokens mean={statistics.mean(sizes):.0f} max={max(sizes)}, "
+        f"intact sentences {intact}/{len(sentences)}"
+    )
+
+
+def retrieval_report(name, chunks, k_values):
+    import chromadb
+    from retrieval_runtime import get_embedding_function
+
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"bench_{name}", embedding_function=get_embedding_function()
+    )
+    collection.add(
+        ids=[str(i) for i in range(len(chunks))],
+        documents=[chunk for _, chunk in chunks],
+        metadatas=[{"source": source} for source, _ in chunks]
+    )
+    results = collection.query(query_texts=[q for q, _ in QUERIES], n_results=max(k_values))
+    parts = []
+    for k in k_values:
+        hits = sum(
+            1 for (_, phrase), docs in zip(QUERIES, results["documents"])
+            if any(phrase in doc for doc in docs[:k])
+        )
+        parts.append(f"hit@{k}={hits}/{len(QUERIES)}")
+    return " ".join(parts)
+
+
+def throughput_report(chunker, megabytes):
+    text = "\n\n".join(open(path, encoding="utf-8").read() for path in corpus_files())
+    repeats = max(1, int(megabytes * 1024 * 1024 / len(text)))
+
+    def segments():
+        for _ in range(repeats):
+            yield text + "\n\n"
+
+    start = time.perf_counter()
+    count = sum(1 for _ in chunker.chunks(segments()))
+    elapsed = time.perf_counter() - start
+    return f"{len(text) * repeats / 1024 / 1024 / elapsed:6.2f} MB/s ({count} chunks in {elapsed:.2f}s)"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--overlap-tokens", type=int, default=24)
+    parser.add_argument("--throughput-mb", type=float, default=5.0)
+    parser.add_argument("--no-retrieval", action="store_true")
+    args = parser.parse_args()
+
+    count_tokens = get_token_counter()
+    chunkers = {
+        "fixed-500": FixedSizeChunker(),
+        f"sentence-{args.max_tokens}/{args.overlap_tokens}": SentenceChunker(args.max_tokens, args.overlap_tokens),
+    }
+    for name, chunker in chunkers.items():
+        chunks = chunk_corpus(chunker)
+        print(f"[{name}]")
+        print(f"  structure:  {structure_report(chunks, count_tokens)}")
+        if not args.no_retrieval:
+            print(f"  retrieval:  {retrieval_report(name.replace('/', '-'), chunks, (1, 3))}")
+        print(f"  throughput: {throughput_report(chunker, args.throughput_mb)}")
@@ -0,0 +1,145 @@
+"""
+Dashboard load benchmark: six per-card requests vs. /user/{id}/dashboard.
+
+Seeds a throwaway SQLite database with --entries entries for one user over
+--days days, with both background results already stored (so no model is
+called), and loads the dashboard --loads times through the ASGI app:
+  separate     mood-trend, mood-stats, insights, trigger-distribution,
+               suggested-prompts and mood-prediction, concurrently, as the
+               frontend used to
+  dashboard    one request to the consolidated endpoint
+  revalidated  the same request with If-None-Match from the previous one
+
+Reports wall time, SQL statements and pooled connection checkouts per load,
+and checks the dashboard matches the separate responses (exits 1 if not).
+
+Run from backend/:  python -m benchmarks.dashboard --entries 20000 --loads 200
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+EMOTIONS = ["Anxious", "Calm", "Sad", "Hopeful", "Frustrated", "Content", "Overwhelmed"]
+TRIGGERS = ["Work", "Family", "Sleep", "Health", "Money", "Friends", "Exercise", "School"]
+USER_ID = 1
+CARDS = {
+    "mood_trend": "mood-trend",
+    "mood_stats": "mood-stats",
+    "insights": "insights",
+    "trigger_distribution": "trigger-distribution",
+    "suggested_prompts": "suggested-prompts",
+    "mood_prediction": "mood-prediction",
+}
+
+
+def seed(entries, days, seed_value):
+    from sqlalchemy import insert
+
+    import main
+    import rollups
+    import insight_jobs
+    from database import SessionLocal
+    from models import Entry, Sentiment
+
+    main.init_db()
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    db.execute(insert(Entry), [
+        {"id": i, "user_id": USER_ID, "content": "entry text " * 30, "ai_response": "reply " * 40,
+         "created_at": now - timedelta(seconds=rng.uniform(0, days * 86400))}
+        for i in range(1, entries + 1)
+    ])
+    db.execute(insert(Sentiment), [
+        {"entry_id": i, "primary_emotion": rng.choice(EMOTIONS), "intensity_score": rng.randint(1, 10),
+         "triggers": ", ".join(rng.sample(TRIGGERS, rng.randint(1, 3)))}
+        for i in range(1, entries + 1)
+    ])
+    db.commit()
+    rollups.backfill(db)
+    insight_jobs.store_results(db, USER_ID, entries, {
+        insight_jobs.SUGGESTED_PROMPTS: [{"prompt": "What helped today?", "starter": "Today..."}],
+        insight_jobs.MOOD_PREDICTION: {"prediction": "Steady.", "advice": ["Sleep"], "status": "ready"},
+    })
+    db.close()
+
+
+async def measure(loads):
+    import httpx
+    from sqlalchemy import event
+
+    import main
+    from database import async_read_engine
+
+    engine = async_read_engine.sync_engine
+    counts = {"statements": 0, "checkouts": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*_):
+        counts["statements"] += 1
+
+    @event.listens_for(engine.pool, "checkout")
+    def count_checkout(*_):
+        counts["checkouts"] += 1
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def separate():
+            responses = await asyncio.gather(*(client.get(f"/user/{USER_ID}/{path}") for path in CARDS.values()))
+            return {card: response.json() for card, response in zip(CARDS, responses)}
+
+        async def dashboard():
+            return (await client.get(f"/user/{USER_ID}/dashboard")).json()
+
+        etag = (await client.get(f"/user/{USER_ID}/dashboard")).headers["etag"]
+
+        async def revalidated():
+            response = await client.get(f"/user/{USER_ID}/dashboard", headers={"If-None-Match": etag})
+            assert response.status_code == 304, response.status_code
+            return None
+
+        results = {}
+        for mode, load in (("separate", separate), ("dashboard", dashboard), ("revalidated", revalidated)):
+            body = await load()  # Warm up
+            if mode != "revalidated":
+                results[mode] = body
+            counts.update(statements=0, checkouts=0)
+            timings = []
+            for _ in range(loads):
+                started = time.perf_counter()
+                await load()
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{mode:<12} {statistics.mean(timings):>8.2f} {statistics.median(timings):>8.2f} "
+                  f"{counts['statements'] / loads:>11.1f} {counts['checkouts'] / loads:>10.1f}")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--loads", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=22)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    # The app's engines are created on import, so point them at the throwaway database first
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["TIMING_LOG"] = "false"
+    seed(args.entries, args.days, args.seed)
+
+    print(f"{args.entries} entries over {args.days} days, {args.loads} loads per mode\n")
+    print(f"{'mode':<12} {'mean ms':>8} {'p50 ms':>8} {'statements':>11} {'checkouts':>10}")
+    results = asyncio.run(measure(args.loads))
+
+    mismatched = [card for card in CARDS if results["dashboard"][card] != results["separate"][card]]
+    if mismatched:
+        print(f"\nParity check failed: dashboard differs from the separate endpoints in {', '.join(mismatched)}")
+        sys.exit(1)
+    print("\nDashboard matches the separate endpoints.")
@@ -0,0 +1,111 @@
+"""
+Embedding service benchmark: throughput and latency under concurrency.
+
+Loads the embedding model (--backend torch or onnx, --onnx-file for a
+quantized export, --threads intra-op threads) and, at each --concurrency
+level, has that many threads embed one query each, --requests in total:
+  unbatched  every query is its own forward pass (the previous behaviour)
+  batched    queries go through EmbeddingService, which merges concurrent
+             ones into shared forward passes (--wait-ms, --max-batch)
+
+Reports embeddings/sec and per-query p50/p99 latency for each, and the
+mean batch size the service formed. Also checks that batched vectors
+match one-at-a-time ones (exits 1 if they differ by more than 1e-4).
+
+Run from backend/:  python -m benchmarks.embeddings --concurrency 1 4 16 64 --requests 512
+                    python -m benchmarks.embeddings --backend onnx --onnx-file onnx/model_quint8_avx2.onnx
+"""
+import sys
+import time
+import random
+import argparse
+import statistics
+import threading
+
+import numpy as np
+
+import embedding_service
+from retrieval_runtime import EMBEDDING_MODEL_NAME
+from benchmarks.retrieval_eval import QUERIES, DISTRACTOR_WORDS
+
+
+def make_queries(count, seed):
+    """Query-length texts: the labelled questions plus random clinical-vocabulary ones."""
+    rng = random.Random(seed)
+    texts = [question for question, _ in QUERIES]
+    while len(texts) < count:
+        texts.append(" ".join(rng.choice(DISTRACTOR_WORDS) for _ in range(rng.randint(6, 40))))
+    return texts[:count]
+
+
+def run(embed, queries, concurrency):
+    """Embeds every query from `concurrency` threads; returns (latencies in ms, wall seconds)."""
+    latencies = []
+    lock = threading.Lock()
+    start_line = threading.Barrier(concurrency + 1)
+
+    def worker(share):
+        start_line.wait()
+        mine = []
+        for text in share:
+            started = time.perf_counter()
+            embed([text])
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(queries[i::concurrency],)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=embedding_service.EMBEDDING_BACKEND)
+    parser.add_argument("--onnx-file", default=embedding_service.EMBEDDING_ONNX_FILE)
+    parser.add_argument("--threads", type=int, default=embedding_service.EMBEDDING_THREADS)
+    parser.add_argument("--wait-ms", type=float, default=embedding_service.EMBEDDING_BATCH_WAIT_MS)
+    parser.add_argument("--max-batch", type=int, default=embedding_service.EMBEDDING_MAX_BATCH)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=20)
+    args = parser.parse_args()
+
+    model = embedding_service.load_model(args.model, args.backend, args.onnx_file, args.threads)
+    queries = make_queries(args.requests, args.seed)
+    unbatched = embedding_service.EmbeddingService(model, max_batch=args.max_batch)
+    unbatched.encode(["warm up"])
+
+    # Padding to the longest text in a batch must not change the vectors
+    single = np.stack([unbatched.encode([text])[0] for text in queries[:32]])
+    batched = unbatched.encode(queries[:32])
+    difference = float(np.abs(single - batched).max())
+    print(f"{args.model} ({args.backend}{', ' + args.onnx_file if args.onnx_file else ''}), dimension "
+          f"{unbatched.dimension}; batched vs single max abs difference {difference:.2e}\n")
+
+    print(f"{'concurrency':>11} {'mode':<10} {'emb/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    for concurrency in args.concurrency:
+        for mode in ("unbatched", "batched"):
+            if mode == "unbatched":
+                latencies, seconds = run(unbatched.encode, queries, concurrency)
+                mean_batch = 1.0
+            else:
+                service = embedding_service.EmbeddingService(model, args.wait_ms, args.max_batch)
+                latencies, seconds = run(service.embed, queries, concurrency)
+                mean_batch = service.stats()["mean_batch_size"]
+            print(f"{concurrency:>11} {mode:<10} {len(queries) / seconds:>8.0f} {percentile(latencies, 50):>8.1f} "
+                  f"{percentile(latencies, 99):>8.1f} {mean_batch:>11}")
+
+    if difference > 1e-4:
+        print(f"\nParity check failed: batched embeddings differ by {difference:.2e}")
+        sys.exit(1)
@@ -0,0 +1,92 @@
+"""
+Local fake LLM server for load tests: injects latency and 429s.
+
+Serves POST /generate {"prompt": str, "stream": bool} and replies like the
+offline stub model, after --latency seconds (+/- --jitter). Requests over
+--rpm in any 60 s window, and a random --error-rate fraction of the rest,
+get a 429 with a Retry-After header. Streaming replies are NDJSON lines of
+{"text": chunk}.
+
+Point the API at it with LLM_BACKEND=http LLM_HTTP_URL=http://127.0.0.1:8900.
+
+Run from backend/:  python -m benchmarks.fake_llm --port 8900 --latency 0.3 --rpm 120 --error-rate 0.05
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from llm_client import StubModel
+
+app = FastAPI(title="Fake LLM")
+settings = {"latency": 0.3, "jitter": 0.5, "rpm": 0, "error_rate": 0.0}
+accepted = deque()  # Arrival times of requests let through in the last minute
+counters = {"requests": 0, "rate_limited": 0}
+stub = StubModel()
+
+
+def rate_limited():
+    now = time.monotonic()
+    while accepted and accepted[0] <= now - 60:
+        accepted.popleft()
+    if settings["rpm"] and len(accepted) >= settings["rpm"]:
+        return 60 - (now - accepted[0])
+    if random.random() < settings["error_rate"]:
+        return 1.0
+    accepted.append(now)
+    return None
+
+
+@app.post("/generate")
+async def generate(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+    retry_after = rate_limited()
+    if retry_after is not None:
+        counters["rate_limited"] += 1
+        return JSONResponse(status_code=429, content={"error": "RESOURCE_EXHAUSTED"},
+                            headers={"Retry-After": f"{retry_after:.2f}"})
+
+    latency = settings["latency"] * random.uniform(1 - settings["jitter"], 1 + settings["jitter"])
+    text = stub._reply(body["prompt"])
+    usage = {"total_tokens": (len(body["prompt"]) + len(text)) // 4}
+    if not body.get("stream"):
+        await asyncio.sleep(latency)
+        return {"text": text, "usage": usage}
+
+    async def chunks():
+        words = text.split(" ")
+        pieces = [" ".join(words[i:i + 4]) + " " for i in range(0, len(words), 4)]
+        pieces[-1] = pieces[-1][:-1]
+        for piece in pieces:
+            await asyncio.sleep(latency / len(pieces))
+            yield json.dumps({"text": piece}) + "\n"
+
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+@app.get("/stats")
+async def stats():
+    return counters
+
+
+def run(port=8900, latency=0.3, jitter=0.5, rpm=0, error_rate=0.0):
+    settings.update(latency=latency, jitter=jitter, rpm=rpm, error_rate=error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency varies by +/- this fraction.")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s; 0 for no limit.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 429.")
+    args = parser.parse_args()
+    run(args.port, args.latency, args.jitter, args.rpm, args.error_rate)
@@ -0,0 +1,117 @@
+"""
+History endpoint benchmark: keyset pages and NDJSON export vs. loading everything.
+
+Seeds a throwaway SQLite database with --entries entries for one user and
+reports:
+  - the legacy load-all query (lazy sentiment per row): time, SQL statements
+    and peak Python memory
+  - the first and the last keyset page: time and statements
+  - the full NDJSON export: time and peak memory, which should stay at about
+    one batch regardless of --entries
+
+Run from backend/:  python -m benchmarks.history --entries 20000
+"""
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+import history
+from models import Base, User, Entry, Sentiment
+
+USER_ID = 1
+TEXT = "Today I noticed my thoughts racing before the meeting, and writing helped. " * 8
+
+
+def seed(db, entries):
+    start = datetime.utcnow() - timedelta(days=entries // 5)
+    db.add(User(id=USER_ID, username="bench", hashed_password="x"))
+    db.flush()
+    for offset in range(0, entries, 10000):
+        count = min(10000, entries - offset)
+        db.execute(insert(Entry), [
+            {"id": offset + i + 1, "user_id": USER_ID, "content": TEXT, "ai_response": TEXT,
+             "created_at": start + timedelta(hours=(offset + i) * 4.8)}
+            for i in range(count)
+        ])
+        db.execute(insert(Sentiment), [
+            {"entry_id": offset + i + 1, "primary_emotion": "Calm", "intensity_score": 5, "triggers": "Work"}
+            for i in range(count)
+        ])
+    db.commit()
+
+
+def legacy_history(db):
+    entries = db.query(Entry)\
+        .outerjoin(Sentiment, Entry.id == Sentiment.entry_id)\
+        .filter(Entry.user_id == USER_ID)\
+        .order_by(Entry.created_at.desc())\
+        .all()
+    return [history.serialize_entry(e, history.HISTORY_FIELDS) for e in entries]
+
+
+def measure(fn):
+    """
+    Returns (result, seconds, SQL statements, peak traced MB). Memory is
+    traced on a second run because tracemalloc slows everything down.
+    """
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    event.remove(engine, "before_cursor_execute", count)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, statements[0], peak
+
+
+def last_page_cursor(db, limit):
+    """Walks to the final page so the deep-page timing is measured from a real cursor."""
+    cursor, previous = None, None
+    while True:
+        page = history.history_page(db, USER_ID, limit, cursor, fields=("id", "created_at"))
+        if page["next_cursor"] is None:
+            return previous
+        previous, cursor = cursor, page["next_cursor"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        seed(db, args.entries)
+        print(f"seeded {args.entries} entries")
+
+        rows, seconds, statements, peak = measure(lambda: legacy_history(Session()))
+        print(f"legacy load-all:   {seconds * 1000:9.1f} ms  {statements:6} statements  peak {peak:7.1f} MB")
+
+        cursor = last_page_cursor(db, args.page_size)
+        for label, page_cursor in (("first page", None), ("last page", cursor)):
+            _, seconds, statements, peak = measure(
+                lambda: history.history_page(Session(), USER_ID, args.page_size, page_cursor))
+            print(f"keyset {label:<11} {seconds * 1000:9.1f} ms  {statements:6} statements  peak {peak:7.1f} MB")
+
+        _, seconds, statements, peak = measure(
+            lambda: sum(len(chunk) for chunk in history.iter_history_ndjson(Session, USER_ID)))
+        print(f"ndjson export:     {seconds * 1000:9.1f} ms  {statements:6} statements  peak {peak:7.1f} MB")
+        db.close()
@@ -0,0 +1,90 @@
+"""
+Ingest benchmark on a synthetic corpus.
+
+Generates a few thousand .txt documents in a temporary knowledge base and a
+throwaway Chroma store, then times:
+  - the initial full ingest
+  - a no-op re-run (nothing changed)
+  - an incremental run after editing and deleting a slice of the corpus
+and checks that the collection size never drifts (no duplicated chunks).
+
+Run from backend/:  python -m benchmarks.ingest --docs 3000
+"""
+import io
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+WORDS = (
+    "anxiety cognitive behavioral therapy sleep hygiene mindfulness rumination exposure "
+    "resilience depression serotonin neuroplasticity stress cortisol amygdala journaling "
+    "attention regulation avoidance relapse trial cohort placebo outcome clinician session"
+).split()
+
+
+def write_corpus(directory, docs, words_per_doc, seed):
+    rng = random.Random(seed)
+    for i in range(docs):
+        text = " ".join(rng.choice(WORDS) for _ in range(words_per_doc))
+        with open(os.path.join(directory, f"doc_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<22} {time.perf_counter() - start:8.2f}s  {result}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=3000)
+    parser.add_argument("--words-per-doc", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--churn", type=float, default=0.02, help="Fraction of docs edited, and deleted, before the incremental run.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ingest-bench-")
+    knowledge_dir = os.path.join(workdir, "knowledge_base")
+    os.makedirs(knowledge_dir)
+    # Must be set before retrieval_runtime is imported
+    os.environ["CHROMA_DB_DIR"] = os.path.join(workdir, "chroma_db")
+
+    import ingest_data
+    from retrieval_runtime import get_collection
+
+    try:
+        write_corpus(knowledge_dir, args.docs, args.words_per_doc, args.seed)
+        collection = get_collection()
+
+        def run():
+            # Per-file progress lines would drown the timings
+            with contextlib.redirect_stdout(io.StringIO()):
+                return ingest_data.ingest_knowledge(
+                    knowledge_dir, collection, batch_size=args.batch_size, workers=args.workers
+                )
+
+        timed("full ingest", run)
+        size = collection.count()
+        timed("no-op re-run", run)
+        assert collection.count() == size, "re-run duplicated chunks"
+
+        rng = random.Random(args.seed + 1)
+        churn = max(1, int(args.docs * args.churn))
+        victims = rng.sample(sorted(os.listdir(knowledge_dir)), churn * 2)
+        for name in victims[:churn]:
+            with open(os.path.join(knowledge_dir, name), "a", encoding="utf-8") as f:
+                f.write(" appended clinical note")
+        for name in victims[churn:]:
+            os.remove(os.path.join(knowledge_dir, name))
+        timed(f"incremental ({churn} edited, {churn} deleted)", run)
+        print(f"collection size: {size} -> {collection.count()} chunks")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
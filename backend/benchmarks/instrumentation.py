@@ -0,0 +1,95 @@
+"""
+Instrumentation overhead benchmark: what the timing spans, SQL statement
+hooks and request middleware cost per use.
+
+  span        `with span(...)` around an empty block, inside a request context
+  statement   a trivial SELECT on in-memory SQLite, with and without the hooks
+  request     a FastAPI endpoint with six spans, through the ASGI stack, with
+              and without TimingMiddleware (timing log to /dev/null)
+
+Run from backend/:  python -m benchmarks.instrumentation --requests 3000
+"""
+import os
+import time
+import asyncio
+import argparse
+import contextlib
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+import metrics
+from metrics import span
+
+
+def per_call_us(fn, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def span_cost(count):
+    def timed():
+        with span("bench"):
+            pass
+    token = metrics._request_stages.set({})
+    try:
+        return per_call_us(timed, count), per_call_us(lambda: None, count)
+    finally:
+        metrics._request_stages.reset(token)
+
+
+def statement_cost(count, instrumented):
+    engine = create_engine("sqlite://")
+    if instrumented:
+        metrics.instrument_engine(engine, "bench")
+    with engine.connect() as conn:
+        statement = text("SELECT 1")
+        conn.execute(statement)
+        return per_call_us(lambda: conn.execute(statement).scalar(), count)
+
+
+def build_app(instrumented):
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(metrics.TimingMiddleware)
+
+    @app.get("/work")
+    async def work():
+        for stage in ("safety", "retrieval", "prompt", "llm", "parse", "db_save"):
+            with span(stage):
+                pass
+        return {"ok": True}
+
+    return app
+
+
+async def request_cost(count, instrumented):
+    transport = httpx.ASGITransport(app=build_app(instrumented))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get("/work")
+        started = time.perf_counter()
+        for _ in range(count):
+            await client.get("/work")
+        return (time.perf_counter() - started) / count * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--statements", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    span_us, baseline_us = span_cost(args.calls)
+    print(f"span:       {span_us - baseline_us:.2f} us per span")
+    plain = statement_cost(args.statements, False)
+    hooked = statement_cost(args.statements, True)
+    print(f"statement:  {plain:.1f} us plain, {hooked:.1f} us with hooks (+{hooked - plain:.1f} us)")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        bare = asyncio.run(request_cost(args.requests, False))
+        timed = asyncio.run(request_cost(args.requests, True))
+    print(f"request:    {bare:.0f} us bare, {timed:.0f} us with middleware and 6 spans (+{timed - bare:.0f} us)")
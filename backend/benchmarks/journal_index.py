@@ -0,0 +1,161 @@
+"""
+Similar-entries index benchmark on a synthetic journal.
+
+Seeds a throwaway SQLite database and Chroma store with --users users of
+--entries analysed entries each, spread over --days days, then measures:
+  build        journal_index.backfill() over everything, in batches of
+               --batch-size, scaled to seconds per 10k entries
+  update       single-entry upserts, as each /journal/submit does
+  query        search_text() p50/p99 for --queries queries, with and without
+               a --window-days date filter
+  prompts      insight_jobs.load_inputs() latency, and how many entries and
+               prediction rows it hands the models
+  memory       resident set growth while building, per 10k entries, and the
+               store's size on disk
+
+Embeddings come from the configured model (MiniLM by default), loaded before
+anything is timed, so build and query times include embedding.
+
+Run from backend/:  python -m benchmarks.journal_index --users 3 --entries 10000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+WORDS = (
+    "work deadline boss meeting sleep tired insomnia family dinner argument friend lonely "
+    "exercise run walk anxious calm grateful therapy medication panic weekend holiday money "
+    "rent school exam partner kids headache coffee morning evening rain sunshine music"
+).split()
+EMOTIONS = ["Anxious", "Calm", "Sad", "Hopeful", "Frustrated", "Content", "Overwhelmed"]
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(users, entries, days, words, seed_value):
+    from sqlalchemy import insert
+
+    import main
+    from database import SessionLocal
+    from models import Entry, Sentiment
+
+    main.init_db()
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    rows = [{"id": user * entries + i + 1, "user_id": user + 1, "content": text(rng, words), "ai_response": "reply",
+             "created_at": now - timedelta(seconds=rng.uniform(0, days * 86400))}
+            for user in range(users) for i in range(entries)]
+    db.execute(insert(Entry), rows)
+    db.execute(insert(Sentiment), [
+        {"entry_id": row["id"], "primary_emotion": rng.choice(EMOTIONS), "intensity_score": rng.randint(1, 10),
+         "triggers": "Work"}
+        for row in rows
+    ])
+    db.commit()
+    db.close()
+    return now
+
+
+def resident_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Peak, not current, off Linux
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 2**20
+
+
+def percentiles(timings):
+    cuts = statistics.quantiles(timings, n=100)
+    return f"p50 {cuts[49]:7.2f} ms   p99 {cuts[98]:7.2f} ms"
+
+
+def timed_ms(fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=10000, help="Entries per user.")
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--words", type=int, default=60, help="Words per entry.")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=24)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    # The engines and the Chroma paths are read on import, so point them at throwaway copies first
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["CHROMA_DB_DIR"] = os.path.join(directory, "chroma")
+    os.environ["TIMING_LOG"] = "false"
+    now = seed(args.users, args.entries, args.days, args.words, args.seed)
+
+    import journal_index
+    import insight_jobs
+    import retrieval_runtime
+    from database import ReadSessionLocal
+
+    retrieval_runtime.get_embedding_service().embed(["warm up"])
+    retrieval_runtime.get_journal_collection()
+    total = args.users * args.entries
+    per_10k = 10000 / total
+    print(f"{args.users} users x {args.entries} entries of {args.words} words, batch size {args.batch_size}\n")
+
+    db = ReadSessionLocal()
+    try:
+        before = resident_mb()
+        started = time.perf_counter()
+        journal_index.backfill(db, batch_size=args.batch_size)
+        build = time.perf_counter() - started
+        grown = resident_mb() - before
+        print(f"build       {build:8.2f} s for {total} entries ({total / build:.0f} entries/s), "
+              f"{build * per_10k:.2f} s per 10k entries")
+
+        rng = random.Random(args.seed + 1)
+        next_id = total + 1
+        updates = []
+        for _ in range(args.updates):
+            row = (next_id, 1, now, text(rng, args.words))
+            updates.append(timed_ms(journal_index.upsert_entries, [row]))
+            next_id += 1
+        print(f"update      {percentiles(updates)}   (one entry)")
+
+        queries = [(rng.randint(1, args.users), text(rng, 12)) for _ in range(args.queries)]
+        window = now - timedelta(days=args.window_days)
+        for label, start in (("query", None), (f"query {args.window_days}d", window)):
+            timings = [timed_ms(journal_index.search_text, user_id, query, args.k, start=start)
+                       for user_id, query in queries]
+            print(f"{label:<11} {percentiles(timings)}   (k={args.k})")
+
+        inputs = []
+        for user_id in range(1, args.users + 1):
+            inputs.append(timed_ms(insight_jobs.load_inputs, db, user_id))
+        _, texts, history_rows = insight_jobs.load_inputs(db, 1)
+        print(f"prompts     mean {statistics.mean(inputs):7.2f} ms   {len(texts)} entries, "
+              f"{sum(map(len, texts))} chars of text, {len(history_rows)} prediction rows")
+    finally:
+        db.close()
+
+    print(f"memory      +{grown:.1f} MB resident while building, {grown * per_10k:.1f} MB "
+          f"per 10k entries; {directory_mb(os.environ['CHROMA_DB_DIR']):.1f} MB on disk")
@@ -0,0 +1,77 @@
+"""
+Load benchmark for the async LLM client.
+
+Fires a burst of slow deep-dive requests against the offline stub model and
+measures latency of the cheap endpoints while those calls are in flight.
+With the event loop no longer blocked, p99 on `/` and `/user/1/history`
+should stay close to the idle baseline.
+
+Run from backend/:  python -m benchmarks.llm_load
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe(client, path, count, interval):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+def report(label, latencies):
+    print(
+        f"{label:<28} n={len(latencies):<4} p50={statistics.median(latencies):7.2f}ms "
+        f"p99={percentile(latencies, 99):7.2f}ms max={max(latencies):7.2f}ms"
+    )
+
+
+async def run(args):
+    import httpx
+    import main
+    from llm_client import StubModel
+
+    main.init_db()
+    main.llm.model = StubModel(latency=args.llm_latency)
+    # Isolate the LLM effect: retrieval is not under test here.
+    main.get_relevant_context = lambda query, n_results=3: []
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for path in ("/", "/user/1/history"):
+            report(f"idle {path}", await probe(client, path, args.probes, args.interval))
+
+        llm_calls = [
+            asyncio.create_task(client.get("/clinical/deep-dive", params={"topic": f"anxiety {i}"}))
+            for i in range(args.llm_requests)
+        ]
+        await asyncio.sleep(0.05)
+        for path in ("/", "/user/1/history"):
+            report(f"loaded {path}", await probe(client, path, args.probes, args.interval))
+
+        start = time.perf_counter()
+        await asyncio.gather(*llm_calls)
+        print(f"{args.llm_requests} deep-dive calls drained {time.perf_counter() - start:.2f}s after probing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-requests", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--probes", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.01)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+LLM scheduling benchmark against the local fake LLM server.
+
+Starts benchmarks/fake_llm.py with a server-side limit of --server-rpm
+requests per minute, --latency and a random --error-rate of 429s, then
+replays a dashboard rush twice: --background background calls issued at
+once (a --duplicates fraction of them repeating an earlier prompt), plus
+--interactive journal submits arriving every --interactive-every seconds.
+
+Modes:
+  unscheduled  every call goes out immediately, no retries (the old client)
+  scheduled    LLMClient with --client-rpm just under the server's limit,
+               priority classes, single-flight and 429 retries
+
+Reports per class how many calls succeeded and their end-to-end latency,
+plus the client's 429, coalescing and queue-time counters.
+
+Run from backend/:  python -m benchmarks.llm_scheduler --background 150 --interactive 20
+"""
+import time
+import socket
+import random
+import asyncio
+import argparse
+import statistics
+import multiprocessing
+
+from benchmarks import fake_llm
+from llm_client import LLMClient, HTTPModel, INTERACTIVE, BACKGROUND
+
+
+def start_server(port, args):
+    server = multiprocessing.Process(
+        target=fake_llm.run, args=(port, args.latency, 0.5, args.server_rpm, args.error_rate), daemon=True)
+    server.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Fake LLM server did not start")
+
+
+def background_prompts(count, duplicates, seed):
+    rng = random.Random(seed)
+    prompts = []
+    for i in range(count):
+        if prompts and rng.random() < duplicates:
+            prompts.append(rng.choice(prompts))
+        else:
+            prompts.append(f"Recent entries for user {i}. Return a JSON list of objects with keys 'prompt' and 'starter'.")
+    return prompts
+
+
+async def timed(client, prompt, priority, results):
+    start = time.perf_counter()
+    try:
+        await client.generate(prompt, timeout=300, priority=priority)
+        results.append((True, time.perf_counter() - start))
+    except Exception:
+        results.append((False, time.perf_counter() - start))
+
+
+async def run_mode(mode, url, args):
+    model = HTTPModel(url)
+    if mode == "unscheduled":
+        client = LLMClient(model, max_concurrency=10 ** 6, rpm=0, tpm=0, max_retries=0)
+    else:
+        client = LLMClient(model, max_concurrency=args.concurrency, rpm=args.client_rpm, tpm=0, max_retries=6)
+
+    background, interactive = [], []
+    tasks = [asyncio.ensure_future(timed(client, prompt, BACKGROUND, background))
+             for prompt in background_prompts(args.background, args.duplicates, args.seed)]
+    for i in range(args.interactive):
+        await asyncio.sleep(args.interactive_every)
+        tasks.append(asyncio.ensure_future(
+            timed(client, f"Journal entry {i}. SENTIMENT_DATA", INTERACTIVE, interactive)))
+    await asyncio.gather(*tasks)
+    return background, interactive, client.stats()
+
+
+def summary(results):
+    ok = [seconds for success, seconds in results if success]
+    if not ok:
+        return f"{0:>4}/{len(results):<4} {'-':>8} {'-':>8}"
+    p99 = statistics.quantiles(ok, n=100)[98] if len(ok) > 1 else ok[0]
+    return f"{len(ok):>4}/{len(results):<4} {statistics.median(ok):>8.2f} {p99:>8.2f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--background", type=int, default=150)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--interactive-every", type=float, default=0.5)
+    parser.add_argument("--server-rpm", type=int, default=120)
+    parser.add_argument("--client-rpm", type=int, default=110)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8931)
+    parser.add_argument("--seed", type=int, default=17)
+    args = parser.parse_args()
+
+    print(f"server: {args.server_rpm} rpm, {args.latency}s latency, {args.error_rate:.0%} random 429s; "
+          f"{args.background} background calls ({args.duplicates:.0%} duplicates) + {args.interactive} interactive\n")
+    print(f"{'mode':<12} {'class':<12} {'ok/total':>9} {'p50 s':>8} {'p99 s':>8}")
+    for offset, mode in enumerate(("unscheduled", "scheduled")):
+        # A fresh server per mode, so one mode's requests do not count against the other's window
+        port = args.port + offset
+        server = start_server(port, args)
+        try:
+            background, interactive, stats = asyncio.run(run_mode(mode, f"http://127.0.0.1:{port}", args))
+        finally:
+            server.terminate()
+            server.join()
+        print(f"{mode:<12} {'interactive':<12} {summary(interactive)}")
+        print(f"{'':<12} {'background':<12} {summary(background)}")
+        queue = {name: stats["queue_time_seconds"][name]["p99"] for name in ("interactive", "background")}
+        print(f"{'':<12} upstream calls {stats['calls']}, 429s {stats['rate_limited']}, coalesced {stats['coalesced']}, "
+              + ", ".join(f"{name} queue p99 <= {p99}s" for name, p99 in queue.items()))
@@ -0,0 +1,98 @@
+"""
+Offline prompt assembly benchmark: prompt size before and after budgeting.
+
+Chunks the knowledge_base corpus and indexes it --copies times over (the
+extra copies lightly edited, like a document ingested again after a typo
+fix), then retrieves --n chunks per question with BM25 and builds the
+journal prompt for an entry of --entry-words words two ways:
+  verbatim   every retrieved chunk pasted in (the previous behaviour)
+  assembled  near-duplicates removed, trimmed to --budget tokens
+
+Reports prompt tokens, context chunks sent, how often the chunk that
+answers the question survived, and assembly time. No model is called.
+
+Run from backend/:  python -m benchmarks.prompt_budget --copies 2 --entry-words 400
+"""
+import os
+import time
+import glob
+import random
+import argparse
+import statistics
+
+from chunking import get_chunker, iter_txt_segments
+from bm25_index import BM25Index
+from prompts import JOURNAL
+import prompt_assembly
+from prompt_assembly import assemble, count_tokens
+from benchmarks.retrieval_eval import QUERIES, DISTRACTOR_WORDS
+
+KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", "knowledge_base")
+
+
+def edited(text, rng):
+    """A copy with a couple of words changed."""
+    words = text.split()
+    for _ in range(2):
+        words[rng.randrange(len(words))] = rng.choice(DISTRACTOR_WORDS)
+    return " ".join(words)
+
+
+def build_index(copies, seed):
+    rng = random.Random(seed)
+    index = BM25Index()
+    for path in sorted(glob.glob(os.path.join(KNOWLEDGE_BASE_DIR, "*.txt"))):
+        chunks = list(get_chunker().chunks(iter_txt_segments(path)))
+        source = os.path.basename(path)
+        for copy in range(copies):
+            documents = chunks if copy == 0 else [edited(chunk, rng) for chunk in chunks]
+            index.add([f"{source}-{copy}-{i}" for i in range(len(documents))], documents,
+                      [{"source": source}] * len(documents))
+    return index
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=2, help="Times each document is ingested.")
+    parser.add_argument("--n", type=int, default=5, help="Chunks retrieved per question.")
+    parser.add_argument("--entry-words", type=int, default=400)
+    parser.add_argument("--budget", type=int, default=prompt_assembly.PROMPT_BUDGET_JOURNAL)
+    parser.add_argument("--seed", type=int, default=19)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = build_index(args.copies, args.seed)
+    print(f"{len(index)} chunks ({args.copies} copies of the corpus), {len(QUERIES)} questions, "
+          f"{args.entry_words}-word entries, budget {args.budget} tokens\n")
+
+    results = {"verbatim": [], "assembled": []}  # (tokens, chunks sent, answer kept)
+    timings = []
+    for question, phrases in QUERIES:
+        entry = question + " " + " ".join(rng.choice(DISTRACTOR_WORDS) for _ in range(args.entry_words))
+        context = [index.context(chunk_id) for chunk_id, _ in index.search(question, args.n)]
+
+        def answered(used):
+            return any(p.lower() in c["content"].lower() for c in used for p in phrases)
+
+        prompt = JOURNAL.render(context, content=entry)
+        results["verbatim"].append((count_tokens(prompt), len(context), answered(context)))
+        prompt_assembly.signature_cache.clear()
+        start = time.perf_counter()
+        prompt, used = assemble(JOURNAL, context, args.budget, content=entry)
+        timings.append((time.perf_counter() - start) * 1000)
+        results["assembled"].append((count_tokens(prompt), len(used), answered(used)))
+
+    print(f"{'mode':<10} {'mean tok':>9} {'max tok':>8} {'chunks':>7} {'answer kept':>12}")
+    for mode, rows in results.items():
+        tokens = [t for t, _, _ in rows]
+        answers = sum(1 for _, _, kept in rows if kept)
+        print(f"{mode:<10} {statistics.mean(tokens):>9.0f} {max(tokens):>8} "
+              f"{statistics.mean(n for _, n, _ in rows):>7.1f} {answers:>5}/{len(rows):<6}")
+    stats = prompt_assembly.stats()
+    print(f"\nnear-duplicates removed {stats['duplicates_dropped']}, dropped for budget {stats['items_dropped']}, "
+          f"trimmed {stats['items_trimmed']}, over budget {stats['over_budget']}; "
+          f"assembly p50 {percentile(timings, 50):.2f} ms, p99 {percentile(timings, 99):.2f} ms (uncached signatures)")
@@ -0,0 +1,151 @@
+"""
+Query-plan regression check and index benchmark for the per-user queries.
+
+Seeds a throwaway SQLite database with --entries entries spread over --users
+users, drops the indexes added by migrations 1-3 to reproduce an old
+database, and times the app's per-user queries. It then runs
+migrations.upgrade(), times the queries again and checks EXPLAIN QUERY PLAN:
+every query must SEARCH entries/sentiments/sentiment_triggers through an
+index, never SCAN them. The script exits with status 1 if a plan regresses,
+so it can gate CI.
+
+Run from backend/:  python -m benchmarks.query_plans --entries 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.orm import sessionmaker
+
+import history
+import migrations
+from models import Base, User, Entry, Sentiment, SentimentTrigger
+
+EMOTIONS = ["Anxious", "Calm", "Sad", "Hopeful", "Frustrated", "Content"]
+TRIGGERS = ["Work", "Family", "Sleep", "Health", "Money", "Friends"]
+NEW_INDEXES = ["ix_entries_user_created", "ix_sentiments_entry_id", "ix_sentiment_triggers_sentiment_id"]
+WATCHED_TABLES = ("entries", "sentiments", "sentiment_triggers")
+
+
+def seed(engine, entries, users, days, seed_value):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.execute(insert(User), [{"id": u, "username": f"user{u}", "hashed_password": "x"} for u in range(1, users + 1)])
+    for offset in range(0, entries, 50000):
+        count = min(50000, entries - offset)
+        db.execute(insert(Entry), [
+            {"id": offset + i + 1, "user_id": rng.randint(1, users), "content": "entry", "ai_response": "reply",
+             "created_at": now - timedelta(seconds=rng.uniform(0, days * 86400))}
+            for i in range(count)
+        ])
+        db.execute(insert(Sentiment), [
+            {"id": offset + i + 1, "entry_id": offset + i + 1, "primary_emotion": rng.choice(EMOTIONS),
+             "intensity_score": rng.randint(1, 10), "triggers": ", ".join(rng.sample(TRIGGERS, rng.randint(1, 2)))}
+            for i in range(count)
+        ])
+        db.commit()
+    db.close()
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def app_queries(db, user_id):
+    """(label, Query) for the per-user queries the API issues."""
+    seven_days_ago = datetime.utcnow() - timedelta(days=7)
+    a_month_ago = datetime.utcnow() - timedelta(days=30)
+    return [
+        ("history first page", history.page_query(db, user_id, 51)),
+        ("history deep page", history.page_query(db, user_id, 51, after=(a_month_ago, 10 ** 9))),
+        ("recent entries", db.query(Entry).filter(Entry.user_id == user_id).order_by(Entry.created_at.desc()).limit(5)),
+        ("mood history", db.query(Entry, Sentiment)
+            .join(Sentiment, Entry.id == Sentiment.entry_id)
+            .filter(Entry.user_id == user_id)
+            .order_by(Entry.created_at.asc())
+            .limit(14)),
+        ("7-day window", db.query(func.avg(Sentiment.intensity_score))
+            .join(Entry, Sentiment.entry_id == Entry.id)
+            .filter(Entry.user_id == user_id, Entry.created_at >= seven_days_ago)),
+        ("7-day triggers", db.query(SentimentTrigger.name, func.count())
+            .join(Sentiment, SentimentTrigger.sentiment_id == Sentiment.id)
+            .join(Entry, Sentiment.entry_id == Entry.id)
+            .filter(Entry.user_id == user_id, Entry.created_at >= seven_days_ago)
+            .group_by(SentimentTrigger.name)),
+    ]
+
+
+def explain(db, query):
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    params = tuple(
+        str(v) if isinstance(v, datetime) else v
+        for v in (compiled.params[name] for name in compiled.positiontup)
+    )
+    with db.get_bind().connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+
+
+def full_scans(plan):
+    return [step for step in plan if step.startswith("SCAN") and any(t in step.split() for t in WATCHED_TABLES)]
+
+
+def time_queries(Session, users, repeat, seed_value):
+    rng = random.Random(seed_value)
+    samples = {}
+    db = Session()
+    for _ in range(repeat):
+        user_id = rng.randint(1, users)
+        for label, query in app_queries(db, user_id):
+            start = time.perf_counter()
+            query.all()
+            samples.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+    db.close()
+    return {label: statistics.median(values) for label, values in samples.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        start = time.perf_counter()
+        seed(engine, args.entries, args.users, args.days, args.seed)
+        print(f"seeded {args.entries} entries for {args.users} users in {time.perf_counter() - start:.1f}s")
+
+        before = time_queries(Session, args.users, args.repeat, args.seed)
+
+        start = time.perf_counter()
+        migrations.upgrade(engine)
+        print(f"migrations: {time.perf_counter() - start:.1f}s")
+
+        after = time_queries(Session, args.users, args.repeat, args.seed)
+
+        print(f"\n{'query':<20} {'unindexed ms':>13} {'indexed ms':>11}  plan")
+        regressions = 0
+        db = Session()
+        for label, query in app_queries(db, 1):
+            scans = full_scans(explain(db, query))
+            regressions += bool(scans)
+            verdict = "FULL SCAN: " + "; ".join(scans) if scans else "index"
+            print(f"{label:<20} {before[label]:>13.2f} {after[label]:>11.2f}  {verdict}")
+        db.close()
+
+    if regressions:
+        print(f"\n{regressions} query plan(s) regressed to a full scan")
+        sys.exit(1)
@@ -0,0 +1,148 @@
+"""
+Offline retrieval evaluation: recall@k and latency per retrieval mode.
+
+Ingests the knowledge_base corpus (plus --distractors synthetic documents
+written in the same clinical vocabulary, so the retrievers have something
+to get wrong) into a throwaway Chroma store and BM25 index, then runs a
+labelled query set through each mode:
+  dense           MiniLM only (the previous behaviour)
+  bm25            keyword index only
+  hybrid          both, merged with reciprocal rank fusion
+  hybrid+rerank   hybrid, re-ordered by --reranker (skipped without one)
+
+A chunk is relevant to a query when it contains one of the query's
+phrases. recall@k is the share of a query's relevant chunks found in the
+top k, averaged over queries. Latency covers embedding the query (the
+embedding cache is cleared before each one), search, fusion and re-ranking.
+--queries takes a JSONL file of {"query": str, "relevant": [phrase, ...]}.
+
+Run from backend/:  python -m benchmarks.retrieval_eval --distractors 300 \\
+                        --reranker cross-encoder/ms-marco-MiniLM-L-6-v2
+"""
+import io
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+import statistics
+
+KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "knowledge_base")
+QUERIES = [
+    ("What therapy helps people who feel emotions very intensely?", ["Dialectical Behavior Therapy"]),
+    ("DBT distress tolerance skills", ["Dialectical Behavior Therapy"]),
+    ("Does exercise raise BDNF?", ["BDNF"]),
+    ("Is physical activity as effective as antidepressants?", ["antidepressants"]),
+    ("IPSRT and circadian rhythms", ["IPSRT"]),
+    ("Keeping a regular sleep and wake routine to stabilize mood", ["social rhythms", "regular sleep schedule"]),
+    ("MBSR cortisol", ["Mindfulness-Based Stress Reduction"]),
+    ("How many minutes of mindfulness a day help with anxiety?", ["10 minutes of daily mindfulness"]),
+    ("REM sleep and processing emotions", ["REM sleep"]),
+    ("Sleep deprivation makes the amygdala more reactive", ["Sleep deprivation"]),
+    ("avoidant attachment style", ["Attachment theory"]),
+    ("How do early relationships with caregivers shape us?", ["Attachment theory"]),
+    ("CBT negative thought patterns", ["Cognitive Behavioral Therapy"]),
+    ("prefrontal cortex hippocampus fear response", ["prefrontal cortex"]),
+    ("cognitive reappraisal to reframe thoughts", ["cognitive reappraisal"]),
+    ("Treatment that started with borderline personality disorder", ["borderline personality disorder"]),
+]
+DISTRACTOR_WORDS = (
+    "anxiety therapy mood stress sleep emotion regulation patients clinical study research brain depression "
+    "treatment symptoms session wellbeing mindfulness cognitive behavior resilience trauma support outcome "
+    "evidence practice daily awareness thoughts feelings relationships health mental neural response"
+).split()
+MODES = ("dense", "bm25", "hybrid", "hybrid+rerank")
+
+
+def write_distractors(directory, count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        sentences = [" ".join(rng.choice(DISTRACTOR_WORDS) for _ in range(rng.randint(12, 24))).capitalize() + "."
+                     for _ in range(rng.randint(4, 8))]
+        with open(os.path.join(directory, f"distractor_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(" ".join(sentences))
+
+
+def load_queries(path):
+    if not path:
+        return QUERIES
+    with open(path, "r", encoding="utf-8") as f:
+        return [(item["query"], item["relevant"]) for item in map(json.loads, f) if item]
+
+
+def relevant_ids(index, phrases):
+    phrases = [p.lower() for p in phrases]
+    return {chunk_id for chunk_id, doc in index.docs.items() if any(p in doc["content"].lower() for p in phrases)}
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distractors", type=int, default=300)
+    parser.add_argument("--queries", default=None, help="JSONL file of labelled queries.")
+    parser.add_argument("--reranker", default=os.getenv("RERANKER_MODEL", ""))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--seed", type=int, default=18)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="retrieval-eval-")
+    knowledge_dir = os.path.join(workdir, "knowledge_base")
+    shutil.copytree(KNOWLEDGE_BASE_DIR, knowledge_dir)
+    # Must be set before retrieval_runtime is imported
+    os.environ["CHROMA_DB_DIR"] = os.path.join(workdir, "chroma_db")
+
+    import ingest_data
+    import retrieval_runtime
+    import vector_service
+
+    try:
+        write_distractors(knowledge_dir, args.distractors, args.seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_data.ingest_knowledge(knowledge_dir, retrieval_runtime.get_collection(), workers=1)
+        index = retrieval_runtime.get_bm25_index()
+        collection = retrieval_runtime.get_collection()
+        queries = [(query, relevant_ids(index, phrases)) for query, phrases in load_queries(args.queries)]
+        queries = [(query, relevant) for query, relevant in queries if relevant]
+        print(f"{len(index)} chunks ({args.distractors} distractor documents), {len(queries)} labelled queries\n")
+
+        def retrieve(mode, query, k):
+            if mode == "dense":
+                embedding = vector_service.embed_query(query)
+                return collection.query(query_embeddings=[embedding], n_results=k)["ids"][0]
+            if mode == "bm25":
+                return [chunk_id for chunk_id, _ in index.search(query, k)]
+            vector_service.RETRIEVAL_MODE = "hybrid"
+            retrieval_runtime.RERANKER_MODEL_NAME = args.reranker if mode == "hybrid+rerank" else ""
+            vector_service.result_cache.clear()
+            return [c["id"] for c in vector_service.get_relevant_context(query, k)]
+
+        retrieve("dense", "warm up", 1)
+        depth = max(args.k)
+        header = " ".join(f"{f'recall@{k}':>9}" for k in args.k)
+        print(f"{'mode':<14} {header} {'p50 ms':>8} {'p99 ms':>8}")
+        for mode in MODES:
+            if mode == "hybrid+rerank" and not args.reranker:
+                print(f"{mode:<14} (skipped: pass --reranker or set RERANKER_MODEL)")
+                continue
+            if mode == "hybrid+rerank":
+                retrieval_runtime.RERANKER_MODEL_NAME = args.reranker
+                retrieval_runtime.get_reranker().predict([("warm up", "warm up")])
+            recalls = {k: [] for k in args.k}
+            latencies = []
+            for query, relevant in queries:
+                vector_service.embedding_cache.clear()
+                start = time.perf_counter()
+                ranked = retrieve(mode, query, depth)
+                latencies.append((time.perf_counter() - start) * 1000)
+                for k in args.k:
+                    recalls[k].append(len(relevant.intersection(ranked[:k])) / len(relevant))
+            row = " ".join(f"{statistics.mean(recalls[k]):>9.3f}" for k in args.k)
+            print(f"{mode:<14} {row} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,154 @@
+"""
+Dashboard analytics benchmark: daily rollups vs. scanning entries x sentiments.
+
+Seeds a throwaway SQLite database with --entries journal entries for one
+user spread over --days days, backfills the rollups, then times one
+dashboard load (mood-trend, mood-stats, insights, trigger-distribution)
+computed both ways and checks the two agree. Also reports the extra cost
+the rollup upsert adds to each stored entry.
+
+Run from backend/:  python -m benchmarks.rollups --entries 100000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+import rollups
+from database import build_sentiment
+from models import Base, User, Entry, Sentiment, SentimentTrigger
+
+EMOTIONS = ["Anxious", "Calm", "Sad", "Hopeful", "Frustrated", "Content", "Overwhelmed"]
+TRIGGERS = ["Work", "Family", "Sleep", "Health", "Money", "Friends", "Exercise", "School"]
+USER_ID = 1
+
+
+def seed(db, entries, days, seed_value):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    db.add(User(id=USER_ID, username="bench", hashed_password="x"))
+    db.flush()
+    batch = 10000
+    for start in range(0, entries, batch):
+        count = min(batch, entries - start)
+        db.execute(insert(Entry), [
+            {"id": start + i + 1, "user_id": USER_ID, "content": "entry", "ai_response": "reply",
+             "created_at": now - timedelta(seconds=rng.uniform(0, days * 86400))}
+            for i in range(count)
+        ])
+        sentiments = [
+            {"id": start + i + 1, "entry_id": start + i + 1, "primary_emotion": rng.choice(EMOTIONS),
+             "intensity_score": rng.randint(1, 10),
+             "triggers": ", ".join(rng.sample(TRIGGERS, rng.randint(1, 3)))}
+            for i in range(count)
+        ]
+        db.execute(insert(Sentiment), sentiments)
+        db.execute(insert(SentimentTrigger), [
+            {"sentiment_id": s["id"], "name": name} for s in sentiments for name in rollups.split_triggers(s["triggers"])
+        ])
+    db.commit()
+
+
+def legacy_dashboard(db):
+    """
+    The per-request queries the endpoints ran before the rollups existed. The
+    window starts at midnight like the rollups' does (the endpoints used
+    exactly 168 hours), so the two can be compared number for number.
+    """
+    seven_days_ago = datetime.combine(rollups.window_start(7), datetime.min.time())
+    trend = db.query(func.date(Entry.created_at), func.avg(Sentiment.intensity_score))\
+        .join(Sentiment, Entry.id == Sentiment.entry_id)\
+        .filter(Entry.user_id == USER_ID, Entry.created_at >= seven_days_ago)\
+        .group_by(func.date(Entry.created_at))\
+        .all()
+    avg = db.query(func.avg(Sentiment.intensity_score))\
+        .join(Entry, Sentiment.entry_id == Entry.id)\
+        .filter(Entry.user_id == USER_ID, Entry.created_at >= seven_days_ago)\
+        .scalar()
+    sentiments = [s for s, _ in db.query(Sentiment, Entry)
+                  .join(Entry, Sentiment.entry_id == Entry.id)
+                  .filter(Entry.user_id == USER_ID, Entry.created_at >= seven_days_ago)
+                  .all()]
+    intensities = [s.intensity_score for s in sentiments]
+    variance = statistics.pvariance(intensities) if intensities else None
+    triggers = Counter(t for s in db.query(Sentiment)
+                       .join(Entry, Sentiment.entry_id == Entry.id)
+                       .filter(Entry.user_id == USER_ID, Entry.created_at >= seven_days_ago)
+                       .all()
+                       for t in rollups.split_triggers(s.triggers))
+    return len(trend), avg, variance, triggers
+
+
+def rollup_dashboard(db):
+    trend = rollups.daily_moods(db, USER_ID, days=7)
+    _, avg, _ = rollups.mood_summary(db, USER_ID, days=7)  # mood-stats
+    _, _, variance = rollups.mood_summary(db, USER_ID, days=7)  # insights
+    rollups.emotion_counts(db, USER_ID, days=7)
+    triggers = rollups.trigger_counts(db, USER_ID, days=7)
+    return len(trend), avg, variance, triggers
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def write_overhead_ms(db, writes):
+    """Median time of storing one entry + sentiment, with and without the rollup upsert."""
+    def store(with_rollup):
+        entry = Entry(user_id=USER_ID, content="entry", ai_response="reply")
+        db.add(entry)
+        db.flush()
+        db.add(build_sentiment(entry.id, {"emotion": "Calm", "intensity": 5, "triggers": "Work"}))
+        if with_rollup:
+            rollups.record_sentiment(db, USER_ID, entry.created_at,
+                                     {"emotion": "Calm", "intensity": 5, "triggers": "Work"})
+        db.commit()
+    return time_ms(lambda: store(False), writes)[0], time_ms(lambda: store(True), writes)[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        start = time.perf_counter()
+        seed(db, args.entries, args.days, args.seed)
+        print(f"seeded {args.entries} entries over {args.days} days in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        rollups.backfill(db)
+        print(f"backfill: {time.perf_counter() - start:.2f}s")
+
+        legacy_ms, legacy = time_ms(lambda: legacy_dashboard(db), args.repeat)
+        rollup_ms, rolled = time_ms(lambda: rollup_dashboard(db), args.repeat)
+        print(f"dashboard load, legacy scans: {legacy_ms:8.2f} ms")
+        print(f"dashboard load, rollups:      {rollup_ms:8.2f} ms  ({legacy_ms / rollup_ms:.0f}x)")
+
+        same = (legacy[0] == rolled[0] and legacy[3] == rolled[3]
+                and abs(legacy[1] - rolled[1]) < 1e-9 and abs(legacy[2] - rolled[2]) < 1e-6)
+        print(f"parity: {'ok' if same else 'MISMATCH'} (7d average {rolled[1]:.3f}, variance {rolled[2]:.3f})")
+
+        plain, with_rollup = write_overhead_ms(db, args.writes)
+        print(f"store entry: {plain:.2f} ms without rollup, {with_rollup:.2f} ms with rollup")
+        db.close()
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark for the crisis detector.
+
+Reports the cost per KB of journal text as the phrase list grows, for the
+compiled trie matcher and for the previous one-re.search-per-phrase loop.
+
+Run from backend/:  python -m benchmarks.safety
+"""
+import re
+import random
+import argparse
+import timeit
+
+from safety import CRISIS_KEYWORDS, PhraseMatcher
+
+FILLER = (
+    "today was long and I kept thinking about work and the conversation with my sister "
+    "I went for a walk in the evening and felt a little calmer after dinner "
+).split()
+
+
+def synthetic_phrases(count, seed):
+    """Pads the real list with plausible two-to-four word phrases."""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    phrases = list(CRISIS_KEYWORDS)
+    while len(phrases) < count:
+        words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 8))) for _ in range(rng.randint(2, 4))]
+        phrases.append(" ".join(words))
+    return phrases[:count]
+
+
+def journal_text(kilobytes, seed):
+    rng = random.Random(seed)
+    words = []
+    while sum(len(w) + 1 for w in words) < kilobytes * 1024:
+        words.append(rng.choice(FILLER))
+    return " ".join(words)
+
+
+def legacy_scan(patterns, text):
+    for pattern in patterns:
+        if re.search(pattern, text, re.IGNORECASE):
+            return True
+    return False
+
+
+def per_kb_us(fn, kilobytes, repeat):
+    seconds = min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat
+    return seconds * 1e6 / kilobytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,50,100,250,500,1000")
+    parser.add_argument("--kb", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    # A benign entry is the worst case: every phrase has to be ruled out
+    text = journal_text(args.kb, args.seed)
+    print(f"{'phrases':>8} {'compiled us/KB':>15} {'legacy loop us/KB':>18}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        phrases = synthetic_phrases(size, args.seed)
+        matcher = PhraseMatcher(phrases, word_boundaries=False)  # As crisis_matcher is built
+        compiled = per_kb_us(lambda: matcher.find(text), args.kb, args.repeat)
+        legacy = per_kb_us(lambda: legacy_scan(phrases, text), args.kb, args.repeat)
+        print(f"{size:>8} {compiled:>15.1f} {legacy:>18.1f}")
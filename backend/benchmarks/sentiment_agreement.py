@@ -0,0 +1,162 @@
+"""
+Offline agreement harness: the local sentiment classifier vs. the labels the
+LLM trailer stored.
+
+Reads up to --limit analysed entries from the app database (DATABASE_URL, or
+--database-url), skipping sentiments that are exactly the neutral defaults
+(failed trailer parses, not labels). Runs the local engine over them in
+batches of --batch-size and reports:
+  - emotion agreement: the LLM's free-form emotion is folded onto the
+    classifier's labels (Anxious/Worried/Stressed -> Anxiety, Happy -> Joy,
+    ...); emotions with no counterpart are counted but not scored
+  - intensity: mean absolute error and correlation on the 1-10 scale
+  - triggers: mean Jaccard overlap, and how often at least one is shared
+  - speed: texts/sec batched, and single-entry latency p50/p99
+
+--show prints that many disagreements. With --min-agreement, exits 1 when
+emotion agreement falls below it, so a model swap can be gated on it.
+
+Run from backend/:  python -m benchmarks.sentiment_agreement --limit 2000 --show 10
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from collections import Counter
+
+# LLM emotion (lowercased) -> classifier emotion, for the words the trailer tends to use
+LLM_EMOTIONS = {
+    "joy": "Joy", "happy": "Joy", "happiness": "Joy", "content": "Joy", "contentment": "Joy", "hopeful": "Joy",
+    "hope": "Joy", "excited": "Joy", "excitement": "Joy", "grateful": "Joy", "gratitude": "Joy", "proud": "Joy",
+    "relief": "Joy", "relieved": "Joy",
+    "anxiety": "Anxiety", "anxious": "Anxiety", "fear": "Anxiety", "afraid": "Anxiety", "worried": "Anxiety",
+    "worry": "Anxiety", "stressed": "Anxiety", "stress": "Anxiety", "nervous": "Anxiety", "overwhelmed": "Anxiety",
+    "panic": "Anxiety",
+    "sadness": "Sadness", "sad": "Sadness", "grief": "Sadness", "lonely": "Sadness", "loneliness": "Sadness",
+    "depressed": "Sadness", "hopeless": "Sadness", "disappointed": "Sadness", "disappointment": "Sadness",
+    "anger": "Anger", "angry": "Anger", "frustrated": "Anger", "frustration": "Anger", "irritated": "Anger",
+    "resentment": "Anger",
+    "disgust": "Disgust", "disgusted": "Disgust", "shame": "Disgust",
+    "surprise": "Surprise", "surprised": "Surprise", "shocked": "Surprise",
+    "neutral": "Neutral", "calm": "Neutral", "reflective": "Neutral", "tired": "Neutral",
+}
+
+
+def load_labelled(db, limit):
+    """[(content, llm sentiment dict)] for analysed entries, newest first, skipping the neutral defaults."""
+    from sqlalchemy import select, and_, not_
+
+    from models import Entry, Sentiment
+    from streaming import DEFAULT_SENTIMENT
+
+    defaults = and_(Sentiment.primary_emotion == DEFAULT_SENTIMENT["emotion"],
+                    Sentiment.intensity_score == DEFAULT_SENTIMENT["intensity"],
+                    Sentiment.triggers == DEFAULT_SENTIMENT["triggers"])
+    rows = db.execute(
+        select(Entry.content, Sentiment.primary_emotion, Sentiment.intensity_score, Sentiment.triggers)
+        .join(Sentiment, Entry.id == Sentiment.entry_id)
+        .where(not_(defaults))
+        .order_by(Entry.id.desc())
+        .limit(limit)
+    ).all()
+    return [(content, {"emotion": emotion, "intensity": intensity, "triggers": triggers})
+            for content, emotion, intensity, triggers in rows]
+
+
+def trigger_set(triggers):
+    import rollups
+    return {name.lower() for name in rollups.split_triggers(triggers)}
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--model", default=None, help="Classifier to evaluate (defaults to SENTIMENT_MODEL).")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-samples", type=int, default=50)
+    parser.add_argument("--show", type=int, default=0)
+    parser.add_argument("--min-agreement", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url  # Before database.py creates its engines
+    if args.model:
+        os.environ["SENTIMENT_MODEL"] = args.model
+
+    import sentiment_engine
+    from database import ReadSessionLocal
+
+    db = ReadSessionLocal()
+    try:
+        labelled = load_labelled(db, args.limit)
+    finally:
+        db.close()
+    if not labelled:
+        print("No analysed entries to compare against.")
+        sys.exit(0)
+
+    model = sentiment_engine.LocalSentimentModel(*sentiment_engine.load_classifier(), batch_size=args.batch_size)
+    texts = [content for content, _ in labelled]
+    model.analyze(texts[:args.batch_size])  # Warm up
+    started = time.perf_counter()
+    predicted = model.analyze(texts)
+    batched_seconds = time.perf_counter() - started
+    single = []
+    for text in texts[:args.latency_samples]:
+        started = time.perf_counter()
+        model.analyze([text])
+        single.append((time.perf_counter() - started) * 1000)
+
+    scored = agreed = 0
+    unmapped = Counter()
+    confusion = Counter()
+    errors, pairs, overlaps, shared = [], [], [], 0
+    disagreements = []
+    for (content, llm), local in zip(labelled, predicted):
+        expected = LLM_EMOTIONS.get((llm["emotion"] or "").strip().lower())
+        if expected is None:
+            unmapped[llm["emotion"]] += 1
+        else:
+            scored += 1
+            if expected == local["emotion"]:
+                agreed += 1
+            else:
+                confusion[(expected, local["emotion"])] += 1
+                disagreements.append((content, llm, local))
+        if llm["intensity"] is not None:
+            errors.append(abs(float(llm["intensity"]) - local["intensity"]))
+            pairs.append((float(llm["intensity"]), local["intensity"]))
+        theirs, ours = trigger_set(llm["triggers"]), trigger_set(local["triggers"])
+        if theirs or ours:
+            overlaps.append(len(theirs & ours) / len(theirs | ours))
+            shared += bool(theirs & ours)
+
+    print(f"{len(labelled)} entries, model {sentiment_engine.SENTIMENT_MODEL}, batch size {args.batch_size}\n")
+    agreement = agreed / scored if scored else 0.0
+    print(f"emotion agreement   {agreement:.1%} of {scored} scored ({sum(unmapped.values())} with no counterpart)")
+    if unmapped:
+        print(f"  no counterpart:   {', '.join(f'{name} ({count})' for name, count in unmapped.most_common(8))}")
+    if confusion:
+        print(f"  most confused:    {', '.join(f'{a}->{b} ({count})' for (a, b), count in confusion.most_common(5))}")
+    if errors:
+        correlation = statistics.correlation(*zip(*pairs)) if len(pairs) > 1 and len({a for a, _ in pairs}) > 1 \
+            and len({b for _, b in pairs}) > 1 else float("nan")
+        print(f"intensity           MAE {statistics.mean(errors):.2f}, correlation {correlation:.2f}")
+    if overlaps:
+        print(f"triggers            Jaccard {statistics.mean(overlaps):.2f}, one shared in {shared / len(overlaps):.1%}")
+    print(f"speed               {len(texts) / batched_seconds:.0f} texts/s batched; single entry "
+          f"p50 {percentile(single, 50):.1f} ms, p99 {percentile(single, 99):.1f} ms")
+
+    for content, llm, local in disagreements[:args.show]:
+        print(f"\n  LLM {llm['emotion']} / {llm['intensity']} / {llm['triggers']}"
+              f"  vs local {local['emotion']} / {local['intensity']} / {local['triggers']}\n  {content[:160]!r}")
+
+    if args.min_agreement is not None and agreement < args.min_agreement:
+        print(f"\nEmotion agreement {agreement:.1%} is below --min-agreement {args.min_agreement:.1%}")
+        sys.exit(1)
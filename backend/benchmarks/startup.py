@@ -0,0 +1,86 @@
+"""
+Cold-start benchmark for the API process.
+
+Measures, each in a fresh interpreter:
+  - import time of main.py
+  - time from process spawn to the first successful `/` response
+  - time from process spawn to `/readyz` reporting ready (background warm-up)
+  - time to the first get_relevant_context() result in a cold process
+
+Run from backend/:  python -m benchmarks.startup
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import urllib.request
+import urllib.error
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+"""
+
+FIRST_QUERY_SNIPPET = """
+import time
+start = time.perf_counter()
+from vector_service import get_relevant_context
+get_relevant_context("anxiety and workplace stress")
+print(time.perf_counter() - start)
+"""
+
+
+def run_snippet(snippet):
+    out = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url, started, timeout):
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.02)
+    return float("nan")
+
+
+def time_server(port, timeout):
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "RETRIEVAL_WARMUP": "true"}
+    )
+    try:
+        first_root = wait_for(f"http://127.0.0.1:{port}/", started, timeout)
+        ready = wait_for(f"http://127.0.0.1:{port}/readyz", started, timeout)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_root, ready
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    for run in range(1, args.runs + 1):
+        import_s = run_snippet(IMPORT_SNIPPET)
+        first_root, ready = time_server(args.port, args.timeout)
+        first_query = run_snippet(FIRST_QUERY_SNIPPET)
+        print(
+            f"run {run}: import main {import_s:6.2f}s | first / {first_root:6.2f}s | "
+            f"ready {ready:6.2f}s | first get_relevant_context {first_query:6.2f}s"
+        )
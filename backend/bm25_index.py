@@ -0,0 +1,126 @@
+import os
+import re
+import json
+import math
+import heapq
+from collections import Counter, defaultdict
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do for from has have how i in into is it its me my of on or so "
+    "that the their them these they this to was were what when which while who why with you your".split()
+)
+
+
+def tokenize(text):
+    """
+    Lower-cased word tokens without stopwords. A trailing plural "s" is
+    dropped so "SSRIs" matches "SSRI"; acronyms and numbers are kept as is.
+    """
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the knowledge chunks as an inverted index (term ->
+    {chunk id: term frequency}). Ingest keeps it next to the Chroma
+    collection, updated chunk by chunk; the API loads it read-only. Chunk
+    text is stored too, so keyword-only hits need no Chroma round trip.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.docs = {}  # chunk id -> {"content", "source"}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, ids, documents, metadatas):
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            if chunk_id in self.lengths:
+                self.remove([chunk_id])
+            counts = Counter(tokenize(document))
+            for term, tf in counts.items():
+                self.postings[term][chunk_id] = tf
+            self.lengths[chunk_id] = sum(counts.values())
+            self.total_length += self.lengths[chunk_id]
+            self.docs[chunk_id] = {"content": document, "source": metadata.get("source", "Unknown Source")}
+
+    def remove(self, ids):
+        for chunk_id in ids:
+            if chunk_id not in self.lengths:
+                continue
+            for term in set(tokenize(self.docs[chunk_id]["content"])):
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(chunk_id, None)
+                    if not posting:
+                        del self.postings[term]
+            self.total_length -= self.lengths.pop(chunk_id)
+            del self.docs[chunk_id]
+
+    def remove_source(self, source):
+        self.remove([chunk_id for chunk_id, doc in self.docs.items() if doc["source"] == source])
+
+    def search(self, query, n_results):
+        """Returns up to n_results (chunk id, score) pairs, best first."""
+        if not self.lengths:
+            return []
+        count = len(self.lengths)
+        average_length = self.total_length / count
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+    def context(self, chunk_id):
+        return {"id": chunk_id, **self.docs[chunk_id]}
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "postings": self.postings,
+                       "lengths": self.lengths, "docs": self.docs}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        index.postings = defaultdict(dict, data["postings"])
+        index.lengths = data["lengths"]
+        index.docs = data["docs"]
+        index.total_length = sum(index.lengths.values())
+        return index
+
+    @classmethod
+    def from_collection(cls, collection, batch_size=1000):
+        """Builds the index from everything already in a Chroma collection."""
+        index = cls()
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            index.add(page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+        return index
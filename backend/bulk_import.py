@@ -0,0 +1,233 @@
+import os
+import json
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, update
+
+from database import SessionLocal, build_sentiment, run_in_thread
+from models import Entry, ImportJob, ImportJobItem
+from safety import safety_interceptor
+from vector_service import get_relevant_contexts
+from prompt_assembly import assemble, PROMPT_BUDGET_IMPORT
+from streaming import split_sentiment_trailer, DEFAULT_SENTIMENT
+from llm_client import llm, BULK
+import rollups
+import insight_jobs
+import data_versions
+import journal_index
+import metrics
+import sentiment_engine
+
+# Configuration
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "64"))
+IMPORT_LLM_WORKERS = int(os.getenv("IMPORT_LLM_WORKERS", "4"))
+
+# Keeps a reference to running jobs so they are not garbage collected mid-flight
+_running = {}
+
+
+class ImportEntry(BaseModel):
+    content: str
+    created_at: Optional[datetime] = None
+
+
+def parse_entries(body: bytes, content_type: str):
+    """
+    Accepts NDJSON (one entry per line) or JSON: a list of entries or
+    {"entries": [...]}. Each entry is {"content": str, "created_at": ISO date?}.
+    Raises ValueError with a readable message on malformed input.
+    """
+    text = body.decode("utf-8")
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            raw = json.loads(text)
+            if isinstance(raw, dict):
+                raw = raw.get("entries", [])
+        if not isinstance(raw, list):
+            raise ValueError("Expected a list of entries.")
+        return [ImportEntry(**item) for item in raw]
+    except (json.JSONDecodeError, ValidationError, TypeError) as e:
+        raise ValueError(f"Invalid import payload: {e}")
+
+
+def create_job(db, user_id: int, entries):
+    """Stores the job and all of its items in one transaction and returns the job."""
+    job = ImportJob(user_id=user_id, status="pending", total=len(entries))
+    db.add(job)
+    db.flush()
+    if entries:
+        db.execute(insert(ImportJobItem), [
+            {"job_id": job.id, "seq": seq, "content": e.content, "created_at": e.created_at, "done": False}
+            for seq, e in enumerate(entries)
+        ])
+    db.commit()
+    return job
+
+
+def job_progress(job):
+    return {
+        "job_id": job.id,
+        "user_id": job.user_id,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "crisis_flagged": job.crisis_flagged,
+        "failed": job.failed,
+        "percent": round(100 * job.processed / job.total, 1) if job.total else 100.0,
+        "error": job.error,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None
+    }
+
+
+async def _analyze(items, workers):
+    """
+    Runs the safety scan, one batched retrieval and bounded-concurrency LLM
+    calls for a batch of items. Returns (ai_response, sentiment_or_None, ok) per item.
+    """
+    flags = [safety_interceptor(item.content) for item in items]
+    safe_items = [item for item, (is_crisis, _) in zip(items, flags) if not is_crisis]
+    if len(safe_items) < len(items):
+        metrics.inc("pychiatrist_crisis_intercepts_total", len(items) - len(safe_items), endpoint="import")
+    # One batched classifier run for the whole batch, alongside retrieval and the model calls
+    tasks = sentiment_engine.start_batch([item.content for item in safe_items])
+    task_by_id = {item.id: task for item, task in zip(safe_items, tasks)}
+    contexts = await asyncio.to_thread(get_relevant_contexts, [item.content for item in safe_items])
+    context_by_id = {item.id: ctx for item, ctx in zip(safe_items, contexts)}
+    template = sentiment_engine.journal_template()
+
+    async def analyze_one(item):
+        async with workers:
+            try:
+                prompt, _ = assemble(template, context_by_id[item.id], PROMPT_BUDGET_IMPORT,
+                                     label="import", content=item.content)
+                full_text = await llm.generate(prompt, priority=BULK)
+                ai_msg, trailer = split_sentiment_trailer(full_text)
+                return ai_msg, await task_by_id[item.id].resolve(trailer), True
+            except Exception as e:
+                metrics.log_event("import_item_failed", job_id=item.job_id, item_id=item.id, error=str(e))
+                return "", dict(DEFAULT_SENTIMENT), False
+
+    async def crisis_result(message):
+        # Historical entries are still imported, but never sent to the model
+        return message, None, True
+
+    return await asyncio.gather(*[
+        crisis_result(msg) if is_crisis else analyze_one(item)
+        for item, (is_crisis, msg) in zip(items, flags)
+    ])
+
+
+def _store_batch(db, job, items, results):
+    """
+    Bulk-inserts entries, sentiments and their rollups and marks the items
+    done, all in one transaction. Returns the analysed entries' index rows.
+    """
+    entries = [
+        Entry(user_id=job.user_id, content=item.content, ai_response=ai_msg,
+              created_at=item.created_at or datetime.utcnow())
+        for item, (ai_msg, _, _) in zip(items, results)
+    ]
+    db.add_all(entries)
+    db.flush()  # Populates entry IDs with a single multi-row INSERT ... RETURNING
+
+    analyzed = [(entry, sentiment) for entry, (_, sentiment, _) in zip(entries, results) if sentiment is not None]
+    db.add_all([build_sentiment(entry.id, sentiment) for entry, sentiment in analyzed])
+    rollups.record_sentiments(db, [
+        (job.user_id, entry.created_at, sentiment["emotion"], sentiment["intensity"], sentiment["triggers"])
+        for entry, sentiment in analyzed
+    ])
+
+    db.execute(
+        update(ImportJobItem)
+        .where(ImportJobItem.id.in_([item.id for item in items]))
+        .values(done=True)
+    )
+    job.processed += len(items)
+    job.crisis_flagged += sum(1 for _, sentiment, _ in results if sentiment is None)
+    job.failed += sum(1 for _, _, ok in results if not ok)
+    data_versions.bump(db, job.user_id)
+    db.commit()
+    return [journal_index.index_row(entry) for entry, _ in analyzed]
+
+
+def _begin(db, job_id):
+    job = db.get(ImportJob, job_id)
+    job.status = "running"
+    job.error = None
+    db.commit()
+    return job
+
+
+def _next_batch(db, job_id, batch_size):
+    items = db.query(ImportJobItem)\
+        .filter(ImportJobItem.job_id == job_id, ImportJobItem.done == False)\
+        .order_by(ImportJobItem.seq)\
+        .limit(batch_size)\
+        .all()
+    db.commit()  # Hand the connection back while the batch waits on the model
+    return items
+
+
+def _finish(db, job_id, status, error=None):
+    db.rollback()
+    job = db.get(ImportJob, job_id)
+    if job is not None:
+        job.status = status
+        job.error = error
+        db.commit()
+
+
+async def run_job(job_id: int, batch_size=IMPORT_BATCH_SIZE, llm_workers=IMPORT_LLM_WORKERS):
+    """
+    Processes the job's remaining items batch by batch. Each batch commits
+    atomically with its items marked done, so an interrupted job resumes
+    exactly where it stopped. Database work runs in a thread so waiting for
+    the (single, on SQLite) writer connection never blocks the event loop.
+    """
+    workers = asyncio.Semaphore(llm_workers)
+    db = SessionLocal()
+    job = None
+    try:
+        job = await run_in_thread(_begin, db, job_id)
+        while True:
+            items = await run_in_thread(_next_batch, db, job_id, batch_size)
+            if not items:
+                break
+            results = await _analyze(items, workers)
+            indexed = await run_in_thread(_store_batch, db, job, items, results)
+            journal_index.schedule_upsert(indexed)
+        await run_in_thread(_finish, db, job_id, "completed")
+    except Exception as e:
+        metrics.log_event("import_job_failed", job_id=job_id, error=str(e))
+        await run_in_thread(_finish, db, job_id, "failed", str(e))
+    finally:
+        db.close()
+        _running.pop(job_id, None)
+        if job is not None:
+            # Imported entries change the user's suggested prompts and prediction
+            insight_jobs.entries_changed(job.user_id)
+
+
+def start_job(job_id: int):
+    """Schedules run_job on the running event loop unless it is already in progress."""
+    if job_id not in _running:
+        _running[job_id] = asyncio.create_task(run_job(job_id))
+    return _running[job_id]
+
+
+def resume_unfinished_jobs():
+    """Restarts jobs that were pending or running when the process last stopped."""
+    db = SessionLocal()
+    try:
+        job_ids = [job.id for job in db.query(ImportJob).filter(ImportJob.status.in_(["pending", "running"]))]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        metrics.log_event("import_job_resumed", job_id=job_id)
+        start_job(job_id)
+    return job_ids
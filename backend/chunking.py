@@ -0,0 +1,159 @@
+import os
+import re
+from pypdf import PdfReader
+
+import metrics
+
+# Configuration
+CHUNKER = os.getenv("CHUNKER", "sentence")  # "sentence" or "fixed"
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "128"))  # MiniLM was trained on 128 and truncates at 256 word pieces
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")  # or "approx"
+FIXED_CHUNK_SIZE = 500
+READ_BLOCK_SIZE = 64 * 1024
+MAX_SENTENCE_CHARS = 10_000  # Text with no punctuation at all is force-split past this
+
+# A sentence ends at . ! or ? followed by whitespace, at a heading line ending
+# in ':', or at a blank line (which also ends the paragraph).
+BOUNDARY = re.compile(r"(?<=[.!?])\s+|(?<=:)[ \t]*\n\s*|\n[ \t]*\n\s*")
+WORD_PIECE = re.compile(r"\w+|[^\w\s]")
+
+_token_counter = None
+
+
+def get_token_counter():
+    """
+    Returns a function counting MiniLM word pieces. Falls back to a cheap
+    estimate when the tokenizer cannot be loaded (or CHUNK_TOKENIZER=approx).
+    """
+    global _token_counter
+    if _token_counter is None:
+        if CHUNK_TOKENIZER != "approx":
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(CHUNK_TOKENIZER)
+                _token_counter = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+            except Exception as e:
+                metrics.log_event("tokenizer_unavailable", tokenizer=CHUNK_TOKENIZER, fallback="estimate", error=str(e))
+        if _token_counter is None:
+            # Word pieces run ~1.3 per word/punctuation mark for English prose
+            _token_counter = lambda text: int(len(WORD_PIECE.findall(text)) * 1.3) + 1
+    return _token_counter
+
+
+def iter_txt_segments(file_path, block_size=READ_BLOCK_SIZE):
+    """Yields a text file in fixed-size blocks instead of reading it whole."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            yield block
+
+
+def iter_pdf_segments(file_path):
+    """Yields a PDF one page at a time."""
+    reader = PdfReader(file_path)
+    for page in reader.pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def iter_sentences(segments):
+    """
+    Turns a stream of text segments into (sentence, ends_paragraph) pairs.
+    Only the unfinished tail sentence is buffered between segments.
+    """
+    buffer = ""
+    for segment in segments:
+        buffer += segment
+        start = 0
+        for match in BOUNDARY.finditer(buffer):
+            if match.end() == len(buffer):
+                break  # The boundary may continue into the next segment
+            sentence = buffer[start:match.start()].strip()
+            if sentence:
+                yield sentence, "\n" in match.group()
+            start = match.end()
+        buffer = buffer[start:]
+        while len(buffer) > MAX_SENTENCE_CHARS:
+            cut = buffer.rfind(" ", 0, MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+            yield buffer[:cut].strip(), False
+            buffer = buffer[cut:]
+    tail = buffer.strip()
+    if tail:
+        yield tail, True
+
+
+class FixedSizeChunker:
+    """The original strategy: raw slices of chunk_size characters."""
+
+    def __init__(self, chunk_size=FIXED_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.signature = f"fixed:{chunk_size}"
+
+    def chunks(self, segments):
+        buffer = ""
+        for segment in segments:
+            buffer += segment
+            while len(buffer) >= self.chunk_size:
+                yield buffer[:self.chunk_size]
+                buffer = buffer[self.chunk_size:]
+        if buffer:
+            yield buffer
+
+
+class SentenceChunker:
+    """
+    Packs whole sentences into chunks of at most max_tokens MiniLM tokens,
+    repeating up to overlap_tokens of trailing sentences at the start of the
+    next chunk. A paragraph break closes the chunk once it is half full, and
+    a single sentence longer than the budget is split on word boundaries.
+    """
+
+    def __init__(self, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, count_tokens=None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.count_tokens = count_tokens or get_token_counter()
+        self.signature = f"sentence:{max_tokens}:{self.overlap_tokens}"
+
+    def _split_long(self, sentence):
+        piece, total = [], 0
+        for word in sentence.split():
+            tokens = self.count_tokens(word)
+            if piece and total + tokens > self.max_tokens:
+                yield " ".join(piece)
+                piece, total = [], 0
+            piece.append(word)
+            total += tokens
+        if piece:
+            yield " ".join(piece)
+
+    def chunks(self, segments):
+        window = []  # (sentence, token_count)
+        total = 0
+        for sentence, ends_paragraph in iter_sentences(segments):
+            tokens = self.count_tokens(sentence)
+            if tokens > self.max_tokens:
+                if window:
+                    yield " ".join(s for s, _ in window)
+                    window, total = [], 0
+                yield from self._split_long(sentence)
+                continue
+
+            if window and total + tokens > self.max_tokens:
+                yield " ".join(s for s, _ in window)
+                # Carry trailing sentences over as overlap, as long as the new one still fits
+                while window and (total > self.overlap_tokens or total + tokens > self.max_tokens):
+                    total -= window.pop(0)[1]
+
+            window.append((sentence, tokens))
+            total += tokens
+            if ends_paragraph and total >= self.max_tokens // 2:
+                yield " ".join(s for s, _ in window)
+                window, total = [], 0
+        if window:
+            yield " ".join(s for s, _ in window)
+
+
+def get_chunker(name=CHUNKER):
+    if name == "fixed":
+        return FixedSizeChunker()
+    return SentenceChunker()
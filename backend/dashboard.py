@@ -0,0 +1,173 @@
+import asyncio
+from collections import Counter
+
+import rollups
+import analytics
+import insight_jobs
+import data_versions
+from database import AsyncReadSessionLocal
+from models import DailyMood, DailyEmotionCount, DailyTriggerCount
+from metrics import span
+
+# Everything the mood dashboard shows, built from one fetch of the window's
+# daily rollups and one of the stored background results, run concurrently.
+# Its ETag comes from the user's persisted data version (see data_versions.py)
+# and the window start, so revalidating an unchanged dashboard costs one
+# primary-key lookup, and every worker agrees on it.
+WINDOW_DAYS = 7
+DISTRIBUTION_TRIGGERS = 10
+
+NO_INSIGHTS = {
+    "top_emotion": "Neutral",
+    "stability": "Pending",
+    "trigger_summary": "Not enough data yet.",
+    "insight_message": "Document your first few days to see behavioral patterns."
+}
+
+
+def format_trend(daily):
+    """Chart points from [(day, average intensity, most frequent emotion)]."""
+    return [
+        {
+            "day": day.strftime("%a"),
+            "score": round(avg_score, 1),
+            "emotion": top_emotion,
+            "full_date": day.isoformat()
+        } for day, avg_score, top_emotion in daily
+    ]
+
+
+def format_insights(summary):
+    """The insights card from an analytics.insights() summary (None without data)."""
+    if summary is None:
+        return dict(NO_INSIGHTS)
+    top_emotion = summary["top_emotion"]
+    level = analytics.stability(summary["variance"])
+    top_triggers = summary["top_triggers"]
+    trigger_summary = ", ".join([t[:15] + ".." if len(t) > 17 else t for t in top_triggers]) if top_triggers else "None identified"
+    return {
+        "top_emotion": top_emotion,
+        "stability": level,
+        "trigger_summary": trigger_summary,
+        "insight_message": f"Your emotional landscape is currently dominated by {top_emotion.lower()} states with {level.lower()} stability."
+    }
+
+
+def format_distribution(counts):
+    return [{"name": name, "value": count} for name, count in counts]
+
+
+def load_window(db, user_id, days=WINDOW_DAYS):
+    """
+    The window's rollup rows in three queries, reduced to what every card
+    needs: daily moods as rollups.daily_moods returns them, the
+    (count, mean, variance) of rollups.mood_summary, and emotion and trigger
+    Counters with the same tie order as the per-card queries.
+    """
+    start = rollups.window_start(days)
+    moods = db.query(DailyMood.day, DailyMood.entry_count, DailyMood.intensity_sum, DailyMood.intensity_sq_sum)\
+        .filter(DailyMood.user_id == user_id, DailyMood.day >= start)\
+        .order_by(DailyMood.day)\
+        .all()
+    emotion_rows = db.query(DailyEmotionCount.day, DailyEmotionCount.emotion, DailyEmotionCount.count)\
+        .filter(DailyEmotionCount.user_id == user_id, DailyEmotionCount.day >= start)\
+        .order_by(DailyEmotionCount.emotion)\
+        .all()
+    trigger_rows = db.query(DailyTriggerCount.trigger, DailyTriggerCount.count)\
+        .filter(DailyTriggerCount.user_id == user_id, DailyTriggerCount.day >= start)\
+        .order_by(DailyTriggerCount.trigger)\
+        .all()
+
+    top_emotion = {}
+    emotions = Counter()
+    for day, emotion, count in emotion_rows:
+        emotions[emotion] += count
+        best = top_emotion.get(day)
+        if best is None or (count, emotion) > best:
+            top_emotion[day] = (count, emotion)
+    triggers = Counter()
+    for trigger, count in trigger_rows:
+        triggers[trigger] += count
+
+    count = sum(n for _, n, _, _ in moods)
+    mean = variance = None
+    if count:
+        mean = sum(s for _, _, s, _ in moods) / count
+        variance = max(sum(sq for _, _, _, sq in moods) / count - mean ** 2, 0.0)
+    return {
+        "start": start,
+        "daily": [(day, total / n, top_emotion.get(day, (0, None))[1]) for day, n, total, _ in moods if n],
+        "count": count,
+        "mean": mean,
+        "variance": variance,
+        "emotions": emotions,
+        "triggers": triggers
+    }
+
+
+def make_etag(user_id, version, window_start):
+    everyone, own = version
+    return f'W/"{user_id}-{everyone}.{own}-{window_start:%Y%m%d}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against our ETag."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+def cache_headers(etag):
+    # no-cache: the browser keeps the body but revalidates it on every load
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+async def current_etag(user_id):
+    """The ETag the user's dashboard has right now, from one lookup of their data version."""
+    async with AsyncReadSessionLocal() as db:
+        version = await db.run_sync(data_versions.current, user_id)
+    return make_etag(user_id, version, rollups.window_start(WINDOW_DAYS))
+
+
+async def build(user_id: int, etag=None):
+    """
+    Returns (dashboard, etag): the rollup cards and the background results,
+    fetched concurrently. Pass the ETag if it was just read; it must be read
+    before building, so a change landing meanwhile gives the next request a
+    different tag.
+    """
+    if etag is None:
+        etag = await current_etag(user_id)
+
+    async def window():
+        with span("dashboard.window"):
+            async with AsyncReadSessionLocal() as db:
+                return await db.run_sync(load_window, user_id, WINDOW_DAYS)
+
+    async def results():
+        with span("dashboard.results"):
+            async with AsyncReadSessionLocal() as db:
+                return await insight_jobs.get_results(db, user_id)
+
+    data, (stored, _) = await asyncio.gather(window(), results())
+
+    summary = None
+    if data["count"]:
+        summary = {
+            "variance": data["variance"],
+            "top_emotion": data["emotions"].most_common(1)[0][0] if data["emotions"] else "Neutral",
+            "top_triggers": [name for name, _ in data["triggers"].most_common(analytics.TOP_TRIGGERS)]
+        }
+    prompts = stored.get(insight_jobs.SUGGESTED_PROMPTS)
+    prediction = stored.get(insight_jobs.MOOD_PREDICTION)
+    dashboard = {
+        "mood_trend": format_trend(data["daily"]),
+        "mood_stats": {"average_mood_7d": round(data["mean"], 2) if data["mean"] else 0.0},
+        "insights": format_insights(summary),
+        "trigger_distribution": format_distribution(data["triggers"].most_common(DISTRIBUTION_TRIGGERS)),
+        "suggested_prompts": prompts[0] if prompts else insight_jobs.FALLBACK_PROMPTS,
+        "mood_prediction": insight_jobs.FALLBACK_PREDICTION if prediction is None else
+        {**prediction[0], "computed_at": prediction[1].isoformat(), "stale": prediction[2]}
+    }
+    return dashboard, etag
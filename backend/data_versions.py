@@ -0,0 +1,27 @@
+from sqlalchemy import select
+
+import database  # Imports this module in turn, so only use its attributes at call time
+from models import DataVersion
+
+# Persisted per-user change counters. Every write that changes what the
+# dashboard shows bumps the user's counter inside its own transaction, so
+# the dashboard ETag can be checked against the database with one
+# primary-key lookup, and stays right across workers, restarts and
+# command-line tools (rollups.py, the sentiment relabel, migrations).
+EVERYONE = 0
+
+
+def bump(db, user_id=None):
+    """Increments the user's counter (everyone's when user_id is None); the caller commits."""
+    stmt = database.dialect_insert(db, DataVersion).values(user_id=EVERYONE if user_id is None else user_id, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id"], set_={"version": DataVersion.version + 1}
+    ))
+
+
+def current(db, user_id):
+    """(everyone's counter, the user's counter): changes whenever their dashboard data may have."""
+    versions = dict(db.execute(
+        select(DataVersion.user_id, DataVersion.version).where(DataVersion.user_id.in_((EVERYONE, user_id)))
+    ).all())
+    return versions.get(EVERYONE, 0), versions.get(user_id, 0)
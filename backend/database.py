@@ -1,17 +1,143 @@
-from sqlalchemy import create_engine, func
+from sqlalchemy import create_engine, event, make_url
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime, timedelta
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import os
-from models import Base, Entry, Sentiment, User
+import asyncio
+from models import Base, Entry, Sentiment, SentimentTrigger, User
+import rollups
+import data_versions
+import migrations
+import metrics
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'pychiatrist.db')}"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Configuration
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'pychiatrist.db')}")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+SQLITE_READ_MAX_OVERFLOW = int(os.getenv("SQLITE_READ_MAX_OVERFLOW", "32"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _sqlite_pragmas(dbapi_connection, read_only):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    else:
+        # Persisted in the file, so readers pick it up without taking the lock themselves
+        cursor.execute("PRAGMA journal_mode=WAL")  # Readers no longer block the writer, or vice versa
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Safe under WAL; fsync at checkpoints only
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+def create_engines(url=DATABASE_URL):
+    """
+    Returns (write_engine, read_engine) for a database URL.
+
+    SQLite: WAL mode with one pooled writer connection, so in-process writers
+    queue on the pool instead of failing with "database is locked", and a
+    separate pool of query-only readers. Writes start with BEGIN IMMEDIATE so
+    the write lock is taken up front and busy_timeout covers other processes.
+
+    Anything else (e.g. postgresql+psycopg://, with the driver installed):
+    one engine with a sized pool and pre-ping, used for both reads and writes.
+    """
+    if not url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+        return engine, engine
+
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    writer = create_engine(url, connect_args=connect_args, poolclass=QueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT)
+    reader = create_engine(url, connect_args=connect_args, poolclass=QueuePool, pool_size=SQLITE_READ_POOL_SIZE,
+                           max_overflow=SQLITE_READ_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+
+    @event.listens_for(writer, "connect")
+    def on_writer_connect(dbapi_connection, _):
+        _sqlite_pragmas(dbapi_connection, read_only=False)
+        # Let SQLAlchemy issue BEGIN itself instead of pysqlite's implicit deferred one
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(writer, "begin")
+    def on_writer_begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(reader, "connect")
+    def on_reader_connect(dbapi_connection, _):
+        _sqlite_pragmas(dbapi_connection, read_only=True)
+
+    return writer, reader
+
+
+# Async drivers for the same databases; only reads go through them, writes
+# stay on the single sync writer above
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_url(url):
+    """Maps a database URL onto its async driver, e.g. sqlite:// -> sqlite+aiosqlite://."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def create_async_read_engine(url=DATABASE_URL):
+    """Async engine for the read endpoints, sized and tuned like the sync reader pool."""
+    if not url.startswith("sqlite"):
+        return create_async_engine(
+            async_url(url),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+
+    engine = create_async_engine(
+        async_url(url),
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=SQLITE_READ_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, _):
+        _sqlite_pragmas(dbapi_connection, read_only=True)
+
+    return engine
+
+
+engine, read_engine = create_engines()
+# Objects stay readable after commit without a reload, so a session hands its
+# connection back to the pool as soon as it commits
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+async_read_engine = create_async_read_engine()
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+metrics.instrument_engine(engine, "writer")
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine, "reader")
+metrics.instrument_engine(async_read_engine.sync_engine, "async_reader")
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
     db = SessionLocal()
     # Create a default user if it doesn't exist
     if not db.query(User).filter(User.id == 1).first():
@@ -27,15 +153,71 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Session for endpoints that only read; on SQLite it comes from the reader pool."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """
+    Async session for read endpoints. Queries await the driver instead of
+    blocking the event loop; shared sync helpers run through
+    `await db.run_sync(fn, ...)`.
+    """
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def dialect_insert(db, model):
+    """Dialect-specific INSERT for `db`'s database, so writes can use ON CONFLICT DO UPDATE."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+async def run_in_thread(fn, *args):
+    """
+    Runs blocking database work in a thread, off the event loop. If the
+    caller is cancelled meanwhile (a stopped import, a client that went
+    away), the thread's transaction is allowed to finish before the
+    cancellation propagates and the session is closed.
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await asyncio.wait([task])
+        raise
+
 def calculate_average_mood(db, user_id: int):
     """Calculates a user's 'Average Mood' (intensity score) over the last 7 days."""
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    # Query for intensities within the last 7 days for the user
-    avg_score = db.query(func.avg(Sentiment.intensity_score))\
-        .join(Entry, Sentiment.entry_id == Entry.id)\
-        .filter(Entry.user_id == user_id)\
-        .filter(Entry.created_at >= seven_days_ago)\
-        .scalar()
-    
+    _, avg_score, _ = rollups.mood_summary(db, user_id, days=7)
     return round(avg_score, 2) if avg_score else 0.0
+
+def build_sentiment(entry_id: int, sentiment: dict):
+    """Sentiment row for a parsed sentiment dict, with its triggers normalized into sentiment_triggers."""
+    return Sentiment(
+        entry_id=entry_id,
+        primary_emotion=sentiment["emotion"],
+        intensity_score=sentiment["intensity"],
+        triggers=sentiment["triggers"],
+        trigger_list=[SentimentTrigger(name=name) for name in rollups.split_triggers(sentiment["triggers"])]
+    )
+
+def save_journal_entry(db, user_id: int, content: str, ai_response: str, sentiment: dict):
+    """
+    Stores a journal entry together with its sentiment analysis and returns
+    the entry. The entry, sentiment and daily rollup update share one transaction.
+    """
+    new_entry = Entry(user_id=user_id, content=content, ai_response=ai_response)
+    db.add(new_entry)
+    db.flush()
+
+    db.add(build_sentiment(new_entry.id, sentiment))
+    rollups.record_sentiment(db, user_id, new_entry.created_at, sentiment)
+    data_versions.bump(db, user_id)
+    db.commit()
+    return new_entry
@@ -0,0 +1,148 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+# Configuration
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch", or "onnx" (needs optimum[onnxruntime])
+# ONNX file within the model repo; e.g. "onnx/model_quint8_avx2.onnx" for int8 weights. Empty uses onnx/model.onnx
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # Intra-op CPU threads; 0 keeps the library default
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "2"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+
+
+def load_model(model_name, backend=EMBEDDING_BACKEND, onnx_file=EMBEDDING_ONNX_FILE, threads=EMBEDDING_THREADS):
+    """Loads the sentence-transformers model for CPU inference with torch or ONNX Runtime."""
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if onnx_file:
+            model_kwargs["file_name"] = onnx_file
+        if threads:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = options
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    if threads:
+        import torch
+        torch.set_num_threads(threads)  # Process-wide, so the cross-encoder shares the setting
+    return SentenceTransformer(model_name, device="cpu")
+
+
+class EmbeddingService:
+    """
+    One model shared by retrieval, ingest and anything else that embeds.
+    Small requests (a query per API request) are queued, and a worker thread
+    runs everything that arrives within `wait_ms` of the first one - plus
+    whatever queued up during the previous forward pass - as one batch of up
+    to `max_batch` texts. A request that is already `max_batch` texts or
+    more runs directly in the caller's thread. Returns float32 NumPy arrays.
+    """
+
+    def __init__(self, model, wait_ms=EMBEDDING_BATCH_WAIT_MS, max_batch=EMBEDDING_MAX_BATCH):
+        self.model = model
+        self.wait_ms = wait_ms
+        self.max_batch = max_batch
+        self.dimension = model.get_sentence_embedding_dimension()
+        self._queue = queue.Queue()  # (texts, future)
+        self._worker = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.largest_batch = 0
+
+    def encode(self, texts):
+        """One forward pass (chunked into max_batch) for `texts`, in the calling thread."""
+        embeddings = self.model.encode(list(texts), batch_size=self.max_batch, convert_to_numpy=True,
+                                       normalize_embeddings=False, show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.dimension)
+
+    def embed(self, texts):
+        """Embeddings for `texts` as an (n, dimension) array, sharing a forward pass with concurrent callers."""
+        texts = list(texts)
+        with self._lock:
+            self.requests += 1
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if len(texts) >= self.max_batch:
+            return self.encode(texts)
+        future = Future()
+        self._queue.put((texts, future))
+        self._ensure_worker()
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.wait_ms / 1000
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._encode_batch(batch, size)
+
+    def _encode_batch(self, batch, size):
+        try:
+            embeddings = self.encode([text for texts, _ in batch for text in texts])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.batched_texts += size
+            self.largest_batch = max(self.largest_batch, size)
+        offset = 0
+        for texts, future in batch:
+            future.set_result(embeddings[offset:offset + len(texts)])
+            offset += len(texts)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else None,
+                "largest_batch": self.largest_batch,
+                "queued": self._queue.qsize()
+            }
+
+
+class ServiceEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """
+    Chroma embedding function backed by the shared service. Reports the same
+    name and config as the plain sentence-transformers one, so collections
+    created before the service existed open unchanged.
+    """
+
+    def __init__(self, service, model_name):
+        # Chroma rebuilds the function from the stored config when it opens the
+        # collection; seeding the class-level model cache keeps that from loading MiniLM again
+        self.models[model_name] = service.model
+        self._model = service.model
+        self.service = service
+        self.model_name = model_name
+        self.device = "cpu"
+        self.normalize_embeddings = False
+        self.kwargs = {}
+
+    def __call__(self, input):
+        return list(self.service.embed(input))
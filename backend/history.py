@@ -0,0 +1,115 @@
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload, load_only
+
+from models import Entry
+
+# Fields a client can ask for; id and created_at are always loaded because the cursor needs them
+HISTORY_FIELDS = ("id", "content", "ai_response", "created_at", "sentiment")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+
+
+def parse_fields(fields: str = None):
+    """Turns "id,created_at,sentiment" into a tuple of known fields; None means all of them."""
+    if not fields:
+        return HISTORY_FIELDS
+    requested = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in requested if f not in HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def encode_cursor(entry):
+    raw = f"{entry.created_at.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Returns the (created_at, id) position a cursor points after; raises ValueError if malformed."""
+    try:
+        created_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def serialize_entry(e, fields):
+    item = {}
+    if "id" in fields:
+        item["id"] = e.id
+    if "content" in fields:
+        item["content"] = e.content
+    if "ai_response" in fields:
+        item["ai_response"] = e.ai_response
+    if "created_at" in fields:
+        item["created_at"] = e.created_at.isoformat()
+    if "sentiment" in fields:
+        item["sentiment"] = {
+            "emotion": e.sentiment.primary_emotion if e.sentiment else "Unknown",
+            "intensity": e.sentiment.intensity_score if e.sentiment else 0,
+            "triggers": e.sentiment.triggers if e.sentiment else ""
+        }
+    return item
+
+
+def page_query(db, user_id: int, limit: int, after=None, fields=HISTORY_FIELDS):
+    """
+    One page of a user's entries, newest first, as a single query: keyset
+    pagination on (created_at, id) so deep pages cost the same as the first,
+    sentiment joined eagerly, and unrequested text columns never loaded.
+    """
+    columns = [Entry.id, Entry.user_id, Entry.created_at]
+    columns += [getattr(Entry, f) for f in ("content", "ai_response") if f in fields]
+    query = db.query(Entry)\
+        .options(load_only(*columns))\
+        .filter(Entry.user_id == user_id)
+    if "sentiment" in fields:
+        query = query.options(joinedload(Entry.sentiment))
+    if after is not None:
+        query = query.filter(tuple_(Entry.created_at, Entry.id) < after)
+    return query.order_by(Entry.created_at.desc(), Entry.id.desc()).limit(limit)
+
+
+def fetch_page(db, user_id: int, limit: int, after=None, fields=HISTORY_FIELDS):
+    return page_query(db, user_id, limit, after, fields).all()
+
+
+def history_page(db, user_id: int, limit: int, cursor: str = None, fields=HISTORY_FIELDS, include_total=False):
+    after = decode_cursor(cursor) if cursor else None
+    # Ask for one extra row to learn whether another page exists
+    entries = fetch_page(db, user_id, limit + 1, after, fields)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    page = {
+        "items": [serialize_entry(e, fields) for e in entries],
+        "next_cursor": encode_cursor(entries[-1]) if has_more else None
+    }
+    if include_total:
+        page["total"] = db.query(func.count(Entry.id)).filter(Entry.user_id == user_id).scalar()
+    return page
+
+
+def iter_history_ndjson(session_factory, user_id: int, fields=HISTORY_FIELDS, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields every entry as one NDJSON line, walking the history in keyset
+    batches. Each batch is expunged before the next is loaded, so memory
+    stays at one batch however long the history is.
+    """
+    db = session_factory()
+    try:
+        after = None
+        while True:
+            entries = fetch_page(db, user_id, batch_size, after, fields)
+            if not entries:
+                break
+            yield "".join(json.dumps(serialize_entry(e, fields)) + "\n" for e in entries)
+            after = (entries[-1].created_at, entries[-1].id)
+            db.expunge_all()
+    finally:
+        db.close()
@@ -1,76 +1,217 @@
 import os
-import chromadb
-from chromadb.utils import embedding_functions
-from pypdf import PdfReader
-import uuid
+import json
+import hashlib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from retrieval_runtime import get_collection, get_embedding_service, bump_collection_version, COLLECTION_NAME, CHROMA_DB_DIR, BM25_INDEX_PATH
+from chunking import get_chunker, iter_pdf_segments, iter_txt_segments, CHUNKER
+from bm25_index import BM25Index
 
 # Configuration
 KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(__file__), "..", "knowledge_base")
-CHROMA_DB_DIR = os.path.join(os.path.dirname(__file__), "chroma_db")
-COLLECTION_NAME = "clinical_knowledge"
-
-# Initialize ChromaDB
-client = chromadb.PersistentClient(path=CHROMA_DB_DIR)
-
-# Use Sentence-Transformers for local embeddings
-# This will download the model 'all-MiniLM-L6-v2' on first run
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-
-collection = client.get_or_create_collection(
-    name=COLLECTION_NAME,
-    embedding_function=sentence_transformer_ef
-)
-
-def chunk_text(text, chunk_size=500):
-    """Splits text into chunks of roughly chunk_size characters."""
-    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
-
-def process_pdf(file_path):
-    """Extracts text from a PDF file."""
-    reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
-
-def process_txt(file_path):
-    """Reads text from a TXT file."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        return f.read()
-
-def ingest_knowledge():
-    """Processes all files in the knowledge_base directory and stores chunks in ChromaDB."""
-    if not os.path.exists(KNOWLEDGE_BASE_DIR):
-        print(f"Directory {KNOWLEDGE_BASE_DIR} not found.")
+MANIFEST_PATH = os.path.join(CHROMA_DB_DIR, "ingest_manifest.json")
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+def extract_chunks(file_path, chunker_name=CHUNKER):
+    """
+    Streams a supported file through the chunker and returns its chunks.
+    Runs inside the worker pool; the full text is never held as one string.
+    """
+    chunker = get_chunker(chunker_name)
+    if file_path.endswith(".pdf"):
+        return list(chunker.chunks(iter_pdf_segments(file_path)))
+    return list(chunker.chunks(iter_txt_segments(file_path)))
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_ids(filename, chunks):
+    """
+    Deterministic IDs from the chunk content, so re-ingesting unchanged text
+    is a no-op and edits only touch the chunks that actually changed.
+    Repeated identical chunks within a file get an occurrence suffix.
+    """
+    seen = Counter()
+    ids = []
+    for chunk in chunks:
+        content_hash = hashlib.sha256(f"{filename}\0{chunk}".encode("utf-8")).hexdigest()[:32]
+        ids.append(f"{content_hash}-{seen[content_hash]}")
+        seen[content_hash] += 1
+    return ids
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def find_changes(knowledge_dir, manifest, chunker_signature):
+    """
+    Compares the directory against the manifest. Files whose mtime and size
+    match are skipped without being read; otherwise the content hash decides.
+    Files chunked with different chunker settings always count as changed.
+    Returns (changed, deleted, current) where current maps filename -> stat info.
+    """
+    current = {}
+    changed = []
+    for filename in sorted(os.listdir(knowledge_dir)):
+        if not filename.endswith(SUPPORTED_EXTENSIONS):
+            continue
+        file_path = os.path.join(knowledge_dir, filename)
+        stat = os.stat(file_path)
+        info = {"mtime": stat.st_mtime, "size": stat.st_size, "chunker": chunker_signature}
+        previous = manifest.get(filename)
+        if previous and previous["mtime"] == info["mtime"] and previous["size"] == info["size"]:
+            info["sha256"] = previous["sha256"]
+        else:
+            info["sha256"] = file_sha256(file_path)
+        if not previous or previous["sha256"] != info["sha256"] or previous.get("chunker") != chunker_signature:
+            changed.append(filename)
+        current[filename] = info
+    deleted = [filename for filename in manifest if filename not in current]
+    return changed, deleted, current
+
+def _add_in_batches(collection, documents, ids, metadatas, batch_size):
+    # Embedded by the same service the API queries with, one forward pass per batch
+    service = get_embedding_service()
+    for start in range(0, len(ids), batch_size):
+        batch = documents[start:start + batch_size]
+        collection.add(
+            documents=batch,
+            embeddings=service.embed(batch),
+            ids=ids[start:start + batch_size],
+            metadatas=metadatas[start:start + batch_size]
+        )
+
+def load_bm25_index(collection, bm25_path, manifest):
+    """
+    The keyword index to update alongside the collection. A store ingested
+    before the index existed gets it built from the collection's contents.
+    """
+    if os.path.exists(bm25_path):
+        return BM25Index.load(bm25_path), False
+    if manifest:
+        print("Building the BM25 index from the existing collection...")
+        return BM25Index.from_collection(collection), True
+    return BM25Index(), False
+
+def ingest_knowledge(knowledge_dir=KNOWLEDGE_BASE_DIR, collection=None, manifest_path=MANIFEST_PATH,
+                     batch_size=EMBED_BATCH_SIZE, workers=INGEST_WORKERS, rebuild=False, chunker_name=CHUNKER,
+                     bm25_path=BM25_INDEX_PATH):
+    """
+    Brings the collection and its BM25 keyword index in line with the
+    knowledge_base directory. Only new or modified files are re-chunked and
+    only their new chunks are embedded; chunks of edited or deleted files
+    are removed. Returns a summary dict.
+    """
+    if not os.path.exists(knowledge_dir):
+        print(f"Directory {knowledge_dir} not found.")
         return
 
-    files = os.listdir(KNOWLEDGE_BASE_DIR)
-    if not files:
+    collection = collection or get_collection()
+    manifest = load_manifest(manifest_path)
+    bm25, bm25_built = load_bm25_index(collection, bm25_path, manifest)
+    chunker_signature = get_chunker(chunker_name).signature
+    changed, deleted, current = find_changes(knowledge_dir, {} if rebuild else manifest, chunker_signature)
+    if rebuild:
+        # Re-ingest everything as untracked, but still drop files that disappeared
+        deleted = [filename for filename in manifest if filename not in current]
+        manifest = {filename: manifest[filename] for filename in deleted}
+    if not current and not deleted:
         print("No files found in knowledge_base.")
         return
 
-    for filename in files:
-        file_path = os.path.join(KNOWLEDGE_BASE_DIR, filename)
+    summary = {"changed": len(changed), "deleted": len(deleted), "added_chunks": 0, "removed_chunks": 0}
+
+    for filename in deleted:
+        collection.delete(ids=manifest[filename]["chunk_ids"])
+        bm25.remove(manifest[filename]["chunk_ids"])
+        summary["removed_chunks"] += len(manifest[filename]["chunk_ids"])
+        del manifest[filename]
+        print(f"Removed {filename} from collection '{COLLECTION_NAME}'.")
+
+    # Text extraction (PDF parsing in particular) is CPU bound, so fan out over processes
+    paths = [os.path.join(knowledge_dir, filename) for filename in changed]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            extracted = list(pool.map(
+                extract_chunks, paths, [chunker_name] * len(paths),
+                chunksize=max(1, len(paths) // (workers * 4))
+            ))
+    else:
+        extracted = [extract_chunks(path, chunker_name) for path in paths]
+
+    documents, ids, metadatas = [], [], []
+    for filename, chunks in zip(changed, extracted):
         print(f"Processing {filename}...")
-        
-        content = ""
-        if filename.endswith(".pdf"):
-            content = process_pdf(file_path)
-        elif filename.endswith(".txt"):
-            content = process_txt(file_path)
+        new_ids = chunk_ids(filename, chunks)
+        if filename in manifest:
+            old_ids = set(manifest[filename]["chunk_ids"])
+            stale = list(old_ids.difference(new_ids))
         else:
-            continue
+            # Not tracked yet: clear anything a previous, non-incremental ingest left behind
+            old_ids = set()
+            stale = None
+            collection.delete(where={"source": filename})
+            bm25.remove_source(filename)
 
-        chunks = chunk_text(content)
-        ids = [str(uuid.uuid4()) for _ in chunks]
-        metadatas = [{"source": filename} for _ in chunks]
-        
-        collection.add(
-            documents=chunks,
-            ids=ids,
-            metadatas=metadatas
-        )
-        print(f"Added {len(chunks)} chunks from {filename} to collection '{COLLECTION_NAME}'.")
+        if stale:
+            collection.delete(ids=stale)
+            bm25.remove(stale)
+            summary["removed_chunks"] += len(stale)
+
+        for chunk_id, chunk in zip(new_ids, chunks):
+            if chunk_id not in old_ids:
+                documents.append(chunk)
+                ids.append(chunk_id)
+                metadatas.append({"source": filename})
+                bm25.add([chunk_id], [chunk], [{"source": filename}])
+
+        manifest[filename] = {**current[filename], "chunk_ids": new_ids}
+        print(f"Queued {len(chunks)} chunks from {filename} for collection '{COLLECTION_NAME}'.")
+
+        if len(ids) >= batch_size:
+            flush = len(ids) - len(ids) % batch_size
+            _add_in_batches(collection, documents[:flush], ids[:flush], metadatas[:flush], batch_size)
+            summary["added_chunks"] += flush
+            documents, ids, metadatas = documents[flush:], ids[flush:], metadatas[flush:]
+
+    _add_in_batches(collection, documents, ids, metadatas, batch_size)
+    summary["added_chunks"] += len(ids)
+
+    # Unchanged files may have a new mtime; record it so they are not re-hashed next run
+    for filename, info in current.items():
+        if filename in manifest:
+            manifest[filename].update(info)
+    save_manifest(manifest, manifest_path)
+
+    if changed or deleted or bm25_built:
+        bm25.save(bm25_path)
+        # Invalidate retrieval caches in running API processes
+        bump_collection_version()
+    print(f"Ingest complete: {summary}")
+    return summary
 
 if __name__ == "__main__":
-    ingest_knowledge()
+    parser = argparse.ArgumentParser(description="Incrementally ingest knowledge_base/ into ChromaDB.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the manifest and re-ingest every file.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--chunker", choices=["sentence", "fixed"], default=CHUNKER)
+    args = parser.parse_args()
+    ingest_knowledge(batch_size=args.batch_size, workers=args.workers, rebuild=args.rebuild, chunker_name=args.chunker)
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import random
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func
+
+from database import SessionLocal, ReadSessionLocal
+from models import Entry, DerivedInsight
+from llm_client import llm, BACKGROUND
+from response_cache import response_cache, make_key
+from prompt_assembly import assemble, PROMPT_BUDGET_SUGGESTED_PROMPTS
+import prompts
+import analytics
+import data_versions
+import journal_index
+import metrics
+
+# Configuration
+INSIGHT_DEBOUNCE_SECONDS = float(os.getenv("INSIGHT_DEBOUNCE_SECONDS", "5"))
+INSIGHT_WORKERS = int(os.getenv("INSIGHT_WORKERS", "2"))
+INSIGHT_MAX_ATTEMPTS = int(os.getenv("INSIGHT_MAX_ATTEMPTS", "4"))
+INSIGHT_RETRY_BASE_SECONDS = float(os.getenv("INSIGHT_RETRY_BASE_SECONDS", "2"))
+# After a user's job gives up, reads wait this long before queueing another one
+INSIGHT_FAILURE_COOLDOWN_SECONDS = float(os.getenv("INSIGHT_FAILURE_COOLDOWN_SECONDS", "300"))
+# Prompt inputs: the newest entries plus the older ones the journal index finds
+# closest to the newest, instead of a fixed slice of history
+PROMPT_RECENT_ENTRIES = int(os.getenv("PROMPT_RECENT_ENTRIES", "2"))
+PROMPT_SIMILAR_ENTRIES = int(os.getenv("PROMPT_SIMILAR_ENTRIES", "3"))
+PREDICTION_RECENT_ENTRIES = int(os.getenv("PREDICTION_RECENT_ENTRIES", "7"))
+PREDICTION_SIMILAR_ENTRIES = int(os.getenv("PREDICTION_SIMILAR_ENTRIES", "5"))
+
+SUGGESTED_PROMPTS = "suggested_prompts"
+MOOD_PREDICTION = "mood_prediction"
+KINDS = (SUGGESTED_PROMPTS, MOOD_PREDICTION)
+
+STARTER_PROMPTS = [
+    "What is one thing you're looking forward to this week?",
+    "Describe a moment today that made you feel peaceful."
+]
+FALLBACK_PROMPTS = [
+    {"prompt": "What's on your mind today?", "starter": "Right now, I'm thinking about..."},
+    {"prompt": "How are you feeling?", "starter": "Today has felt..."},
+]
+FALLBACK_PREDICTION = {
+    "prediction": "Predictive engine warming up. Check back soon.",
+    "advice": ["Maintain consistent journaling", "Monitor sleep patterns", "Engage in light physical activity"],
+    "status": "fallback"
+}
+
+
+async def generate_suggested_prompts(recent_contents):
+    """Three personalized focus prompts from the user's latest entries; raises if the model output is unusable."""
+    if not recent_contents:
+        return STARTER_PROMPTS
+
+    # Newest entries first, so the budget drops the oldest
+    prompt, _ = assemble(prompts.SUGGESTED_PROMPTS, [{"content": content} for content in recent_contents],
+                         PROMPT_BUDGET_SUGGESTED_PROMPTS)
+
+    async def generate_prompts():
+        text = await llm.generate(prompt, priority=BACKGROUND)
+        # Clean up in case Gemini wraps in ```json
+        text = text.strip()
+        if text.startswith("```json"):
+            text = text[7:-3].strip()
+        return json.dumps(json.loads(text))  # Only well-formed JSON reaches the cache
+
+    # Same recent entries, same prompt: reuse the earlier generation
+    key = make_key(prompts.SUGGESTED_PROMPTS.version, [], prompt)
+    return json.loads(await response_cache.get_or_compute(key, generate_prompts))[:3]
+
+
+async def generate_mood_prediction(history_rows):
+    """3-day forecast and advice from [(created_at, emotion, intensity)]; raises if the model output is unusable."""
+    if len(history_rows) < 3:
+        return {"prediction": "Insufficient data for clinical prediction. Keep journaling!", "status": "accumulating"}
+
+    rows = [{"date": created_at.date(), "emotion": emotion, "intensity": intensity}
+            for created_at, emotion, intensity in history_rows]
+    # A fortnight of one-line rows: small, and every row matters to the trend
+    prompt, _ = assemble(prompts.MOOD_PREDICTION, rows, dedupe=False)
+
+    async def generate_prediction():
+        text = await llm.generate(prompt, priority=BACKGROUND)
+        # Clean up possible markdown code blocks from response
+        text = text.strip().replace('```json', '').replace('```', '')
+        return json.dumps(json.loads(text))
+
+    key = make_key(prompts.MOOD_PREDICTION.version, [], prompt)
+    data = json.loads(await response_cache.get_or_compute(key, generate_prediction))
+    return {"prediction": data.get("prediction"), "advice": data.get("advice", []), "status": "ready"}
+
+
+def latest_entry_id(db, user_id):
+    return db.query(func.max(Entry.id)).filter(Entry.user_id == user_id).scalar()
+
+
+def load_inputs(db, user_id):
+    """
+    Returns (latest entry id, entry texts, prediction history) for one
+    recompute. The texts are the newest PROMPT_RECENT_ENTRIES entries, then
+    the older entries most similar to the newest one, topped up with the next
+    most recent; the history is the last PREDICTION_RECENT_ENTRIES analysed
+    entries plus the similar ones. Without the journal index, it is the last
+    five entries and the prediction_history() rows.
+    """
+    candidates = PROMPT_RECENT_ENTRIES + PROMPT_SIMILAR_ENTRIES
+    recent = db.query(Entry.id, Entry.content)\
+        .filter(Entry.user_id == user_id)\
+        .order_by(Entry.created_at.desc())\
+        .limit(max(candidates, 5))\
+        .all()
+    latest = latest_entry_id(db, user_id)
+    if recent and journal_index.JOURNAL_INDEX_ENABLED:
+        try:
+            newest = [(row.id, row.content) for row in recent[:PROMPT_RECENT_ENTRIES]]
+            similar = journal_index.similar_entries(
+                db, user_id, recent[0].content, k=max(PROMPT_SIMILAR_ENTRIES, PREDICTION_SIMILAR_ENTRIES),
+                exclude=[entry_id for entry_id, _ in newest]
+            )
+            picked = [(entry.id, entry.content) for entry, _ in similar[:PROMPT_SIMILAR_ENTRIES]]
+            chosen = {entry_id for entry_id, _ in newest + picked}
+            top_up = [(row.id, row.content) for row in recent if row.id not in chosen][:candidates - len(chosen)]
+            history = analytics.prediction_rows(db, user_id, PREDICTION_RECENT_ENTRIES,
+                                                [entry.id for entry, _ in similar[:PREDICTION_SIMILAR_ENTRIES]])
+            return latest, [content for _, content in newest + picked + top_up], history
+        except Exception as e:
+            metrics.log_event("journal_index_unavailable", user_id=user_id, fallback="recent_history", error=str(e))
+    return latest, [content for _, content in recent[:5]], analytics.prediction_history(db, user_id)
+
+
+def store_results(db, user_id, source_entry_id, results):
+    now = datetime.utcnow()
+    for kind, payload in results.items():
+        db.merge(DerivedInsight(user_id=user_id, kind=kind, payload=json.dumps(payload),
+                                source_entry_id=source_entry_id, computed_at=now))
+    data_versions.bump(db, user_id)
+    db.commit()
+
+
+def mark_stale(db, user_ids):
+    """
+    Marks the users' stored results stale after their entries changed outside
+    the app, e.g. a relabel from the command line: the next read serves them
+    and queues the recompute. The caller commits.
+    """
+    db.query(DerivedInsight)\
+        .filter(DerivedInsight.user_id.in_(user_ids))\
+        .update({DerivedInsight.source_entry_id: None}, synchronize_session=False)
+    for user_id in user_ids:
+        data_versions.bump(db, user_id)
+
+
+def stored_results(db, user_id, kinds=KINDS):
+    """
+    Returns ({kind: (payload, computed_at, stale)} for the kinds computed so
+    far, latest entry id): one query for the results, one for the entry id.
+    """
+    rows = db.query(DerivedInsight).filter(DerivedInsight.user_id == user_id, DerivedInsight.kind.in_(kinds)).all()
+    latest = latest_entry_id(db, user_id)
+    return {row.kind: (json.loads(row.payload), row.computed_at, row.source_entry_id != latest) for row in rows}, latest
+
+
+def _with_session(session_factory, fn, *args):
+    db = session_factory()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def recompute(user_id):
+    """
+    Regenerates and stores both results for a user. A result that fails is
+    left as it was (the other is still stored) and the error is raised so
+    the queue retries.
+    """
+    source_entry_id, recent, history_rows = await asyncio.to_thread(_with_session, ReadSessionLocal, load_inputs, user_id)
+    prompts, prediction = await asyncio.gather(
+        generate_suggested_prompts(recent), generate_mood_prediction(history_rows), return_exceptions=True
+    )
+    results = {kind: value for kind, value in ((SUGGESTED_PROMPTS, prompts), (MOOD_PREDICTION, prediction))
+               if not isinstance(value, BaseException)}
+    if results:
+        await asyncio.to_thread(_with_session, SessionLocal, store_results, user_id, source_entry_id, results)
+    for value in (prompts, prediction):
+        if isinstance(value, BaseException):
+            raise value
+
+
+class InsightQueue:
+    """
+    Debounced per-user recompute queue on the event loop. Each schedule()
+    pushes the user's job `debounce` seconds out, so a burst of entries
+    costs one recompute; at most `workers` jobs run at once and one user is
+    never recomputed twice concurrently. Failed jobs retry with exponential
+    backoff and jitter; once a job gives up, reads leave the user alone for
+    `cooldown` seconds (new entries still queue a job). Jobs live in memory:
+    after a restart, stored results that are older than the user's latest
+    entry are picked up again the next time they are read.
+    """
+
+    def __init__(self, workers=INSIGHT_WORKERS, debounce=INSIGHT_DEBOUNCE_SECONDS,
+                 max_attempts=INSIGHT_MAX_ATTEMPTS, retry_base=INSIGHT_RETRY_BASE_SECONDS,
+                 cooldown=INSIGHT_FAILURE_COOLDOWN_SECONDS, job=recompute):
+        self.workers = workers
+        self.debounce = debounce
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.cooldown = cooldown
+        self.job = job
+        self._jobs = {}  # user_id -> {"due", "requested", "attempt"}, monotonic seconds
+        self._running = {}  # user_id -> Task
+        self._gave_up = {}  # user_id -> monotonic time their last job gave up
+        self._wakeup = None
+        self._dispatcher = None
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_lag = None
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+
+    def schedule(self, user_id: int, delay=None, rearm=True):
+        """
+        Queues a recompute for the user `delay` seconds out (the debounce by
+        default). With rearm=False an already queued or running job is left
+        as it is, so repeated reads of a stale result cannot postpone it, and
+        a user whose job gave up within the cooldown is not queued again.
+        """
+        now = time.monotonic()
+        job = self._jobs.get(user_id)
+        if not rearm:
+            if job is not None or user_id in self._running:
+                return
+            if now - self._gave_up.get(user_id, float("-inf")) < self.cooldown:
+                return
+        else:
+            self._gave_up.pop(user_id, None)
+        due = now + (self.debounce if delay is None else delay)
+        if job is None:
+            self._jobs[user_id] = {"due": due, "requested": now, "attempt": 0}
+        else:
+            job["due"] = due if delay is None else min(job["due"], due)
+            job["attempt"] = 0
+        self._ensure_dispatcher()
+        self._wakeup.set()
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            waiting = sorted((job["due"], user_id) for user_id, job in self._jobs.items()
+                             if user_id not in self._running)
+            for due, user_id in waiting:
+                if due > now or len(self._running) >= self.workers:
+                    break
+                self._running[user_id] = asyncio.create_task(self._process(user_id, self._jobs.pop(user_id)))
+            upcoming = [due for due, user_id in waiting if user_id in self._jobs]
+            timeout = None
+            if upcoming and len(self._running) < self.workers:
+                timeout = max(0.0, upcoming[0] - now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, user_id, job):
+        try:
+            await self.job(user_id)
+            lag = time.monotonic() - job["requested"]
+            self.completed += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._lag_total += lag
+            self._gave_up.pop(user_id, None)
+        except Exception as e:
+            job["attempt"] += 1
+            if job["attempt"] < self.max_attempts:
+                delay = self.retry_base * 2 ** (job["attempt"] - 1) * random.uniform(0.5, 1.5)
+                metrics.log_event("insight_job_retry", user_id=user_id, attempt=job["attempt"],
+                                  delay_s=round(delay, 1), error=str(e))
+                self.retried += 1
+                # A schedule() that arrived meanwhile already covers this user
+                if user_id not in self._jobs:
+                    job["due"] = time.monotonic() + delay
+                    self._jobs[user_id] = job
+            else:
+                metrics.log_event("insight_job_gave_up", user_id=user_id, attempts=job["attempt"], error=str(e))
+                self.failed += 1
+                self._gave_up[user_id] = time.monotonic()
+        finally:
+            self._running.pop(user_id, None)
+            self._wakeup.set()
+
+    def stats(self):
+        """Queue depth and lag (seconds from the first request to the finished recompute)."""
+        now = time.monotonic()
+        pending = list(self._jobs.values())
+        return {
+            "depth": len(pending) + len(self._running),
+            "pending": len(pending),
+            "running": len(self._running),
+            "retrying": sum(1 for job in pending if job["attempt"]),
+            "cooling_down": sum(1 for gave_up in self._gave_up.values() if now - gave_up < self.cooldown),
+            "oldest_pending_seconds": round(max((now - job["requested"] for job in pending), default=0.0), 3),
+            "overdue_seconds": round(max([0.0] + [now - job["due"] for job in pending]), 3),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "last_lag_seconds": round(self.last_lag, 3) if self.last_lag is not None else None,
+            "avg_lag_seconds": round(self._lag_total / self.completed, 3) if self.completed else None,
+            "max_lag_seconds": round(self.max_lag, 3)
+        }
+
+
+queue = InsightQueue()
+
+
+def entries_changed(user_id: int):
+    """Call after storing entries for a user: queues the recompute of their results."""
+    queue.schedule(user_id)
+
+
+async def get_results(db, user_id: int, kinds=KINDS):
+    """
+    Stored results as ({kind: (payload, computed_at, stale)}, latest entry
+    id); a kind not computed yet is missing and callers show the fallback.
+    Reads never wait on the model: missing results are queued to compute
+    right away, stale ones are returned as they are and refreshed behind them.
+    """
+    results, latest = await db.run_sync(stored_results, user_id, kinds)
+    if len(results) < len(kinds):
+        queue.schedule(user_id, delay=0, rearm=False)
+    elif any(stale for _, _, stale in results.values()):
+        queue.schedule(user_id, rearm=False)
+    return results, latest
+
+
+async def get_result(db, user_id: int, kind: str):
+    """Stored result for one endpoint as (payload, computed_at, stale), or None until one has been computed."""
+    results, _ = await get_results(db, user_id, (kind,))
+    return results.get(kind)
@@ -0,0 +1,154 @@
+import os
+import time
+import asyncio
+import argparse
+from datetime import timezone
+
+from sqlalchemy import select
+
+from models import Entry, Sentiment
+import metrics
+from retrieval_runtime import get_journal_collection, get_embedding_service
+
+# Configuration
+JOURNAL_INDEX_ENABLED = os.getenv("JOURNAL_INDEX", "true").lower() == "true"
+JOURNAL_INDEX_BATCH_SIZE = int(os.getenv("JOURNAL_INDEX_BATCH_SIZE", "256"))
+MAX_SEARCH_K = 50
+
+# Semantic index over analysed journal entries, one vector per entry in the
+# journal_entries collection with {"user_id", "created_at"} metadata (epoch
+# seconds, so date ranges filter inside Chroma). Entry text stays in SQL;
+# the index only answers "which entries". Submits and imports upsert their
+# entries in the background and backfill() catches up on anything missed,
+# so the index may briefly lag the database but never contradicts it.
+
+_pending = set()  # Background upserts in flight, so they are not garbage collected
+
+
+def vector_id(entry_id):
+    return f"entry-{entry_id}"
+
+
+def _timestamp(created_at):
+    # created_at is naive UTC throughout the app
+    return int(created_at.replace(tzinfo=timezone.utc).timestamp())
+
+
+def index_row(entry):
+    """The (entry id, user id, created_at, content) an upsert needs, read while the Entry is at hand."""
+    return entry.id, entry.user_id, entry.created_at, entry.content
+
+
+def upsert_entries(rows, batch_size=JOURNAL_INDEX_BATCH_SIZE):
+    """Embeds and upserts [(entry id, user id, created_at, content)] batch by batch; returns how many."""
+    collection = get_journal_collection()
+    service = get_embedding_service()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        collection.upsert(
+            ids=[vector_id(entry_id) for entry_id, _, _, _ in batch],
+            embeddings=service.embed([content for _, _, _, content in batch]),
+            metadatas=[{"user_id": user_id, "created_at": _timestamp(created_at)} for _, user_id, created_at, _ in batch]
+        )
+    return len(rows)
+
+
+def _upsert_logged(rows):
+    try:
+        upsert_entries(rows)
+    except Exception as e:
+        metrics.log_event("journal_index_update_failed", entries=len(rows), error=str(e))  # backfill() retries them
+
+
+def schedule_upsert(rows):
+    """Indexes freshly stored entries in a worker thread, without holding up the caller."""
+    if not JOURNAL_INDEX_ENABLED or not rows:
+        return None
+    task = asyncio.create_task(asyncio.to_thread(_upsert_logged, list(rows)))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return task
+
+
+def _where(user_id, start=None, end=None):
+    clauses = [{"user_id": user_id}]
+    if start is not None:
+        clauses.append({"created_at": {"$gte": _timestamp(start)}})
+    if end is not None:
+        clauses.append({"created_at": {"$lt": _timestamp(end)}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def search(user_id, embedding, k=3, start=None, end=None, exclude=()):
+    """
+    [(entry id, cosine distance)] for the user's k entries nearest to
+    `embedding`, created in [start, end) when given, skipping `exclude` ids.
+    """
+    exclude = set(exclude)
+    result = get_journal_collection().query(
+        query_embeddings=[embedding],
+        n_results=k + len(exclude),
+        where=_where(user_id, start, end),
+        include=["distances"]
+    )
+    hits = [(int(vid.split("-", 1)[1]), distance) for vid, distance in zip(result["ids"][0], result["distances"][0])]
+    return [(entry_id, distance) for entry_id, distance in hits if entry_id not in exclude][:k]
+
+
+def search_text(user_id, text, k=3, start=None, end=None, exclude=()):
+    """search() for a piece of text, embedded through the shared service."""
+    return search(user_id, get_embedding_service().embed([text])[0], k, start, end, exclude)
+
+
+def load_entries(db, hits):
+    """[(Entry, distance)] for search() hits, nearest first; entries deleted since indexing are dropped."""
+    if not hits:
+        return []
+    entries = {entry.id: entry for entry in db.query(Entry).filter(Entry.id.in_([entry_id for entry_id, _ in hits]))}
+    return [(entries[entry_id], distance) for entry_id, distance in hits if entry_id in entries]
+
+
+def similar_entries(db, user_id, text, k=3, start=None, end=None, exclude=()):
+    """The user's k entries most similar to `text` as [(Entry, distance)]. Blocks on the model; keep off the event loop."""
+    return load_entries(db, search_text(user_id, text, k, start, end, exclude))
+
+
+def backfill(db, user_id=None, batch_size=JOURNAL_INDEX_BATCH_SIZE):
+    """
+    Indexes analysed entries missing from the index, walking entries in id
+    order one batch at a time. Safe to re-run; returns how many were added.
+    """
+    collection = get_journal_collection()
+    last_id = 0
+    added = 0
+    while True:
+        query = select(Entry.id, Entry.user_id, Entry.created_at, Entry.content)\
+            .join(Sentiment, Entry.id == Sentiment.entry_id)\
+            .where(Entry.id > last_id)\
+            .order_by(Entry.id)\
+            .limit(batch_size)
+        if user_id is not None:
+            query = query.where(Entry.user_id == user_id)
+        rows = db.execute(query).all()
+        if not rows:
+            return added
+        last_id = rows[-1][0]
+        present = set(collection.get(ids=[vector_id(row[0]) for row in rows], include=[])["ids"])
+        added += upsert_entries([tuple(row) for row in rows if vector_id(row[0]) not in present], batch_size)
+
+
+if __name__ == "__main__":
+    from database import ReadSessionLocal
+
+    parser = argparse.ArgumentParser(description="Add stored journal entries missing from the similar-entries index.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only index this user's entries.")
+    parser.add_argument("--batch-size", type=int, default=JOURNAL_INDEX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = ReadSessionLocal()
+    try:
+        started = time.perf_counter()
+        count = backfill(db, user_id=args.user_id, batch_size=args.batch_size)
+        metrics.log_event("journal_index_backfill", entries=count, seconds=round(time.perf_counter() - started, 2))
+    finally:
+        db.close()
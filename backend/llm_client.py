@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from prompt_assembly import count_tokens
+from llm_scheduler import LLMScheduler, Histogram, INTERACTIVE, BACKGROUND, BULK, PRIORITY_NAMES
+
+load_dotenv()
+
+# Configuration
+MODEL_NAME = "gemini-2.0-flash"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "gemini", "stub" or "http" (benchmarks/fake_llm.py)
+LLM_HTTP_URL = os.getenv("LLM_HTTP_URL", "http://127.0.0.1:8900")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+# Upstream quota; the defaults are Gemini 2.0 Flash paid tier 1. 0 disables a limit.
+LLM_RPM = int(os.getenv("LLM_RPM", "2000"))
+LLM_TPM = int(os.getenv("LLM_TPM", "4000000"))
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "400"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "20"))
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.05"))
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call does not finish within its timeout."""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the HTTP client goes away while a model call is in flight."""
+
+
+class RateLimitedError(Exception):
+    """Raised by the HTTP model when the server answers 429."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limited(error):
+    """True for upstream 429s: google.api_core's ResourceExhausted, or our HTTP model's RateLimitedError."""
+    return isinstance(error, RateLimitedError) or getattr(error, "code", None) == 429 \
+        or type(error).__name__ == "ResourceExhausted"
+
+
+def estimate_tokens(prompt):
+    """Rough prompt + completion size for the TPM budget."""
+    return count_tokens(prompt) + LLM_EXPECTED_OUTPUT_TOKENS
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """
+    Offline stand-in for genai.GenerativeModel. Sleeps for `latency` seconds
+    and returns a canned reply shaped like the one each endpoint expects.
+    """
+
+    def __init__(self, latency=STUB_LLM_LATENCY):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return StubResponse(self._reply(prompt))
+
+    async def generate_content_async(self, prompt, stream=False):
+        if stream:
+            return self._stream(self._reply(prompt))
+        await asyncio.sleep(self.latency)
+        return StubResponse(self._reply(prompt))
+
+    async def _stream(self, text):
+        # Spread the latency over the reply, a few words per chunk
+        words = text.split(" ")
+        pieces = [" ".join(words[i:i + 4]) + " " for i in range(0, len(words), 4)]
+        pieces[-1] = pieces[-1][:-1]
+        for piece in pieces:
+            await asyncio.sleep(self.latency / len(pieces))
+            yield StubResponse(piece)
+
+    def _reply(self, prompt):
+        if "'prompt' and 'starter'" in prompt:
+            return json.dumps([
+                {"prompt": "What felt heavy today?", "starter": "Today, the heaviest part was..."},
+                {"prompt": "Where did you find calm?", "starter": "I felt calm when..."},
+                {"prompt": "What do you need tomorrow?", "starter": "Tomorrow, I need..."},
+            ])
+        if '{"prediction"' in prompt:
+            return json.dumps({
+                "prediction": "Mood is expected to remain stable over the next 3 days.",
+                "advice": ["Keep a regular sleep schedule", "Take short walks", "Continue journaling"],
+            })
+        if "SENTIMENT_DATA" in prompt:
+            return (
+                "Thank you for sharing this. It sounds like today asked a lot of you.\n"
+                'SENTIMENT_DATA: {"emotion": "Calm", "intensity": 6.0, "triggers": "Work"}'
+            )
+        if "mental health guide" in prompt:
+            return "Thank you for sharing this. It sounds like today asked a lot of you."
+        return "1. Overview\nStub synthesis for offline testing."
+
+
+class HTTPModel:
+    """
+    Talks to an HTTP server with a minimal generate API, normally the fake
+    LLM in benchmarks/fake_llm.py, which injects latency and 429s. Needs the
+    httpx package.
+    """
+
+    def __init__(self, url=LLM_HTTP_URL):
+        import httpx
+        self.url = url.rstrip("/")
+        self._client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=None))
+
+    @staticmethod
+    def _raise_for_status(response):
+        if response.status_code == 429:
+            retry_after = response.headers.get("retry-after")
+            raise RateLimitedError("Upstream rate limit (429).", float(retry_after) if retry_after else None)
+        response.raise_for_status()
+
+    async def generate_content_async(self, prompt, stream=False):
+        if not stream:
+            response = await self._client.post(f"{self.url}/generate", json={"prompt": prompt})
+            self._raise_for_status(response)
+            data = response.json()
+            return SimpleNamespace(text=data["text"],
+                                   usage_metadata=SimpleNamespace(total_token_count=data["usage"]["total_tokens"]))
+        request = self._client.build_request("POST", f"{self.url}/generate", json={"prompt": prompt, "stream": True})
+        response = await self._client.send(request, stream=True)
+        if response.status_code != 200:
+            await response.aclose()
+            self._raise_for_status(response)
+        return self._stream(response)
+
+    async def _stream(self, response):
+        try:
+            async for line in response.aiter_lines():
+                if line:
+                    yield SimpleNamespace(text=json.loads(line)["text"])
+        finally:
+            await response.aclose()
+
+
+def build_model():
+    """Returns the configured generative model (Gemini, the offline stub, or an HTTP fake)."""
+    if LLM_BACKEND == "stub":
+        return StubModel()
+    if LLM_BACKEND == "http":
+        return HTTPModel()
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("OPENAI_API_KEY"))
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+async def cancel_on_disconnect(coro, request):
+    """Runs coro, cancelling it as soon as the HTTP client disconnects."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnectedError("Client disconnected before the model replied.")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+class LLMClient:
+    """
+    Async wrapper around a generative model, and the single place calls are
+    scheduled: admission goes through an LLMScheduler (RPM/TPM budgets,
+    concurrency limit, priority classes), identical prompts in flight share
+    one upstream call, and 429s are retried with jittered exponential
+    backoff while the scheduler pauses every other admission. Queue and
+    upstream times are kept as histograms.
+    """
+
+    def __init__(self, model, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT_SECONDS,
+                 rpm=LLM_RPM, tpm=LLM_TPM, max_retries=LLM_MAX_RETRIES):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.scheduler = LLMScheduler(rpm, tpm, max_concurrency)
+        self.queue_time = {name: Histogram() for name in PRIORITY_NAMES.values()}
+        self.upstream_time = Histogram()
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None)
+        return max(delay, retry_after) if retry_after else delay
+
+    async def _admitted(self, prompt, priority, start_call):
+        """
+        Runs start_call() once admitted by the scheduler, retrying on 429.
+        Returns (response, tokens estimated, upstream start time); the caller
+        releases the slot.
+        """
+        tokens = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            await self.scheduler.acquire(priority, tokens)
+            self.queue_time[PRIORITY_NAMES[priority]].observe(time.monotonic() - queued)
+            started = time.monotonic()
+            self.calls += 1
+            try:
+                return await start_call(), tokens, started
+            except Exception as e:
+                self.upstream_time.observe(time.monotonic() - started)
+                self.scheduler.release()
+                if is_rate_limited(e):
+                    self.rate_limited += 1
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                self.scheduler.pause(delay)  # The quota is shared, so everyone backs off
+            except BaseException:
+                self.scheduler.release()
+                raise
+            await asyncio.sleep(delay)
+
+    def _settle(self, response, tokens):
+        """Charges the TPM budget with the real usage when the model reports it."""
+        used = getattr(getattr(response, "usage_metadata", None), "total_token_count", None)
+        if used:
+            self.scheduler.tokens.adjust(used - tokens)
+
+    async def _call(self, prompt, priority):
+        response, tokens, started = await self._admitted(
+            prompt, priority, lambda: self.model.generate_content_async(prompt))
+        try:
+            return response.text
+        finally:
+            self._settle(response, tokens)
+            self.upstream_time.observe(time.monotonic() - started)
+            self.scheduler.release()
+
+    def _finish(self, prompt, entry):
+        if self._inflight.get(prompt) is entry:
+            del self._inflight[prompt]
+
+    async def generate(self, prompt, timeout=None, request=None, priority=INTERACTIVE):
+        """
+        Returns the completion text for prompt. If a request is given, the
+        call is cancelled when that client disconnects. Callers asking for
+        the same prompt while it is in flight share one upstream call, which
+        is only cancelled once all of them have gone away.
+        """
+        entry = self._inflight.get(prompt)
+        if entry is None:
+            entry = {"task": asyncio.ensure_future(self._call(prompt, priority)), "waiters": 0}
+            self._inflight[prompt] = entry
+            entry["task"].add_done_callback(lambda _: self._finish(prompt, entry))
+        else:
+            self.coalesced += 1
+
+        task = entry["task"]
+        entry["waiters"] += 1
+        call = asyncio.shield(task)
+        if request is not None:
+            call = cancel_on_disconnect(call, request)
+        try:
+            return await asyncio.wait_for(call, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Model call exceeded {timeout or self.timeout}s.")
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and not task.done():
+                task.cancel()
+
+    async def stream(self, prompt, timeout=None, priority=INTERACTIVE):
+        """
+        Yields completion text chunks as the model produces them. The timeout
+        covers the whole stream; client disconnects cancel the consuming
+        response, which closes this generator. A 429 is retried only before
+        the first chunk.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        try:
+            response, _, started = await asyncio.wait_for(
+                self._admitted(prompt, priority, lambda: self.model.generate_content_async(prompt, stream=True)),
+                deadline - loop.time()
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Model stream exceeded {timeout or self.timeout}s.")
+        try:
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                if chunk.text:
+                    yield chunk.text
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Model stream exceeded {timeout or self.timeout}s.")
+        finally:
+            self.upstream_time.observe(time.monotonic() - started)
+            self.scheduler.release()
+
+    def stats(self):
+        """Queue/upstream latency histograms and counters for /internal/llm-stats."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "in_flight": self.scheduler.in_flight,
+            "queued": self.scheduler.queued(),
+            "queue_time_seconds": {name: h.snapshot() for name, h in self.queue_time.items()},
+            "upstream_time_seconds": self.upstream_time.snapshot()
+        }
+
+
+llm = LLMClient(build_model())
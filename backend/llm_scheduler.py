@@ -0,0 +1,156 @@
+import time
+import heapq
+import asyncio
+import itertools
+from bisect import bisect_left
+
+# Priority classes; lower values are served first
+INTERACTIVE = 0  # A user is waiting on the reply: journal submit, deep dive
+BACKGROUND = 1   # Precomputed dashboard results (suggested prompts, mood prediction)
+BULK = 2         # Journal imports
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BULK: "bulk"}
+
+
+class Histogram:
+    """Latency histogram in seconds with cumulative buckets, the way Prometheus exposes them."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (None when empty, inf past the last bucket)."""
+        if not self.count:
+            return None
+        rank, seen = q / 100 * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        cumulative = list(itertools.accumulate(self.counts))
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "buckets": {**{str(b): c for b, c in zip(self.buckets, cumulative)}, "+Inf": cumulative[-1]}
+        }
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units per minute, refilled continuously. The burst is
+    kept to `burst_seconds` worth of refill: upstream quotas count over a
+    sliding minute, and a full minute of burst plus a minute of refill would
+    spend twice the quota in one window.
+    """
+
+    def __init__(self, per_minute, burst_seconds=5):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds) if per_minute > 0 else 0.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be taken; 0 if it can be taken now. <= 0 per minute means unlimited."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)  # A request larger than the bucket goes through once it is full
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        if self.capacity > 0:
+            self._refill()
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Corrects an earlier take() once the real cost is known (positive delta takes more)."""
+        if self.capacity > 0:
+            self._refill()
+            self.level = min(self.capacity, self.level - delta)
+
+
+class LLMScheduler:
+    """
+    Admits model calls in priority order within request-per-minute and
+    token-per-minute budgets and a concurrency limit. Priority is strict:
+    while the head of the queue waits for budget, nothing behind it jumps
+    ahead, so an interactive call is never starved by a stream of cheaper
+    background ones. pause() holds every admission, e.g. after a 429.
+    """
+
+    def __init__(self, rpm, tpm, max_concurrency):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._queue = []  # (priority, seq, tokens, future)
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._timer = None
+
+    async def acquire(self, priority, tokens):
+        """Waits for a slot and budget for a call estimated at `tokens`; pair with release()."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), tokens, future))
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Admitted just as the caller went away
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._pump()
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._pump()
+
+    def queued(self):
+        """Waiting calls per priority class."""
+        counts = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _, future in self._queue:
+            if not future.done():
+                counts[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        return counts
+
+    def _pump(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue and self.in_flight < self.max_concurrency:
+            priority, _, tokens, future = self._queue[0]
+            if future.done():  # Caller cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            wait = max(self._paused_until - time.monotonic(),
+                       self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+                return
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            future.set_result(None)
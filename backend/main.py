@@ -1,16 +1,36 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+from datetime import date, datetime, time, timedelta
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 
-from database import get_db, init_db, calculate_average_mood
-from models import Entry, Sentiment, User
-from vector_service import get_relevant_context
+from database import get_db, get_async_db, init_db, calculate_average_mood, save_journal_entry, run_in_thread, SessionLocal, ReadSessionLocal
+from models import ImportJob
+from vector_service import get_relevant_context, cache_stats, normalize_query
+import retrieval_runtime
 from safety import safety_interceptor, DISCLAIMER
+from llm_client import llm, LLMTimeoutError
+from prompts import DEEP_DIVE
+from prompt_assembly import assemble, PROMPT_BUDGET_JOURNAL, PROMPT_BUDGET_DEEP_DIVE, stats as prompt_stats
+from streaming import SentimentTrailerParser, split_sentiment_trailer, sse_event
+from response_cache import response_cache, make_key
+import bulk_import
+import rollups
+import history
+import analytics
+import insight_jobs
+import journal_index
+import dashboard
+import sentiment_engine
+import metrics
+import profiler
+from metrics import span
 
 load_dotenv()
 
@@ -24,10 +44,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-request latency histograms and one JSON timing line per request
+app.add_middleware(metrics.TimingMiddleware)
+metrics.registry.add_collector(metrics.collect_runtime)
 
-# Setup Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("OPENAI_API_KEY"))
-model = genai.GenerativeModel('gemini-2.0-flash')
+# Disable proxy buffering so SSE frames reach the browser as they are produced
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 @app.get("/")
 async def root():
@@ -37,337 +59,404 @@ class JournalSubmission(BaseModel):
     user_id: int
     content: str
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving, even if retrieval is still loading."""
+    return {"status": "live"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the embedding model and knowledge collection are loaded."""
+    status = retrieval_runtime.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **status})
+    return {"status": "ready", **status}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint: request and stage latencies, cache, LLM and queue counters."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/internal/profile")
+async def get_profile(seconds: float = Query(10, gt=0, le=profiler.PROFILE_MAX_SECONDS)):
+    """
+    Samples every thread's stack for `seconds` and returns collapsed stacks
+    for a flame graph. Off unless PROFILING_ENABLED=true.
+    """
+    if not profiler.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled.")
+    stacks = await asyncio.to_thread(profiler.profile_for, seconds)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="A profile is already running.")
+    return PlainTextResponse(stacks)
+
+@app.get("/internal/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters for the retrieval caches, used to size them."""
+    return {"retrieval": cache_stats(), "llm_responses": response_cache.stats()}
+
+@app.get("/internal/llm-stats")
+async def get_llm_stats():
+    """Model call scheduling: queue and upstream latency histograms, 429s, coalesced calls."""
+    return llm.stats()
+
+@app.get("/internal/prompt-stats")
+async def get_prompt_stats():
+    """Assembled prompt sizes per endpoint and how much context was deduplicated or trimmed away."""
+    return prompt_stats()
+
+@app.get("/internal/sentiment-stats")
+async def get_sentiment_stats():
+    """Where stored sentiments came from (trailer, local classifier, defaults) and the classifier's latency."""
+    return sentiment_engine.stats()
+
+@app.get("/internal/insight-jobs")
+async def get_insight_job_stats():
+    """Depth and lag of the background queue that precomputes prompts and predictions."""
+    return insight_jobs.queue.stats()
+
 @app.on_event("startup")
 def startup_event():
     init_db()
+    # Load MiniLM and Chroma off the request path so the first query does not pay for it
+    if os.getenv("RETRIEVAL_WARMUP", "true").lower() == "true":
+        retrieval_runtime.start_background_warm_up()
+        sentiment_engine.start_background_warm_up()
+    # Pick up imports that were interrupted by a restart
+    bulk_import.resume_unfinished_jobs()
 
 @app.post("/journal/submit")
-async def submit_journal(submission: JournalSubmission, db: Session = Depends(get_db)):
-    print(f"Received submission: {submission.content[:50]}...")
+async def submit_journal(submission: JournalSubmission, request: Request, db: Session = Depends(get_db)):
     # 1. Safety Check
-    is_crisis, crisis_msg = safety_interceptor(submission.content)
+    with span("safety"):
+        is_crisis, crisis_msg = safety_interceptor(submission.content)
     if is_crisis:
-        print("Crisis detected!")
+        metrics.log_event("crisis_intercepted", endpoint="journal_submit", user_id=submission.user_id)
+        metrics.inc("pychiatrist_crisis_intercepts_total", endpoint="journal_submit")
         return {"response": crisis_msg, "is_crisis": True}
 
-    # 2. Retrieve Clinical Context
-    clinical_context = get_relevant_context(submission.content)
-    context_str = "\n".join([f"Source: {c['source']}\nContent: {c['content']}" for c in clinical_context])
+    # The local sentiment classifier, when enabled, runs alongside retrieval and the model call
+    sentiment_task = sentiment_engine.start(submission.content)
+
+    # 2. Retrieve Clinical Context (in a worker thread, so concurrent requests share an embedding batch)
+    with span("retrieval"):
+        clinical_context = await asyncio.to_thread(get_relevant_context, submission.content)
 
-    # 3. Construct RAG Prompt
-    system_prompt = (
-        "You are an AI mental health guide. Use the following clinical research to guide the user:\n"
-        f"{context_str}\n\n"
-        "Do not give physical medical advice. Be empathetic, non-judgmental, and supportive. "
-        "IMPORTANT: When referencing research, mention the specific source (e.g., 'According to the Harvard Study...'). "
-        "\n\nCRITICAL: At the very end of your response, provide a JSON-formatted block for sentiment analysis like this: "
-        "SENTIMENT_DATA: {\"emotion\": \"string\", \"intensity\": float_1_to_10, \"triggers\": \"1-2 words only, comma separated\"}"
-    )
+    # 3. Construct RAG Prompt, within the token budget
+    with span("prompt"):
+        prompt, clinical_context = assemble(sentiment_engine.journal_template(), clinical_context,
+                                            PROMPT_BUDGET_JOURNAL, content=submission.content)
 
     try:
         # 4. Get AI Response from Gemini
-        prompt = f"System: {system_prompt}\nUser: {submission.content}"
-        response = model.generate_content(prompt)
-        full_text = response.text
-
-        # 5. Extract Sentiment Data using regex
-        import json
-        import re
-        ai_msg = full_text
-        primary_emotion = "Neutral"
-        intensity = 5.0
-        triggers = "Unknown"
-
-        match = re.search(r"SENTIMENT_DATA: (\{.*\})", full_text)
-        if match:
-            try:
-                sentiment_json = json.loads(match.group(1))
-                primary_emotion = sentiment_json.get("emotion", "Neutral")
-                intensity = float(sentiment_json.get("intensity", 5.0))
-                triggers = sentiment_json.get("triggers", "Unknown")
-                # Clean the response text of the metadata
-                ai_msg = full_text.split("SENTIMENT_DATA:")[0].strip()
-            except:
-                pass
+        with span("llm"):
+            full_text = await llm.generate(prompt, request=request)
+
+        # 5. Extract Sentiment Data from the SENTIMENT_DATA trailer and/or the local classifier
+        with span("parse"):
+            ai_msg, trailer = split_sentiment_trailer(full_text)
+        with span("sentiment"):
+            sentiment = await sentiment_task.resolve(trailer)
 
         # 6. Store in Database
-        new_entry = Entry(user_id=submission.user_id, content=submission.content, ai_response=ai_msg)
-        db.add(new_entry)
-        db.commit()
-        db.refresh(new_entry)
-
-        sentiment = Sentiment(
-            entry_id=new_entry.id,
-            primary_emotion=primary_emotion,
-            intensity_score=intensity,
-            triggers=triggers
-        )
-        db.add(sentiment)
-        db.commit()
+        with span("db_save"):
+            entry = await run_in_thread(save_journal_entry, db, submission.user_id, submission.content, ai_msg, sentiment)
+        insight_jobs.entries_changed(submission.user_id)
+        journal_index.schedule_upsert([journal_index.index_row(entry)])
 
         return {
             "response": ai_msg,
-            "sentiment": {
-                "emotion": primary_emotion,
-                "intensity": intensity,
-                "triggers": triggers
-            },
+            "sentiment": sentiment,
             "sources": [c['source'] for c in clinical_context],
             "disclaimer": DISCLAIMER
         }
 
+    except LLMTimeoutError as e:
+        sentiment_task.cancel()
+        metrics.log_event("timeout", endpoint="journal_submit", error=str(e))
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        print(f"Error: {e}")
+        sentiment_task.cancel()
+        metrics.log_event("error", endpoint="journal_submit", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/journal/submit/stream")
+async def submit_journal_stream(submission: JournalSubmission):
+    """
+    Streaming variant of /journal/submit. Emits Server-Sent Events: `token`
+    frames while the model writes, then a final `done` frame carrying the
+    sentiment and sources once the entry has been stored.
+    """
+    with span("safety"):
+        is_crisis, crisis_msg = safety_interceptor(submission.content)
+    prompt, clinical_context, sentiment_task = None, [], None
+    if not is_crisis:
+        sentiment_task = sentiment_engine.start(submission.content)
+        with span("retrieval"):
+            clinical_context = await asyncio.to_thread(get_relevant_context, submission.content)
+        with span("prompt"):
+            prompt, clinical_context = assemble(sentiment_engine.journal_template(), clinical_context,
+                                                PROMPT_BUDGET_JOURNAL, label="journal_stream",
+                                                content=submission.content)
+
+    async def events():
+        if is_crisis:
+            metrics.log_event("crisis_intercepted", endpoint="journal_submit_stream", user_id=submission.user_id)
+            metrics.inc("pychiatrist_crisis_intercepts_total", endpoint="journal_submit_stream")
+            yield sse_event("crisis", {"response": crisis_msg, "is_crisis": True})
+            return
+
+        parser = SentimentTrailerParser()
+        try:
+            with span("llm"):
+                async for chunk in llm.stream(prompt):
+                    text = parser.feed(chunk)
+                    if text:
+                        yield sse_event("token", {"text": text})
+        except (asyncio.CancelledError, GeneratorExit):
+            sentiment_task.cancel()  # The client went away mid-reply
+            raise
+        except Exception as e:
+            sentiment_task.cancel()
+            metrics.log_event("error", endpoint="journal_submit_stream", error=str(e))
+            yield sse_event("error", {"detail": str(e)})
+            return
+
+        remaining, ai_msg, trailer = parser.finish()
+        if remaining:
+            yield sse_event("token", {"text": remaining})
+        with span("sentiment"):
+            sentiment = await sentiment_task.resolve(trailer)
+
+        # The request-scoped session is not guaranteed to outlive the response, so use our own
+        db = SessionLocal()
+        try:
+            with span("db_save"):
+                entry = await run_in_thread(save_journal_entry, db, submission.user_id, submission.content, ai_msg, sentiment)
+        finally:
+            db.close()
+        insight_jobs.entries_changed(submission.user_id)
+        journal_index.schedule_upsert([journal_index.index_row(entry)])
+
+        yield sse_event("done", {
+            "response": ai_msg,
+            "sentiment": sentiment,
+            "sources": [c['source'] for c in clinical_context],
+            "disclaimer": DISCLAIMER
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/user/{user_id}/journal/import", status_code=202)
+async def import_journal(user_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Bulk import of historical entries, as NDJSON (application/x-ndjson) or a
+    JSON list. The entries are queued and processed in the background; poll
+    /journal/import/{job_id} for progress.
+    """
+    try:
+        entries = bulk_import.parse_entries(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not entries:
+        raise HTTPException(status_code=400, detail="No entries to import.")
+
+    job = bulk_import.create_job(db, user_id, entries)
+    bulk_import.start_job(job.id)
+    return bulk_import.job_progress(job)
+
+@app.get("/journal/import/{job_id}")
+async def get_import_progress(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(ImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return bulk_import.job_progress(job)
+
+@app.post("/journal/import/{job_id}/resume", status_code=202)
+async def resume_import(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Restarts a failed job from its first unprocessed entry."""
+    job = await db.get(ImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if job.status != "completed":
+        bulk_import.start_job(job.id)
+    return bulk_import.job_progress(job)
+
 @app.get("/user/{user_id}/mood-trend")
-async def get_mood_trend(user_id: int, db: Session = Depends(get_db)):
+async def get_mood_trend(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Returns the last 7 days of mood scores for graphing."""
-    from datetime import datetime, timedelta
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    from sqlalchemy import func
-    
-    # Group by date to avoid label clutter
-    # Use SQLite date function
-    trend = db.query(
-        func.date(Entry.created_at).label('date'),
-        func.avg(Sentiment.intensity_score).label('avg_score'),
-        func.max(Sentiment.primary_emotion).label('top_emotion') # Just take one emotion for the day
-    )\
-    .join(Sentiment, Entry.id == Sentiment.entry_id)\
-    .filter(Entry.user_id == user_id)\
-    .filter(Entry.created_at >= seven_days_ago)\
-    .group_by(func.date(Entry.created_at))\
-    .order_by('date')\
-    .all()
-    
-    return [
-        {
-            "day": datetime.strptime(t[0], "%Y-%m-%d").strftime("%a"), 
-            "score": round(t[1], 1), 
-            "emotion": t[2],
-            "full_date": t[0]
-        } for t in trend
-    ]
+    # One row per day from the rollups; the emotion shown is the day's most frequent one
+    return dashboard.format_trend(await db.run_sync(rollups.daily_moods, user_id, 7))
 
 @app.get("/user/{user_id}/history")
-async def get_journal_history(user_id: int, db: Session = Depends(get_db)):
-    """Returns all journal entries with their sentiment data."""
-    entries = db.query(Entry)\
-        .outerjoin(Sentiment, Entry.id == Sentiment.entry_id)\
-        .filter(Entry.user_id == user_id)\
-        .order_by(Entry.created_at.desc())\
-        .all()
-    
+async def get_journal_history(
+    user_id: int,
+    limit: int = history.DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    fields: str = None,
+    format: str = "json",
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns journal entries with their sentiment data, newest first.
+    JSON mode returns one page plus `next_cursor` to pass back for the next
+    one; `fields` (e.g. "id,created_at,sentiment") trims each entry and
+    include_total adds the user's entry count.
+    format=ndjson streams the whole history, one entry per line, for exports.
+    """
+    try:
+        selected = history.parse_fields(fields)
+        if format == "ndjson":
+            return StreamingResponse(
+                history.iter_history_ndjson(ReadSessionLocal, user_id, selected),
+                media_type="application/x-ndjson"
+            )
+        limit = max(1, min(limit, history.MAX_PAGE_SIZE))
+        return await db.run_sync(history.history_page, user_id, limit, cursor, selected, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/user/{user_id}/similar-entries")
+async def get_similar_entries(
+    user_id: int,
+    q: str,
+    k: int = 5,
+    start: date = None,
+    end: date = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns the user's past entries most similar to `q`, nearest first,
+    optionally limited to entries written from `start` through `end`.
+    """
+    k = max(1, min(k, journal_index.MAX_SEARCH_K))
+    start_at = datetime.combine(start, time.min) if start else None
+    end_at = datetime.combine(end + timedelta(days=1), time.min) if end else None
+    try:
+        with span("journal_index"):
+            hits = await asyncio.to_thread(journal_index.search_text, user_id, q, k, start_at, end_at)
+    except Exception as e:
+        metrics.log_event("error", endpoint="similar_entries", error=str(e))
+        raise HTTPException(status_code=503, detail="Journal index unavailable")
     return [
-        {
-            "id": e.id,
-            "content": e.content,
-            "ai_response": e.ai_response,
-            "created_at": e.created_at.isoformat(),
-            "sentiment": {
-                "emotion": e.sentiment.primary_emotion if e.sentiment else "Unknown",
-                "intensity": e.sentiment.intensity_score if e.sentiment else 0,
-                "triggers": e.sentiment.triggers if e.sentiment else ""
-            }
-        } for e in entries
+        {"id": entry.id, "created_at": entry.created_at.isoformat(), "content": entry.content,
+         "similarity": round(1 - distance, 4)}
+        for entry, distance in await db.run_sync(journal_index.load_entries, hits)
     ]
 
 @app.get("/user/{user_id}/mood-stats")
-async def get_mood_stats(user_id: int, db: Session = Depends(get_db)):
-    avg_mood = calculate_average_mood(db, user_id)
+async def get_mood_stats(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    avg_mood = await db.run_sync(calculate_average_mood, user_id)
     return {"average_mood_7d": avg_mood}
 
 @app.get("/user/{user_id}/insights")
-async def get_advanced_insights(user_id: int, db: Session = Depends(get_db)):
+async def get_advanced_insights(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Returns dynamic behavioral insights based on history."""
-    from datetime import datetime, timedelta
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    entries = db.query(Sentiment, Entry)\
-        .join(Entry, Sentiment.entry_id == Entry.id)\
-        .filter(Entry.user_id == user_id)\
-        .filter(Entry.created_at >= seven_days_ago)\
-        .all()
-    
-    if not entries:
-        return {
-            "top_emotion": "Neutral",
-            "stability": "Pending",
-            "trigger_summary": "Not enough data yet.",
-            "insight_message": "Document your first few days to see behavioral patterns."
-        }
-
-    # Calculate Top Emotion
-    emotions = [e[0].primary_emotion for e in entries]
-    top_emotion = max(set(emotions), key=emotions.count)
-    
-    # Calculate Stability
-    intensities = [e[0].intensity_score for e in entries]
-    avg_intensity = sum(intensities) / len(intensities)
-    variance = sum((x - avg_intensity) ** 2 for x in intensities) / len(intensities)
-    
-    stability = "High" if variance < 1 else "Moderate" if variance < 4 else "Low"
-    
-    # Trigger Summary (just combining recent triggers)
-    all_triggers = []
-    for e in entries:
-        if e[0].triggers and e[0].triggers != "Unknown":
-            # Clean and truncate
-            ts = [t.strip().title() for t in e[0].triggers.split(",")]
-            all_triggers.extend(ts)
-    
-    unique_triggers = list(set(all_triggers))
-    trigger_summary = ", ".join([t[:15] + ".." if len(t) > 17 else t for t in unique_triggers[:3]]) if unique_triggers else "None identified"
-
-    return {
-        "top_emotion": top_emotion,
-        "stability": stability,
-        "trigger_summary": trigger_summary,
-        "insight_message": f"Your emotional landscape is currently dominated by {top_emotion.lower()} states with {stability.lower()} stability."
-    }
+    return dashboard.format_insights(await db.run_sync(analytics.insights, user_id, 7))
 
 @app.get("/user/{user_id}/trigger-distribution")
-async def get_trigger_distribution(user_id: int, db: Session = Depends(get_db)):
+async def get_trigger_distribution(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Returns frequency of different emotional triggers."""
-    from datetime import datetime, timedelta
-    from collections import Counter
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    sentiments = db.query(Sentiment)\
-        .join(Entry, Sentiment.entry_id == Entry.id)\
-        .filter(Entry.user_id == user_id)\
-        .filter(Entry.created_at >= seven_days_ago)\
-        .all()
-    
-    triggers = []
-    for s in sentiments:
-        if s.triggers and s.triggers != "Unknown":
-            # Split by comma in case of multiple triggers
-            ts = [t.strip().title() for t in s.triggers.split(",")]
-            triggers.extend(ts)
-            
-    counts = Counter(triggers)
     # Only return top 10 triggers to avoid clutter
-    return [{"name": name, "value": count} for name, count in counts.most_common(10)]
+    counts = await db.run_sync(analytics.trigger_frequency, user_id, 7, 10)
+    return dashboard.format_distribution(counts)
 
 @app.get("/user/{user_id}/suggested-prompts")
-async def get_suggested_prompts(user_id: int, db: Session = Depends(get_db)):
-    """Generates personalized reflection prompts using AI based on history."""
-    from datetime import datetime, timedelta
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    # Get recent entries for context
-    recent_entries = db.query(Entry)\
-        .filter(Entry.user_id == user_id)\
-        .order_by(Entry.created_at.desc())\
-        .limit(5)\
-        .all()
-    
-    if not recent_entries:
-        return [
-            "What is one thing you're looking forward to this week?",
-            "Describe a moment today that made you feel peaceful."
-        ]
-
-    # Build a context string from recent entries
-    history_context = "\n---\n".join([e.content for e in recent_entries])
-    
-    prompt = (
-        "You are a clinical journaling assistant. Below are a user's recent journal entries:\n\n"
-        f"{history_context}\n\n"
-        "Based on these 'answers', generate 3 highly personalized 'Suggested Focus' items. "
-        "For each item, provide:\n"
-        "1. A focus question (under 15 words)\n"
-        "2. A 'starter' sentence that helps them begin writing (e.g., 'Looking back at that moment, I realize...')\n\n"
-        "Format: Return a JSON list of objects with keys 'prompt' and 'starter'. No other text."
-    )
-
-    try:
-        response = model.generate_content(prompt)
-        # Clean up in case Gemini wraps in ```json
-        text = response.text.strip()
-        if text.startswith("```json"):
-            text = text[7:-3].strip()
-        import json
-        return json.loads(text)[:3]
-    except Exception as e:
-        print(f"AI Prompt generation failed: {e}")
-        return [
-            {"prompt": "What's on your mind today?", "starter": "Right now, I'm thinking about..."},
-            {"prompt": "How are you feeling?", "starter": "Today has felt..."},
-        ]
+async def get_suggested_prompts(user_id: int, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """
+    Personalized reflection prompts, precomputed in the background after each
+    entry. X-Computed-At / X-Stale tell how fresh they are.
+    """
+    result = await insight_jobs.get_result(db, user_id, insight_jobs.SUGGESTED_PROMPTS)
+    if result is None:
+        return insight_jobs.FALLBACK_PROMPTS
+    prompts, computed_at, stale = result
+    response.headers["X-Computed-At"] = computed_at.isoformat()
+    response.headers["X-Stale"] = str(stale).lower()
+    return prompts
 
 @app.get("/user/{user_id}/mood-prediction")
-async def get_mood_prediction(user_id: int, db: Session = Depends(get_db)):
-    """Predicts next 3 days of mood based on history."""
-    entries = db.query(Entry)\
-        .join(Sentiment, Entry.id == Sentiment.entry_id)\
-        .filter(Entry.user_id == user_id)\
-        .order_by(Entry.created_at.asc())\
-        .limit(14)\
-        .all()
-    
-    if len(entries) < 3:
-        return {"prediction": "Insufficient data for clinical prediction. Keep journaling!", "status": "accumulating"}
-
-    history = []
-    for e in entries:
-        s = db.query(Sentiment).filter(Sentiment.entry_id == e.id).first()
-        history.append(f"Date: {e.created_at.date()}, Emotion: {s.primary_emotion}, Intensity: {s.intensity_score}")
-
-    history_str = "\n".join(history)
-    prompt = (
-        "You are a clinical predictive assistant. Based on the following user sentiment history:\n\n"
-        f"{history_str}\n\n"
-        "1. Predict the user's emotional trajectory for the next 3 days with a concise clinical rationale (max 60 words).\n"
-        "2. Provide 3 specific, actionable clinical advice bullet points for the user to maintain or improve their wellbeing based on their patterns.\n\n"
-        "Format your response EXACTLY as a JSON object with this structure:\n"
-        '{"prediction": "...", "advice": ["...", "...", "..."]}'
-    )
-
-    try:
-        response = model.generate_content(prompt)
-        import json
-        # Clean up possible markdown code blocks from response
-        text = response.text.strip().replace('```json', '').replace('```', '')
-        data = json.loads(text)
-        return {"prediction": data.get("prediction"), "advice": data.get("advice", []), "status": "ready"}
-    except Exception as e:
-        print(f"Prediction failed: {e}")
-        return {
-            "prediction": "Predictive engine warming up. Check back soon.", 
-            "advice": ["Maintain consistent journaling", "Monitor sleep patterns", "Engage in light physical activity"],
-            "status": "fallback"
-        }
+async def get_mood_prediction(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Predicts next 3 days of mood based on history, precomputed in the background after each entry."""
+    result = await insight_jobs.get_result(db, user_id, insight_jobs.MOOD_PREDICTION)
+    if result is None:
+        return insight_jobs.FALLBACK_PREDICTION
+    prediction, computed_at, stale = result
+    return {**prediction, "computed_at": computed_at.isoformat(), "stale": stale}
+
+@app.get("/user/{user_id}/dashboard")
+async def get_dashboard(user_id: int, request: Request):
+    """
+    Everything MoodDashboard shows in one response: mood trend and stats,
+    insights, trigger distribution, suggested prompts and mood prediction.
+    Carries an ETag; a request whose If-None-Match still matches gets 304
+    after a single version lookup, without building anything.
+    """
+    etag = await dashboard.current_etag(user_id)
+    if dashboard.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=dashboard.cache_headers(etag))
+    data, etag = await dashboard.build(user_id, etag)
+    return JSONResponse(data, headers=dashboard.cache_headers(etag))
+
+def deep_dive_cache_key(topic, clinical_context):
+    return make_key(DEEP_DIVE.version, [c["id"] for c in clinical_context], normalize_query(topic))
 
 @app.get("/clinical/deep-dive")
-async def clinical_deep_dive(topic: str):
+async def clinical_deep_dive(topic: str, request: Request):
     """Performs an academic deep dive into a specific psychological topic."""
-    clinical_context = get_relevant_context(topic, n_results=5)
-    context_str = "\n".join([f"Source: {c['source']}\nContent: {c['content']}" for c in clinical_context])
-
-    prompt = (
-        "You are a clinical research synthesist. A user is asking for a deep dive into the following topic: "
-        f"'{topic}'.\n\n"
-        "Use the following academic research chunks to provide a detailed, structured, and informative analysis:\n"
-        f"{context_str}\n\n"
-        "Structure your response with:\n"
-        "1. Overview of the topic\n"
-        "2. Key Clinical Findings (cite sources)\n"
-        "3. Practical Applications (if applicable)\n"
-        "4. Limitations/Further Research\n\n"
-        "Maintain a high academic tone but remain accessible. Do not provide medical diagnoses."
-    )
+    with span("retrieval"):
+        clinical_context = await asyncio.to_thread(get_relevant_context, topic, 5)
+    with span("prompt"):
+        prompt, clinical_context = assemble(DEEP_DIVE, clinical_context, PROMPT_BUDGET_DEEP_DIVE, topic=topic)
+
+    async def synthesize():
+        with span("llm"):
+            analysis = await llm.generate(prompt)
+        return analysis.strip()
 
     try:
-        response = model.generate_content(prompt)
-        return {"analysis": response.text.strip(), "sources": [c['source'] for c in clinical_context]}
+        # Identical requests in flight share a single Gemini call
+        cache_key = deep_dive_cache_key(topic, clinical_context)
+        analysis = await response_cache.get_or_compute(cache_key, synthesize, request=request)
+        return {"analysis": analysis, "sources": [c['source'] for c in clinical_context]}
+    except LLMTimeoutError as e:
+        metrics.log_event("timeout", endpoint="deep_dive", error=str(e))
+        raise HTTPException(status_code=504, detail="Synthesis engine timed out. Try again shortly.")
     except Exception as e:
-        print(f"Deep dive failed: {e}")
+        metrics.log_event("error", endpoint="deep_dive", error=str(e))
         raise HTTPException(status_code=500, detail="Synthesis engine busy. Try again shortly.")
 
+@app.get("/clinical/deep-dive/stream")
+async def clinical_deep_dive_stream(topic: str):
+    """Streaming variant of /clinical/deep-dive: `token` frames, then a `done` frame with sources."""
+    with span("retrieval"):
+        clinical_context = await asyncio.to_thread(get_relevant_context, topic, 5)
+    with span("prompt"):
+        prompt, clinical_context = assemble(DEEP_DIVE, clinical_context, PROMPT_BUDGET_DEEP_DIVE,
+                                            label="deep_dive_stream", topic=topic)
+    cache_key = deep_dive_cache_key(topic, clinical_context)
+
+    async def events():
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            yield sse_event("token", {"text": cached})
+        else:
+            chunks = []
+            try:
+                with span("llm"):
+                    async for chunk in llm.stream(prompt):
+                        chunks.append(chunk)
+                        yield sse_event("token", {"text": chunk})
+            except Exception as e:
+                metrics.log_event("error", endpoint="deep_dive_stream", error=str(e))
+                yield sse_event("error", {"detail": "Synthesis engine busy. Try again shortly."})
+                return
+            await response_cache.set(cache_key, "".join(chunks).strip())
+        yield sse_event("done", {"sources": [c['source'] for c in clinical_context]})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
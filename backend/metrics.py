@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from llm_scheduler import Histogram
+
+# Configuration
+TIMING_LOG = os.getenv("TIMING_LOG", "true").lower() == "true"
+TIMING_LOG_MIN_MS = float(os.getenv("TIMING_LOG_MIN_MS", "0"))  # Only log requests at least this slow
+UNTIMED_PATHS = frozenset(("/metrics", "/healthz", "/readyz"))
+
+# Stage name -> seconds, for the request being served. asyncio.to_thread and
+# the streaming response task copy the context, so spans there land here too.
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Counters and histograms rendered in the Prometheus text format. Metrics
+    other modules already keep (cache counters, LLM histograms) are read at
+    scrape time through collectors instead of being double-counted here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: Histogram}
+        self._help = {}
+        self._buckets = {}
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        self._help[name] = help_text
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=Histogram.BUCKETS):
+        self._help[name] = help_text
+        self._buckets[name] = buckets
+        self._histograms.setdefault(name, {})
+
+    def add_collector(self, collect):
+        """collect() returns [(name, "counter" | "gauge" | "histogram", help, [(labels dict, value or Histogram)])]."""
+        self._collectors.append(collect)
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets.get(name, Histogram.BUCKETS))
+            histogram.observe(value)
+
+    def render(self):
+        families = []
+        with self._lock:
+            for name, series in self._counters.items():
+                families.append((name, "counter", self._help.get(name, ""), list(series.items())))
+            for name, series in self._histograms.items():
+                families.append((name, "histogram", self._help.get(name, ""), list(series.items())))
+        for collect in self._collectors:
+            try:
+                for name, kind, help_text, samples in collect():
+                    families.append((name, kind, help_text,
+                                     [(tuple(sorted(labels.items())), value) for labels, value in samples]))
+            except Exception as e:
+                log_event("metrics_collector_failed", error=str(e))
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(value.buckets + (float("inf"),), value.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_number(value.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+registry.histogram("pychiatrist_request_seconds", "HTTP request latency, including streamed bodies.")
+registry.histogram("pychiatrist_stage_seconds", "Latency of one pipeline stage (safety, retrieval, llm, db_save, ...).")
+registry.histogram("pychiatrist_db_statement_seconds", "Latency of one SQL statement.",
+                   (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+registry.counter("pychiatrist_crisis_intercepts_total", "Entries stopped by the safety interceptor.")
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def _record(stage, seconds):
+    registry.observe("pychiatrist_stage_seconds", seconds, stage=stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage):
+    """Times a block as `stage`, in the stage histogram and the current request's timing log."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(stage, time.perf_counter() - started)
+
+
+def instrument_engine(engine, name):
+    """Times every SQL statement on a (sync) engine; pass async_engine.sync_engine for async ones."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["statement_started"].pop()
+        registry.observe("pychiatrist_db_statement_seconds", seconds, engine=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages["db"] = stages.get("db", 0.0) + seconds
+            stages["db_statements"] = stages.get("db_statements", 0) + 1
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("statement_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def log_event(event, **fields):
+    """Prints one JSON log line, the same shape as the per-request timing lines."""
+    print(json.dumps({"event": event, **fields}, default=str))
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware recording each request's latency by route template and
+    status, and printing one JSON line with its per-stage breakdown (ms).
+    Streaming responses are timed to their last byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTIMED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        stages = {}
+        token = _request_stages.set(stages)
+        status = [500]
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_stages.reset(token)
+            seconds = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe("pychiatrist_request_seconds", seconds,
+                             method=scope["method"], route=route, status=status[0])
+            if TIMING_LOG and seconds * 1000 >= TIMING_LOG_MIN_MS:
+                log_event("request", method=scope["method"], route=route, path=scope["path"],
+                          status=status[0], ms=round(seconds * 1000, 2),
+                          stages={k: round(v * 1000, 2) if isinstance(v, float) else v for k, v in stages.items()})
+
+
+def collect_runtime():
+    """Counters and histograms the caches, LLM client and insight queue already keep."""
+    from llm_client import llm
+    from response_cache import response_cache
+    import vector_service
+    import prompt_assembly
+    import insight_jobs
+    import sentiment_engine
+
+    caches = {
+        "llm_responses": response_cache,
+        "retrieval_results": vector_service.result_cache,
+        "query_embeddings": vector_service.embedding_cache,
+        "minhash_signatures": prompt_assembly.signature_cache,
+    }
+    llm_stats = llm.stats()
+    queue_stats = insight_jobs.queue.stats()
+    return [
+        ("pychiatrist_cache_hits_total", "counter", "Cache lookups answered from the cache.",
+         [({"cache": name}, cache.hits) for name, cache in caches.items()]),
+        ("pychiatrist_cache_misses_total", "counter", "Cache lookups that had to compute.",
+         [({"cache": name}, cache.misses) for name, cache in caches.items()]),
+        ("pychiatrist_llm_calls_total", "counter", "Upstream model calls, retries included.",
+         [({}, llm_stats["calls"])]),
+        ("pychiatrist_llm_coalesced_total", "counter", "Model calls served by an identical call in flight.",
+         [({}, llm_stats["coalesced"])]),
+        ("pychiatrist_llm_errors_total", "counter", "Model calls that failed: upstream errors (after retries) or timeouts.",
+         [({"error": "upstream"}, llm_stats["failures"]), ({"error": "timeout"}, llm_stats["timeouts"])]),
+        ("pychiatrist_llm_rate_limited_total", "counter", "429 responses from the model API.",
+         [({}, llm_stats["rate_limited"])]),
+        ("pychiatrist_llm_in_flight", "gauge", "Model calls currently admitted.",
+         [({}, llm_stats["in_flight"])]),
+        ("pychiatrist_llm_queued", "gauge", "Model calls waiting for admission.",
+         [({"priority": name}, count) for name, count in llm_stats["queued"].items()]),
+        ("pychiatrist_llm_queue_seconds", "histogram", "Time a model call waited for admission.",
+         [({"priority": name}, histogram) for name, histogram in llm.queue_time.items()]),
+        ("pychiatrist_llm_upstream_seconds", "histogram", "Model API latency.",
+         [({}, llm.upstream_time)]),
+        ("pychiatrist_prompt_tokens", "histogram", "Estimated size of assembled prompts.",
+         [({"endpoint": label}, histogram) for label, histogram in prompt_assembly.prompt_tokens.items()]),
+        ("pychiatrist_sentiments_total", "counter", "Stored sentiments by source: model trailer, local classifier or defaults.",
+         [({"source": source}, count) for source, count in sorted(sentiment_engine.sources.items())]),
+        ("pychiatrist_sentiment_classifier_seconds", "histogram", "Local sentiment classifier latency per call.",
+         [({}, model.latency) for model in (sentiment_engine.loaded_model(),) if model is not None]),
+        ("pychiatrist_insight_queue_depth", "gauge", "Users waiting for or running a background recompute.",
+         [({}, queue_stats["depth"])]),
+        ("pychiatrist_insight_jobs_total", "counter", "Background recomputes by outcome.",
+         [({"outcome": outcome}, queue_stats[outcome]) for outcome in ("completed", "retried", "failed")]),
+    ]
+
+
+def render():
+    return registry.render()
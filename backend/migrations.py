@@ -0,0 +1,118 @@
+import argparse
+from datetime import datetime
+
+from sqlalchemy import text, insert
+from sqlalchemy.orm import Session
+
+from models import SentimentTrigger
+import rollups
+
+# Fresh databases get the current schema from Base.metadata.create_all();
+# migrations bring older files up to it. Each step runs once, in its own
+# transaction, and is written to be harmless on a database that already has
+# the change (IF NOT EXISTS, idempotent data moves).
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+@migration(1, "Index entries by (user_id, created_at)")
+def add_entries_user_created_index(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_entries_user_created ON entries (user_id, created_at)"))
+
+
+@migration(2, "One sentiment per entry, with a unique index on entry_id")
+def add_sentiments_entry_id_index(conn):
+    # Older builds could store a second sentiment for an entry on retry; keep the newest
+    conn.execute(text(
+        "DELETE FROM sentiments WHERE entry_id IS NOT NULL AND id NOT IN "
+        "(SELECT MAX(id) FROM sentiments WHERE entry_id IS NOT NULL GROUP BY entry_id)"
+    ))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_sentiments_entry_id ON sentiments (entry_id)"))
+
+
+@migration(3, "Move comma-separated triggers into sentiment_triggers")
+def normalize_triggers(conn, batch_size=10000):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sentiment_triggers_sentiment_id ON sentiment_triggers (sentiment_id)"))
+    conn.execute(text("DELETE FROM sentiment_triggers"))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, triggers FROM sentiments WHERE id > :last ORDER BY id LIMIT :n"),
+            {"last": last_id, "n": batch_size}
+        ).all()
+        if not rows:
+            break
+        trigger_rows = [
+            {"sentiment_id": sentiment_id, "name": name}
+            for sentiment_id, triggers in rows for name in rollups.split_triggers(triggers)
+        ]
+        if trigger_rows:
+            conn.execute(insert(SentimentTrigger), trigger_rows)
+        last_id = rows[-1][0]
+
+
+@migration(4, "Rebuild daily mood rollups")
+def rebuild_rollups(conn):
+    db = Session(bind=conn)
+    rollups.backfill(db)
+    db.close()
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR, applied_at TIMESTAMP)"
+    ))
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+
+def upgrade(engine):
+    """Applies every pending migration in order and returns the versions applied."""
+    done = applied_versions(engine)
+    applied = []
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        start = datetime.utcnow()
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()}
+            )
+        print(f"Applied migration {version}: {description} ({(datetime.utcnow() - start).total_seconds():.2f}s)")
+        applied.append(version)
+    if applied:
+        # Refresh planner statistics so the new indexes and tables are costed correctly
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    return applied
+
+
+if __name__ == "__main__":
+    from database import engine
+    from models import Base
+
+    parser = argparse.ArgumentParser(description="Bring the database schema up to date.")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they have run.")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    if args.status:
+        done = applied_versions(engine)
+        for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+            print(f"{'x' if version in done else ' '} {version:>3}  {description}")
+    else:
+        applied = upgrade(engine)
+        print(f"Schema is up to date ({len(applied)} migration(s) applied).")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Date, Float, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -25,12 +25,94 @@ class Entry(Base):
     user = relationship("User", back_populates="entries")
     sentiment = relationship("Sentiment", back_populates="entry", uselist=False)
 
+    # Every per-user query filters on user_id and a created_at window or order
+    __table_args__ = (Index("ix_entries_user_created", "user_id", "created_at"),)
+
 class Sentiment(Base):
     __tablename__ = "sentiments"
     id = Column(Integer, primary_key=True, index=True)
     entry_id = Column(Integer, ForeignKey("entries.id"))
     primary_emotion = Column(String)
     intensity_score = Column(Float)  # 1-10
-    triggers = Column(String)  # Comma-separated list like 'Work, Family'
+    triggers = Column(String)  # Comma-separated list like 'Work, Family', kept as written for display
     
     entry = relationship("Entry", back_populates="sentiment")
+    trigger_list = relationship("SentimentTrigger", back_populates="sentiment", cascade="all, delete-orphan")
+
+    __table_args__ = (Index("ix_sentiments_entry_id", "entry_id", unique=True),)
+
+class SentimentTrigger(Base):
+    """One normalized trigger name per row, for aggregation without string splitting."""
+    __tablename__ = "sentiment_triggers"
+    id = Column(Integer, primary_key=True)
+    sentiment_id = Column(Integer, ForeignKey("sentiments.id"), nullable=False)
+    name = Column(String, nullable=False)
+
+    sentiment = relationship("Sentiment", back_populates="trigger_list")
+
+    __table_args__ = (Index("ix_sentiment_triggers_sentiment_id", "sentiment_id"),)
+
+# Per-user, per-day aggregates kept in step with `sentiments` (see rollups.py),
+# so dashboard analytics read O(days) rows instead of every entry.
+class DailyMood(Base):
+    __tablename__ = "daily_mood"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    entry_count = Column(Integer, default=0)
+    intensity_sum = Column(Float, default=0.0)
+    intensity_sq_sum = Column(Float, default=0.0)
+
+class DailyEmotionCount(Base):
+    __tablename__ = "daily_emotion_counts"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    emotion = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+
+class DailyTriggerCount(Base):
+    __tablename__ = "daily_trigger_counts"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    trigger = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String, default="pending")  # pending, running, completed, failed
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    crisis_flagged = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ImportJobItem(Base):
+    __tablename__ = "import_job_items"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("import_jobs.id"))
+    seq = Column(Integer)
+    content = Column(Text)
+    created_at = Column(DateTime)  # Original timestamp from the source app, if any
+    done = Column(Boolean, default=False)
+
+    __table_args__ = (Index("ix_import_job_items_job_done_seq", "job_id", "done", "seq"),)
+
+# Bumped in the same transaction as any write that changes what a user's
+# dashboard shows; user_id 0 stands for everyone (rollup rebuilds, migrations).
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    user_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# LLM-derived per-user results (suggested prompts, mood prediction), kept up
+# to date by the background queue in insight_jobs.py.
+class DerivedInsight(Base):
+    __tablename__ = "derived_insights"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    kind = Column(String, primary_key=True)  # suggested_prompts, mood_prediction
+    payload = Column(Text)  # JSON
+    source_entry_id = Column(Integer)  # Latest entry when computed; a newer entry makes the result stale
+    computed_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+# Configuration
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = 120
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a daemon thread snapshots every thread's Python
+    stack each `interval_ms` (sys._current_frames) and counts them. Nothing
+    is hooked into the code being profiled, so the cost is the sampling
+    thread alone. Output is collapsed stacks ("outer;inner count" per line),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+_active = threading.Lock()
+
+
+def profile_for(seconds, interval_ms=PROFILE_INTERVAL_MS):
+    """
+    Samples every thread for `seconds` and returns collapsed stacks, or None
+    if another profile is already running. Blocks; call it off the event loop.
+    """
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval_ms)
+        profiler.start()
+        time.sleep(min(seconds, PROFILE_MAX_SECONDS))
+        profiler.stop()
+        return profiler.collapsed()
+    finally:
+        _active.release()
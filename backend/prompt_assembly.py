@@ -0,0 +1,163 @@
+import os
+import re
+import math
+import zlib
+import hashlib
+
+import numpy as np
+
+import metrics
+from cache import TTLCache
+from llm_scheduler import Histogram
+
+# Configuration
+# Token budgets for the whole prompt, per endpoint. The user's own text is
+# never cut; retrieved context is deduplicated and trimmed to fit around it.
+PROMPT_BUDGET_JOURNAL = int(os.getenv("PROMPT_BUDGET_JOURNAL", "1500"))
+PROMPT_BUDGET_DEEP_DIVE = int(os.getenv("PROMPT_BUDGET_DEEP_DIVE", "2500"))
+PROMPT_BUDGET_IMPORT = int(os.getenv("PROMPT_BUDGET_IMPORT", "1200"))
+PROMPT_BUDGET_SUGGESTED_PROMPTS = int(os.getenv("PROMPT_BUDGET_SUGGESTED_PROMPTS", "2000"))
+PROMPT_DEDUP_THRESHOLD = float(os.getenv("PROMPT_DEDUP_THRESHOLD", "0.8"))  # Estimated Jaccard similarity
+# The best-ranked items are sent even past the budget, so a very long entry still gets a grounded reply
+PROMPT_MIN_CONTEXT_ITEMS = int(os.getenv("PROMPT_MIN_CONTEXT_ITEMS", "1"))
+PROMPT_MIN_TRIMMED_TOKENS = 40  # A cut-down item shorter than this is dropped instead
+CHARS_PER_TOKEN = 4
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 3
+
+WORD = re.compile(r"\w+")
+MERSENNE_PRIME = (1 << 31) - 1
+# Fixed seed: signatures must stay comparable across restarts and processes
+_rng = np.random.default_rng(19)
+_PERM_A = _rng.integers(1, MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+# Knowledge chunks repeat across requests, so their signatures are kept
+signature_cache = TTLCache(maxsize=4096, ttl=24 * 3600.0)
+prompt_tokens = {}  # label -> Histogram of assembled prompt sizes
+counters = {"prompts": 0, "over_budget": 0, "duplicates_dropped": 0, "items_dropped": 0, "items_trimmed": 0}
+TOKEN_BUCKETS = (100, 250, 500, 1000, 1500, 2000, 3000, 5000, 8000, 16000, 32000)
+
+
+def count_tokens(text):
+    """
+    Gemini token estimate (about 4 characters per token for English). The
+    exact count is an API round trip, too slow to pay on every request; the
+    estimate errs high and is what the LLM scheduler budgets with too.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text):
+    """MinHash signature of the text's word 3-gram shingles."""
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    signature = signature_cache.get(key)
+    if signature is None:
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+        # a < 2^31 and hash < 2^32, so a * hash + b stays within 64 bits
+        signature = ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % MERSENNE_PRIME).min(axis=1)
+        signature_cache.set(key, signature)
+    return signature
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def deduplicate(items, threshold=PROMPT_DEDUP_THRESHOLD):
+    """
+    Drops items whose content is a near-duplicate of an earlier (better
+    ranked) one. Returns (kept, dropped_count).
+    """
+    kept, signatures = [], []
+    for item in items:
+        signature = minhash(item["content"])
+        if any(similarity(signature, other) >= threshold for other in signatures):
+            continue
+        kept.append(item)
+        signatures.append(signature)
+    return kept, len(items) - len(kept)
+
+
+def truncate(text, max_tokens):
+    """Cuts text to about max_tokens at a word boundary, marking the cut."""
+    limit = max(0, max_tokens - 1) * CHARS_PER_TOKEN
+    if len(text) <= limit + CHARS_PER_TOKEN:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip() + " ..."
+
+
+def fit_to_budget(template, items, available):
+    """
+    Keeps items in rank order while they fit in `available` tokens; the
+    first one that does not fit is cut down if enough room is left, and
+    everything after it is dropped. The first PROMPT_MIN_CONTEXT_ITEMS are
+    always kept. Returns (used, trimmed_count).
+    """
+    used, trimmed = [], 0
+    separator = count_tokens(template.separator)
+    for item in items:
+        cost = count_tokens(template.render_item(item)) + (separator if used else 0)
+        if cost <= available or len(used) < PROMPT_MIN_CONTEXT_ITEMS:
+            used.append(item)
+            available -= cost
+            continue
+        overhead = cost - count_tokens(item["content"])
+        room = available - overhead
+        if room >= PROMPT_MIN_TRIMMED_TOKENS:
+            used.append({**item, "content": truncate(item["content"], room)})
+            trimmed += 1
+        break
+    return used, trimmed
+
+
+def assemble(template, context=(), budget=None, label=None, dedupe=True, log=False, **fields):
+    """
+    Renders `template` with as much of `context` (best first) as fits in
+    `budget` tokens, after removing near-duplicate items. Sizes go to the
+    stats and the prompt_tokens histogram; log=True also logs a "prompt"
+    event for this one. Returns (prompt, context actually used).
+    """
+    label = label or template.name
+    context = list(context)
+    duplicates = 0
+    if dedupe:
+        context, duplicates = deduplicate(context)
+    if budget is None:
+        used, trimmed = context, 0
+    else:
+        available = budget - count_tokens(template.render((), **fields))
+        used, trimmed = fit_to_budget(template, context, available)
+    prompt = template.render(used, **fields)
+    tokens = count_tokens(prompt)
+    dropped = len(context) - len(used)
+
+    counters["prompts"] += 1
+    counters["duplicates_dropped"] += duplicates
+    counters["items_dropped"] += dropped
+    counters["items_trimmed"] += trimmed
+    over_budget = budget is not None and tokens > budget
+    counters["over_budget"] += over_budget
+    prompt_tokens.setdefault(label, Histogram(TOKEN_BUCKETS)).observe(tokens)
+    if log:
+        metrics.log_event("prompt", label=label, version=template.version, tokens=tokens, budget=budget,
+                          context_items=len(used), duplicates=duplicates, dropped=dropped, trimmed=trimmed,
+                          over_budget=over_budget)
+    return prompt, used
+
+
+def stats():
+    return {
+        **counters,
+        "prompt_tokens": {label: histogram.snapshot() for label, histogram in prompt_tokens.items()},
+        "signature_cache": signature_cache.stats()
+    }
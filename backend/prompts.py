@@ -0,0 +1,88 @@
+from string import Template
+
+
+class PromptTemplate:
+    """
+    A versioned prompt. `text` uses $field placeholders (so the JSON examples
+    need no escaping); `$context` is filled with the context items, each
+    rendered with `item` and joined with `separator`. Bump the version
+    whenever the wording changes so cached outputs for the old wording are
+    not reused.
+    """
+
+    def __init__(self, name, version, text, item="$content", separator="\n"):
+        self.name = name
+        self.version = version
+        self.text = Template(text)
+        self.item = Template(item)
+        self.separator = separator
+
+    def render_item(self, item):
+        return self.item.substitute(item)
+
+    def render(self, context=(), **fields):
+        context_str = self.separator.join(self.render_item(item) for item in context)
+        return self.text.substitute(fields, context=context_str)
+
+
+JOURNAL = PromptTemplate(
+    "journal", "journal-v1",
+    "System: You are an AI mental health guide. Use the following clinical research to guide the user:\n"
+    "$context\n\n"
+    "Do not give physical medical advice. Be empathetic, non-judgmental, and supportive. "
+    "IMPORTANT: When referencing research, mention the specific source (e.g., 'According to the Harvard Study...'). "
+    "\n\nCRITICAL: At the very end of your response, provide a JSON-formatted block for sentiment analysis like this: "
+    "SENTIMENT_DATA: {\"emotion\": \"string\", \"intensity\": float_1_to_10, \"triggers\": \"1-2 words only, comma separated\"}"
+    "\nUser: $content",
+    item="Source: $source\nContent: $content"
+)
+
+# JOURNAL without the SENTIMENT_DATA request, for when sentiment comes from the local classifier
+JOURNAL_REPLY = PromptTemplate(
+    "journal", "journal-reply-v1",
+    "System: You are an AI mental health guide. Use the following clinical research to guide the user:\n"
+    "$context\n\n"
+    "Do not give physical medical advice. Be empathetic, non-judgmental, and supportive. "
+    "IMPORTANT: When referencing research, mention the specific source (e.g., 'According to the Harvard Study...'). "
+    "\nUser: $content",
+    item="Source: $source\nContent: $content"
+)
+
+DEEP_DIVE = PromptTemplate(
+    "deep_dive", "deep-dive-v1",
+    "You are a clinical research synthesist. A user is asking for a deep dive into the following topic: "
+    "'$topic'.\n\n"
+    "Use the following academic research chunks to provide a detailed, structured, and informative analysis:\n"
+    "$context\n\n"
+    "Structure your response with:\n"
+    "1. Overview of the topic\n"
+    "2. Key Clinical Findings (cite sources)\n"
+    "3. Practical Applications (if applicable)\n"
+    "4. Limitations/Further Research\n\n"
+    "Maintain a high academic tone but remain accessible. Do not provide medical diagnoses.",
+    item="Source: $source\nContent: $content"
+)
+
+SUGGESTED_PROMPTS = PromptTemplate(
+    "suggested_prompts", "suggested-prompts-v1",
+    "You are a clinical journaling assistant. Below are a user's recent journal entries:\n\n"
+    "$context\n\n"
+    "Based on these 'answers', generate 3 highly personalized 'Suggested Focus' items. "
+    "For each item, provide:\n"
+    "1. A focus question (under 15 words)\n"
+    "2. A 'starter' sentence that helps them begin writing (e.g., 'Looking back at that moment, I realize...')\n\n"
+    "Format: Return a JSON list of objects with keys 'prompt' and 'starter'. No other text.",
+    separator="\n---\n"
+)
+
+MOOD_PREDICTION = PromptTemplate(
+    "mood_prediction", "mood-prediction-v1",
+    "You are a clinical predictive assistant. Based on the following user sentiment history:\n\n"
+    "$context\n\n"
+    "1. Predict the user's emotional trajectory for the next 3 days with a concise clinical rationale (max 60 words).\n"
+    "2. Provide 3 specific, actionable clinical advice bullet points for the user to maintain or improve their wellbeing based on their patterns.\n\n"
+    "Format your response EXACTLY as a JSON object with this structure:\n"
+    '{"prediction": "...", "advice": ["...", "...", "..."]}',
+    item="Date: $date, Emotion: $emotion, Intensity: $intensity"
+)
+
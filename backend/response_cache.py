@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+
+from cache import TTLCache
+from retrieval_runtime import collection_version
+from llm_client import cancel_on_disconnect
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "sqlite")  # "memory", "sqlite" or "redis"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_SQLITE_PATH = os.getenv("RESPONSE_CACHE_SQLITE_PATH", os.path.join(BASE_DIR, "llm_cache.db"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryBackend:
+    """Per-process cache; lost on restart and not shared between workers."""
+
+    blocking = False
+
+    def __init__(self, maxsize=1024, ttl=RESPONSE_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, version, value):
+        self._cache.set(key, value)
+
+    def purge(self, current_version):
+        self._cache.clear()
+
+
+class SQLiteBackend:
+    """Shared between workers and restarts through a small SQLite file next to pychiatrist.db."""
+
+    blocking = True
+
+    def __init__(self, path=RESPONSE_CACHE_SQLITE_PATH, ttl=RESPONSE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A lost entry only costs a regeneration, so commit without an fsync each time
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+            "key TEXT PRIMARY KEY, collection_version TEXT, value TEXT, created_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_response_cache WHERE key = ? AND created_at > ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, version, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache VALUES (?, ?, ?, ?)",
+                (key, version, value, time.time())
+            )
+            self._conn.commit()
+
+    def purge(self, current_version):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM llm_response_cache WHERE collection_version != ? OR created_at <= ?",
+                (current_version, time.time() - self.ttl)
+            )
+            self._conn.commit()
+
+
+class RedisBackend:
+    """Any Redis-protocol server (Redis, Valkey, KeyDB, ...). Expiry is left to the server."""
+
+    blocking = True
+
+    def __init__(self, url=REDIS_URL, ttl=RESPONSE_CACHE_TTL, prefix="pychiatrist:llm:"):
+        import redis
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, version, value):
+        self._client.set(self.prefix + key, value, ex=self.ttl)
+        self._client.sadd(f"{self.prefix}version:{version}", key)
+
+    def purge(self, current_version):
+        for version_key in self._client.scan_iter(f"{self.prefix}version:*"):
+            if version_key.endswith(f":{current_version}"):
+                continue
+            keys = list(self._client.smembers(version_key))
+            if keys:
+                self._client.delete(*[self.prefix + k for k in keys])
+            self._client.delete(version_key)
+
+
+def build_backend(name=RESPONSE_CACHE_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend()
+    return SQLiteBackend()
+
+
+def make_key(template_version, chunk_ids, *parts):
+    """Stable hash of the prompt template version, retrieved chunk IDs and any other inputs."""
+    payload = json.dumps([template_version, list(chunk_ids), *parts], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Caches LLM outputs by input hash. Concurrent requests for the same key
+    share one upstream call, and entries from before a re-ingest of the
+    knowledge collection are purged the first time the new version is seen.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._inflight = {}
+        self._seen_version = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _current_version(self):
+        version = collection_version()
+        if version != self._seen_version:
+            if self._seen_version is not None:
+                self.backend.purge(version)
+            self._seen_version = version
+        return version
+
+    def _lookup(self, key):
+        self._current_version()
+        return self.backend.get(key)
+
+    def _store(self, key, value):
+        self.backend.set(key, self._current_version(), value)
+
+    async def _call(self, fn, *args):
+        # SQLite and Redis round trips would stall every request on the loop, so they run in a thread
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def get(self, key):
+        value = await self._call(self._lookup, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, value):
+        await self._call(self._store, key, value)
+
+    async def get_or_compute(self, key, compute, request=None):
+        """
+        Returns the cached value for key, or awaits compute() to produce it.
+        The upstream call is shared by every caller waiting on the same key
+        and is only cancelled once all of them have gone away (e.g. when the
+        given request's client disconnects).
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            entry = self._inflight[key] = {"task": task, "waiters": 0}
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+
+        task = entry["task"]
+        entry["waiters"] += 1
+        try:
+            waiter = asyncio.shield(task)
+            if request is not None:
+                return await cancel_on_disconnect(waiter, request)
+            return await waiter
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and not task.done():
+                # Forget it now, not in the done-callback, so a caller arriving meanwhile starts afresh
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+                task.cancel()
+
+    async def _compute_and_store(self, key, compute):
+        value = await compute()
+        await self.set(key, value)
+        return value
+
+    def _finish(self, key, task):
+        if self._inflight.get(key, {}).get("task") is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every waiter went away
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+response_cache = ResponseCache(build_backend())
@@ -0,0 +1,194 @@
+import os
+import uuid
+import threading
+
+import metrics
+
+# Configuration
+CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", os.path.join(os.path.dirname(__file__), "chroma_db"))
+COLLECTION_NAME = "clinical_knowledge"
+JOURNAL_COLLECTION_NAME = "journal_entries"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+VERSION_FILE = os.path.join(CHROMA_DB_DIR, "collection_version")
+BM25_INDEX_PATH = os.path.join(CHROMA_DB_DIR, "bm25_index.json")
+# CPU cross-encoder for re-ranking, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"; empty disables it
+RERANKER_MODEL_NAME = os.getenv("RERANKER_MODEL", "")
+
+# chromadb and sentence-transformers (and through them torch) are imported on
+# first use, so importing this module - and main.py - stays cheap.
+_lock = threading.Lock()
+_client = None
+_embedding_service = None
+_embedding_function = None
+_collection = None
+_journal_collection = None
+_bm25_index = (None, None)  # (file mtime, index)
+_reranker = None
+_warmup_error = None
+_version = (None, "initial")  # (stamp file mtime, stamp)
+
+
+def get_client():
+    """Returns the shared ChromaDB client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=CHROMA_DB_DIR)
+    return _client
+
+
+def get_embedding_service():
+    """
+    Returns the shared MiniLM embedding service, loading the model on first
+    use. This will download 'all-MiniLM-L6-v2' the very first time.
+    """
+    global _embedding_service
+    if _embedding_service is None:
+        with _lock:
+            if _embedding_service is None:
+                import embedding_service
+                _embedding_service = embedding_service.EmbeddingService(
+                    embedding_service.load_model(EMBEDDING_MODEL_NAME)
+                )
+    return _embedding_service
+
+
+def get_embedding_function():
+    """Returns the Chroma embedding function, backed by the shared embedding service."""
+    global _embedding_function
+    if _embedding_function is None:
+        service = get_embedding_service()
+        with _lock:
+            if _embedding_function is None:
+                from embedding_service import ServiceEmbeddingFunction
+                _embedding_function = ServiceEmbeddingFunction(service, EMBEDDING_MODEL_NAME)
+    return _embedding_function
+
+
+def get_collection():
+    """Returns the clinical_knowledge collection shared by ingest and serving."""
+    global _collection
+    if _collection is None:
+        client = get_client()
+        embedding_function = get_embedding_function()
+        with _lock:
+            if _collection is None:
+                _collection = client.get_or_create_collection(
+                    name=COLLECTION_NAME,
+                    embedding_function=embedding_function
+                )
+    return _collection
+
+
+def get_journal_collection():
+    """
+    Returns the journal_entries collection: every user's entries, told apart
+    by their user_id metadata and compared by cosine distance.
+    """
+    global _journal_collection
+    if _journal_collection is None:
+        client = get_client()
+        embedding_function = get_embedding_function()
+        with _lock:
+            if _journal_collection is None:
+                _journal_collection = client.get_or_create_collection(
+                    name=JOURNAL_COLLECTION_NAME,
+                    embedding_function=embedding_function,
+                    configuration={"hnsw": {"space": "cosine"}}
+                )
+    return _journal_collection
+
+
+def get_bm25_index(path=BM25_INDEX_PATH):
+    """
+    Returns the keyword index ingest writes next to the collection, reloaded
+    when ingest replaces the file, or None if it has not been built yet.
+    """
+    global _bm25_index
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime != _bm25_index[0]:
+        with _lock:
+            if mtime != _bm25_index[0]:
+                from bm25_index import BM25Index
+                _bm25_index = (mtime, BM25Index.load(path))
+    return _bm25_index[1]
+
+
+def get_reranker():
+    """Returns the shared cross-encoder, loading it on first use, or None when re-ranking is off."""
+    global _reranker
+    if not RERANKER_MODEL_NAME:
+        return None
+    if _reranker is None:
+        with _lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                _reranker = CrossEncoder(RERANKER_MODEL_NAME, device="cpu")
+    return _reranker
+
+
+def collection_version():
+    """
+    Returns a stamp that changes whenever the knowledge collection is
+    re-ingested, including by another process. Only a stat() per call; the
+    file is re-read when its mtime moves.
+    """
+    global _version
+    try:
+        mtime = os.stat(VERSION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return _version[1]
+    if mtime != _version[0]:
+        with open(VERSION_FILE, "r", encoding="utf-8") as f:
+            _version = (mtime, f.read().strip())
+    return _version[1]
+
+
+def bump_collection_version():
+    """Marks the collection as changed so caches keyed on collection_version() go stale."""
+    os.makedirs(CHROMA_DB_DIR, exist_ok=True)
+    with open(VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(uuid.uuid4().hex)
+    return collection_version()
+
+
+def is_ready():
+    """True once the client, model and collection are loaded."""
+    return _collection is not None
+
+
+def warm_up():
+    """Loads everything and runs one throwaway embedding so the first real query is fast."""
+    global _warmup_error
+    try:
+        get_embedding_service().embed(["warm up"])
+        get_collection()
+        get_bm25_index()
+        reranker = get_reranker()
+        if reranker is not None:
+            reranker.predict([("warm up", "warm up")])
+        _warmup_error = None
+    except Exception as e:
+        _warmup_error = str(e)
+        metrics.log_event("warm_up_failed", component="retrieval", error=str(e))
+
+
+def start_background_warm_up():
+    """Starts warm_up() in a daemon thread and returns immediately."""
+    thread = threading.Thread(target=warm_up, name="retrieval-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def embedding_stats():
+    """Micro-batching counters of the embedding service, or None before the model is loaded."""
+    return _embedding_service.stats() if _embedding_service is not None else None
+
+
+def status():
+    return {"ready": is_ready(), "error": _warmup_error}
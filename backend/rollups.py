@@ -0,0 +1,173 @@
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from models import Entry, Sentiment, SentimentTrigger, DailyMood, DailyEmotionCount, DailyTriggerCount
+import database  # Imports this module in turn, so only use its attributes at call time
+import data_versions
+import metrics
+
+
+def split_triggers(triggers):
+    """Splits the comma-separated triggers column the way the dashboard displays them."""
+    if not triggers or triggers == "Unknown":
+        return []
+    return [t.strip().title() for t in triggers.split(",") if t.strip()]
+
+
+def _upsert_counts(db, model, key_columns, rows, counters):
+    if not rows:
+        return
+    stmt = database.dialect_insert(db, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in counters}
+    )
+    db.execute(stmt, rows)
+
+
+def record_sentiments(db, rows):
+    """
+    Adds sentiments to the daily rollups. `rows` yields
+    (user_id, created_at, emotion, intensity, triggers). Increments are done
+    in SQL, so concurrent writers never lose updates; the caller commits,
+    which keeps the rollups in the same transaction as the sentiments.
+    """
+    moods = defaultdict(lambda: [0, 0.0, 0.0])
+    emotions = Counter()
+    triggers = Counter()
+    for user_id, created_at, emotion, intensity, trigger_text in rows:
+        day = created_at.date()
+        if intensity is not None:
+            mood = moods[(user_id, day)]
+            mood[0] += 1
+            mood[1] += float(intensity)
+            mood[2] += float(intensity) ** 2
+        if emotion:
+            emotions[(user_id, day, emotion)] += 1
+        for trigger in split_triggers(trigger_text):
+            triggers[(user_id, day, trigger)] += 1
+
+    _upsert_counts(db, DailyMood, ["user_id", "day"], [
+        {"user_id": u, "day": d, "entry_count": n, "intensity_sum": s, "intensity_sq_sum": sq}
+        for (u, d), (n, s, sq) in moods.items()
+    ], ["entry_count", "intensity_sum", "intensity_sq_sum"])
+    _upsert_counts(db, DailyEmotionCount, ["user_id", "day", "emotion"], [
+        {"user_id": u, "day": d, "emotion": e, "count": n} for (u, d, e), n in emotions.items()
+    ], ["count"])
+    _upsert_counts(db, DailyTriggerCount, ["user_id", "day", "trigger"], [
+        {"user_id": u, "day": d, "trigger": t, "count": n} for (u, d, t), n in triggers.items()
+    ], ["count"])
+
+
+def record_sentiment(db, user_id, created_at, sentiment: dict):
+    """Single-entry form of record_sentiments for a sentiment dict as parsed from the LLM."""
+    record_sentiments(db, [(user_id, created_at, sentiment["emotion"], sentiment["intensity"], sentiment["triggers"])])
+
+
+def backfill(db, user_id=None):
+    """
+    Rebuilds the rollups from entries x sentiments, for one user or everyone,
+    with INSERT ... SELECT ... GROUP BY so no rows pass through Python.
+    """
+    for model in (DailyMood, DailyEmotionCount, DailyTriggerCount):
+        query = db.query(model)
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        query.delete(synchronize_session=False)
+
+    # date() yields 'YYYY-MM-DD' on SQLite, which is how its Date columns are stored
+    day = func.date(Entry.created_at)
+    intensity = Sentiment.intensity_score
+
+    def rebuild(model, columns, keys, aggregates, join_triggers=False, where=None):
+        query = select(Entry.user_id, day, *keys, *aggregates)\
+            .join(Sentiment, Entry.id == Sentiment.entry_id)
+        if join_triggers:
+            query = query.join(SentimentTrigger, SentimentTrigger.sentiment_id == Sentiment.id)
+        if user_id is not None:
+            query = query.where(Entry.user_id == user_id)
+        if where is not None:
+            query = query.where(where)
+        query = query.group_by(Entry.user_id, day, *keys)
+        db.execute(insert(model.__table__).from_select(["user_id", "day", *columns], query))
+
+    rebuild(DailyMood, ["entry_count", "intensity_sum", "intensity_sq_sum"], [],
+            [func.count(intensity), func.sum(intensity), func.sum(intensity * intensity)],
+            where=intensity.isnot(None))
+    rebuild(DailyEmotionCount, ["emotion", "count"], [Sentiment.primary_emotion], [func.count()],
+            where=Sentiment.primary_emotion.isnot(None))
+    rebuild(DailyTriggerCount, ["trigger", "count"], [SentimentTrigger.name], [func.count()], join_triggers=True)
+    data_versions.bump(db, user_id)
+    db.commit()
+
+
+def window_start(days=7):
+    return (datetime.utcnow() - timedelta(days=days)).date()
+
+
+def daily_moods(db, user_id, days=7):
+    """Returns [(day, average intensity, most frequent emotion)] for the window, oldest first."""
+    start = window_start(days)
+    moods = db.query(DailyMood)\
+        .filter(DailyMood.user_id == user_id, DailyMood.day >= start)\
+        .order_by(DailyMood.day)\
+        .all()
+    top_emotion = {}
+    for row in db.query(DailyEmotionCount).filter(DailyEmotionCount.user_id == user_id, DailyEmotionCount.day >= start):
+        best = top_emotion.get(row.day)
+        if best is None or (row.count, row.emotion) > best:
+            top_emotion[row.day] = (row.count, row.emotion)
+    return [
+        (m.day, m.intensity_sum / m.entry_count, top_emotion.get(m.day, (0, None))[1])
+        for m in moods if m.entry_count
+    ]
+
+
+def mood_summary(db, user_id, days=7):
+    """Returns (count, mean, variance) of intensity over the window; mean/variance are None without data."""
+    count, total, sq_total = db.query(
+        func.sum(DailyMood.entry_count), func.sum(DailyMood.intensity_sum), func.sum(DailyMood.intensity_sq_sum)
+    ).filter(DailyMood.user_id == user_id, DailyMood.day >= window_start(days)).one()
+    if not count:
+        return 0, None, None
+    mean = total / count
+    # Clamp tiny negative values from floating point cancellation
+    return count, mean, max(sq_total / count - mean ** 2, 0.0)
+
+
+def _window_counts(db, model, label_column, user_id, days):
+    rows = db.query(label_column, func.sum(model.count))\
+        .filter(model.user_id == user_id, model.day >= window_start(days))\
+        .group_by(label_column)\
+        .all()
+    return Counter({label: int(count) for label, count in rows})
+
+
+def emotion_counts(db, user_id, days=7):
+    return _window_counts(db, DailyEmotionCount, DailyEmotionCount.emotion, user_id, days)
+
+
+def trigger_counts(db, user_id, days=7):
+    return _window_counts(db, DailyTriggerCount, DailyTriggerCount.trigger, user_id, days)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    from models import Base
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily mood rollups from stored sentiments.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's rollups.")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow()
+        backfill(db, user_id=args.user_id)
+        metrics.log_event("rollup_backfill", rollups=db.query(DailyMood).count(),
+                          seconds=round((datetime.utcnow() - start).total_seconds(), 2))
+    finally:
+        db.close()
@@ -1,14 +1,44 @@
 import re
+import unicodedata
 
+# Plain phrases, matched anywhere in the text after normalize_text(), so
+# inflections and typos ("overdosed", "self-harming", "lifeee") and words run
+# together ("aboutsuicide") still count, as with the original substring
+# search. Missing a crisis costs far more than a false alarm. Obfuscated
+# spellings ("k1ll mys3lf", "self—harm", "SUICIDE!!") are folded by the
+# normalizer, so only one spelling per phrase is needed here.
 CRISIS_KEYWORDS = [
-    r"hurt myself",
-    r"suicide",
-    r"kill myself",
-    r"end my life",
-    r"emergency",
-    r"overdose",
-    r"self-harm",
-    r"don't want to live"
+    "hurt myself",
+    "suicide",
+    "kill myself",
+    "end my life",
+    "emergency",
+    "overdose",
+    "self-harm",
+    "selfharm",
+    "don't want to live",
+    "want to die",
+    "suicidal",
+    "take my own life",
+    "no reason to live",
+    "better off dead",
+    "cut myself",
+    # Spanish
+    "quiero morir",
+    "suicidarme",
+    "matarme",
+    "quitarme la vida",
+    # French
+    "me suicider",
+    "envie de mourir",
+    "me tuer",
+    # German
+    "mich umbringen",
+    "selbstmord",
+    "will nicht mehr leben",
+    # Portuguese
+    "quero morrer",
+    "me matar",
 ]
 
 CRISIS_RESPONSE = {
@@ -25,13 +55,94 @@ CRISIS_RESPONSE = {
 
 DISCLAIMER = "This is an AI research tool, not a substitute for professional clinical therapy. Do not give physical medical advice."
 
+# Look-alike digits and symbols commonly used to dodge keyword filters
+LEET_TABLE = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+APOSTROPHES = re.compile(r"['‘’`]")
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_text(text):
+    """
+    Folds text to a canonical form: accents stripped, case-folded, look-alike
+    characters mapped back to letters, apostrophes dropped ("don't" -> "dont")
+    and every run of punctuation/whitespace collapsed to a single space.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    if not text.isascii():
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold().translate(LEET_TABLE)
+    text = APOSTROPHES.sub("", text)
+    return NON_WORD.sub(" ", text).strip()
+
+
+def _trie_pattern(phrases):
+    """
+    Builds one regex from a character trie of the phrases, so shared prefixes
+    are tested once and the cost per character of input stays flat as the
+    phrase list grows (unlike a flat alternation or one search per phrase).
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def render(node):
+        ends_here = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if ends_here else body
+
+    return render(trie)
+
+
+class PhraseMatcher:
+    """
+    Precompiled single-pass matcher over normalized text. Phrases match on
+    whole words unless word_boundaries is off, in which case they match
+    anywhere, inside longer words too.
+    """
+
+    def __init__(self, phrases, word_boundaries=True):
+        self._canonical = {}
+        for phrase in phrases:
+            self._canonical.setdefault(normalize_text(phrase), phrase)
+        boundary = r"\b" if word_boundaries else ""
+        self._pattern = re.compile(boundary + "(" + _trie_pattern(self._canonical) + ")" + boundary)
+
+    def find(self, text):
+        """Returns the distinct phrases present in text, in order of appearance."""
+        matches = []
+        for match in self._pattern.finditer(normalize_text(text)):
+            phrase = self._canonical[match.group(1)]
+            if phrase not in matches:
+                matches.append(phrase)
+        return matches
+
+
+# No word boundaries, so inflected and run-together phrases still match (see CRISIS_KEYWORDS)
+crisis_matcher = PhraseMatcher(CRISIS_KEYWORDS, word_boundaries=False)
+
+
+def scan_for_crisis(user_input: str):
+    """
+    Scans user input for high-risk phrases.
+    Returns (is_crisis, matched_phrases)
+    """
+    matches = crisis_matcher.find(user_input)
+    return bool(matches), matches
+
+
 def safety_interceptor(user_input: str):
     """
     Scans user input for high-risk keywords.
     Returns (is_crisis, response)
     """
-    for pattern in CRISIS_KEYWORDS:
-        if re.search(pattern, user_input, re.IGNORECASE):
-            return True, CRISIS_RESPONSE["response"]
-    
+    is_crisis, _ = scan_for_crisis(user_input)
+    if is_crisis:
+        return True, CRISIS_RESPONSE["response"]
+
     return False, None
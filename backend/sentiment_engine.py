@@ -0,0 +1,328 @@
+import os
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter
+
+import prompts
+import metrics
+from llm_scheduler import Histogram
+from safety import PhraseMatcher
+from streaming import DEFAULT_SENTIMENT
+
+# Configuration
+# Where an entry's sentiment comes from:
+#   llm     the SENTIMENT_DATA trailer the journal prompt asks for (neutral defaults if it is unusable)
+#   local   the CPU classifier below; the prompt asks for no trailer, so replies are shorter
+#   hybrid  the trailer, with the classifier run alongside the model call as the fallback
+SENTIMENT_ENGINE = os.getenv("SENTIMENT_ENGINE", "llm")
+SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "j-hartmann/emotion-english-distilroberta-base")
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch")  # "torch", or "onnx" (needs optimum[onnxruntime])
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "32"))
+SENTIMENT_MAX_TOKENS = int(os.getenv("SENTIMENT_MAX_TOKENS", "256"))  # Longer entries are classified on their start
+ENGINES = ("llm", "local", "hybrid")
+BACKENDS = ("torch", "onnx")
+
+# Fail at startup on a typo rather than fall through to the hybrid path and
+# download the classifier on the first request
+if SENTIMENT_ENGINE not in ENGINES:
+    raise ValueError(f"SENTIMENT_ENGINE must be one of {', '.join(ENGINES)}, not {SENTIMENT_ENGINE!r}")
+if SENTIMENT_BACKEND not in BACKENDS:
+    raise ValueError(f"SENTIMENT_BACKEND must be one of {', '.join(BACKENDS)}, not {SENTIMENT_BACKEND!r}")
+
+# Classifier labels -> the emotion names the LLM uses and the dashboard shows
+EMOTION_NAMES = {
+    "joy": "Joy",
+    "fear": "Anxiety",
+    "sadness": "Sadness",
+    "anger": "Anger",
+    "disgust": "Disgust",
+    "surprise": "Surprise",
+    "neutral": "Neutral",
+}
+
+# Trigger -> words that point at it, matched on whole words like the crisis phrases
+TRIGGER_KEYWORDS = {
+    "Work": ["work", "job", "boss", "manager", "coworker", "coworkers", "colleague", "colleagues", "meeting",
+             "meetings", "deadline", "deadlines", "office", "shift", "career", "promotion", "workload", "interview"],
+    "School": ["school", "exam", "exams", "class", "classes", "homework", "teacher", "professor", "college",
+               "university", "grades", "thesis", "assignment", "studying"],
+    "Family": ["family", "mom", "dad", "mother", "father", "parents", "sister", "brother", "son", "daughter",
+               "kids", "children", "grandmother", "grandfather"],
+    "Relationship": ["partner", "boyfriend", "girlfriend", "husband", "wife", "marriage", "breakup",
+                     "broke up", "divorce", "dating", "relationship"],
+    "Friends": ["friend", "friends", "friendship"],
+    "Sleep": ["sleep", "slept", "insomnia", "tired", "exhausted", "nightmare", "nightmares"],
+    "Health": ["health", "sick", "pain", "illness", "doctor", "hospital", "diagnosis", "headache", "injury"],
+    "Money": ["money", "rent", "bills", "debt", "loan", "salary", "finances", "financial", "afford", "budget"],
+    "Loneliness": ["lonely", "alone", "isolated", "loneliness"],
+}
+MAX_TRIGGERS = 2  # The trailer asks the model for "1-2 words"
+
+sources = Counter()  # Stored sentiments by origin: trailer, local, default
+
+
+class TriggerExtractor:
+    """Names the triggers with the most distinct keywords in a text; earlier mentions win ties."""
+
+    def __init__(self, keywords=TRIGGER_KEYWORDS, limit=MAX_TRIGGERS):
+        self._trigger = {phrase: name for name, phrases in keywords.items() for phrase in phrases}
+        self._matcher = PhraseMatcher(self._trigger)
+        self.limit = limit
+
+    def extract(self, text):
+        hits = Counter(self._trigger[phrase] for phrase in self._matcher.find(text))
+        return ", ".join(name for name, _ in hits.most_common(self.limit)) or DEFAULT_SENTIMENT["triggers"]
+
+
+def load_classifier(model_name=SENTIMENT_MODEL, backend=SENTIMENT_BACKEND):
+    """Loads a sequence-classification model and its tokenizer for CPU inference with torch or ONNX Runtime."""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        return tokenizer, ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    from transformers import AutoModelForSequenceClassification
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    return tokenizer, model
+
+
+class LocalSentimentModel:
+    """
+    Emotion classifier plus keyword triggers, producing the same
+    {"emotion", "intensity", "triggers"} dicts as the trailer. The emotion is
+    the top label; intensity maps the probability of anything but "neutral"
+    onto 1-10. analyze() runs `batch_size` texts per forward pass and records
+    each call's latency.
+    """
+
+    def __init__(self, tokenizer, model, batch_size=SENTIMENT_BATCH_SIZE, max_tokens=SENTIMENT_MAX_TOKENS):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.labels = [model.config.id2label[i].lower() for i in range(model.config.num_labels)]
+        self.neutral = self.labels.index("neutral") if "neutral" in self.labels else None
+        self.triggers = TriggerExtractor()
+        self.latency = Histogram()
+        # Fast tokenizers are not safe to call from two threads at once
+        self._inference = threading.Lock()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.batches = 0
+
+    def classify(self, texts):
+        """Label probabilities for `texts` as an (n, labels) array, in one forward pass."""
+        import torch
+        with self._inference:
+            inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_tokens,
+                                    return_tensors="pt")
+            with torch.inference_mode():
+                logits = self.model(**inputs).logits
+        return torch.softmax(logits.float(), dim=-1).numpy()
+
+    def to_sentiment(self, probabilities, text):
+        top = int(probabilities.argmax())
+        label = self.labels[top]
+        emotional = 1 - probabilities[self.neutral] if self.neutral is not None else probabilities[top]
+        return {
+            "emotion": EMOTION_NAMES.get(label, label.title()),
+            "intensity": round(1 + 9 * float(emotional), 1),
+            "triggers": self.triggers.extract(text)
+        }
+
+    def analyze(self, texts):
+        """Sentiment dicts for `texts`, in order."""
+        texts = list(texts)
+        started = time.perf_counter()
+        results = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            results.extend(self.to_sentiment(p, text) for p, text in zip(self.classify(batch), batch))
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+            self.batches += -(-len(texts) // self.batch_size)
+            self.latency.observe(seconds)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "texts": self.texts,
+                "batches": self.batches,
+                "latency": self.latency.snapshot()
+            }
+
+
+_lock = threading.Lock()
+_local_model = None
+
+
+def get_local_model():
+    """Returns the shared classifier, loading it on first use (a download the very first time)."""
+    global _local_model
+    if _local_model is None:
+        with _lock:
+            if _local_model is None:
+                _local_model = LocalSentimentModel(*load_classifier())
+    return _local_model
+
+
+def loaded_model():
+    """The classifier if something has loaded it, else None."""
+    return _local_model
+
+
+def analyze(texts):
+    return get_local_model().analyze(texts)
+
+
+def start_background_warm_up(engine=SENTIMENT_ENGINE):
+    """Loads the classifier in a daemon thread if the engine uses it, so the first entry does not wait for it."""
+    if engine == "llm":
+        return None
+
+    def warm_up():
+        try:
+            analyze(["warm up"])
+        except Exception as e:
+            metrics.log_event("warm_up_failed", component="sentiment_classifier", error=str(e))
+
+    thread = threading.Thread(target=warm_up, name="sentiment-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def journal_template(engine=SENTIMENT_ENGINE):
+    """The journal prompt for an engine: only "local" drops the SENTIMENT_DATA request."""
+    return prompts.JOURNAL_REPLY if engine == "local" else prompts.JOURNAL
+
+
+def _retrieve(future):
+    # A classifier run whose result goes unused must not log "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+class SentimentTask:
+    """
+    Sentiment for one entry. Start it before the model call so the
+    classifier runs while the reply is generated, then resolve() it with
+    the parsed trailer (None if there was none or it was unusable).
+    """
+
+    def __init__(self, engine, local=None, index=None, shared=False):
+        self.engine = engine
+        self._local = local
+        self._index = index
+        self._shared = shared
+
+    def cancel(self):
+        """Drops the classifier run of an entry that will not be stored; a batch's shared run is left alone."""
+        if self._local is not None and not self._shared:
+            self._local.cancel()
+
+    async def resolve(self, trailer):
+        if trailer is not None and self.engine != "local":
+            sources["trailer"] += 1
+            return trailer
+        if self._local is not None:
+            try:
+                # Shielded: entries of one batch share the run, so one cancelled request must not end it
+                result = await asyncio.shield(self._local)
+                sources["local"] += 1
+                return result if self._index is None else result[self._index]
+            except Exception as e:
+                metrics.log_event("local_sentiment_failed", error=str(e))
+        sources["default"] += 1
+        return dict(DEFAULT_SENTIMENT)
+
+
+def _start_local(texts):
+    future = asyncio.ensure_future(asyncio.to_thread(analyze, texts))
+    future.add_done_callback(_retrieve)
+    return future
+
+
+def start(content, engine=SENTIMENT_ENGINE):
+    """SentimentTask for one entry, with the classifier already running if the engine uses it."""
+    if engine == "llm":
+        return SentimentTask(engine)
+    local = _start_local([content])
+    return SentimentTask(engine, local, 0)
+
+
+def start_batch(contents, engine=SENTIMENT_ENGINE):
+    """SentimentTasks for many entries that share one batched classifier run."""
+    if engine == "llm" or not contents:
+        return [SentimentTask(engine) for _ in contents]
+    local = _start_local(list(contents))
+    return [SentimentTask(engine, local, i, shared=True) for i in range(len(contents))]
+
+
+def stats():
+    return {
+        "engine": SENTIMENT_ENGINE,
+        "sources": dict(sources),
+        "local_model": _local_model.stats() if _local_model is not None else None
+    }
+
+
+def relabel_defaults(db, batch_size=SENTIMENT_BATCH_SIZE * 8, user_id=None):
+    """
+    Re-analyzes, with the local classifier, stored sentiments that are exactly
+    the neutral defaults (replies whose trailer failed to parse), then
+    rebuilds the rollups and marks the users' insights stale. Returns how
+    many were relabelled.
+    """
+    from sqlalchemy import select
+
+    import rollups
+    import insight_jobs
+    from models import Entry, Sentiment, SentimentTrigger
+
+    query = select(Sentiment.id, Entry.content, Entry.user_id)\
+        .join(Entry, Entry.id == Sentiment.entry_id)\
+        .where(Sentiment.primary_emotion == DEFAULT_SENTIMENT["emotion"],
+               Sentiment.intensity_score == DEFAULT_SENTIMENT["intensity"],
+               Sentiment.triggers == DEFAULT_SENTIMENT["triggers"])\
+        .order_by(Sentiment.id)
+    if user_id is not None:
+        query = query.where(Entry.user_id == user_id)
+    rows = db.execute(query).all()
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        for (sentiment_id, _, _), result in zip(batch, analyze([content for _, content, _ in batch])):
+            sentiment = db.get(Sentiment, sentiment_id)
+            sentiment.primary_emotion = result["emotion"]
+            sentiment.intensity_score = result["intensity"]
+            sentiment.triggers = result["triggers"]
+            sentiment.trigger_list = [SentimentTrigger(name=name) for name in rollups.split_triggers(result["triggers"])]
+        db.commit()
+    if rows:
+        insight_jobs.mark_stale(db, sorted({owner for _, _, owner in rows}))  # Committed with the rollups
+        rollups.backfill(db, user_id=user_id)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Relabel sentiments stored as the neutral defaults with the local classifier.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only relabel this user's entries.")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = relabel_defaults(db, user_id=args.user_id)
+        metrics.log_event("sentiment_relabel", sentiments=count, seconds=round(time.perf_counter() - started, 2))
+    finally:
+        db.close()
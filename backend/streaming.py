@@ -0,0 +1,89 @@
+import re
+import json
+
+SENTIMENT_MARKER = "SENTIMENT_DATA:"
+SENTIMENT_PATTERN = re.compile(r"SENTIMENT_DATA: (\{.*\})")
+
+DEFAULT_SENTIMENT = {"emotion": "Neutral", "intensity": 5.0, "triggers": "Unknown"}
+
+
+def split_sentiment_trailer(full_text):
+    """
+    Splits a model reply into (message, sentiment). If the SENTIMENT_DATA
+    block is missing or malformed the whole text is kept as the message and
+    the sentiment is None.
+    """
+    match = SENTIMENT_PATTERN.search(full_text)
+    if match:
+        try:
+            sentiment_json = json.loads(match.group(1))
+            sentiment = {
+                "emotion": sentiment_json.get("emotion", "Neutral"),
+                "intensity": float(sentiment_json.get("intensity", 5.0)),
+                "triggers": sentiment_json.get("triggers", "Unknown")
+            }
+            return full_text.split(SENTIMENT_MARKER)[0].strip(), sentiment
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return full_text, None
+
+
+def parse_sentiment_trailer(full_text):
+    """split_sentiment_trailer with the neutral defaults in place of a missing block."""
+    message, sentiment = split_sentiment_trailer(full_text)
+    return message, sentiment if sentiment is not None else dict(DEFAULT_SENTIMENT)
+
+
+class SentimentTrailerParser:
+    """
+    Incremental counterpart of parse_sentiment_trailer for streamed replies.
+    feed() returns the text that is safe to show the user right away; anything
+    that might be the start of the SENTIMENT_DATA block is held back until
+    the stream ends.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._trailer = None
+        self._emitted = []
+
+    def feed(self, chunk):
+        if self._trailer is not None:
+            self._trailer += chunk
+            return ""
+
+        self._pending += chunk
+        index = self._pending.find(SENTIMENT_MARKER)
+        if index != -1:
+            safe = self._pending[:index]
+            self._trailer = self._pending[index:]
+            self._pending = ""
+        else:
+            # Hold back the longest suffix that could still grow into the marker
+            held = 0
+            for size in range(min(len(SENTIMENT_MARKER) - 1, len(self._pending)), 0, -1):
+                if SENTIMENT_MARKER.startswith(self._pending[-size:]):
+                    held = size
+                    break
+            safe = self._pending[:len(self._pending) - held]
+            self._pending = self._pending[len(self._pending) - held:]
+
+        self._emitted.append(safe)
+        return safe
+
+    def finish(self):
+        """
+        Returns (remaining_text, message, sentiment) once the stream is over.
+        remaining_text is whatever was held back and should still be shown;
+        sentiment is None if the reply carried no usable SENTIMENT_DATA block.
+        """
+        full_text = "".join(self._emitted) + self._pending + (self._trailer or "")
+        message, sentiment = split_sentiment_trailer(full_text)
+        # A parsed trailer is dropped; an unparseable one is shown as-is, like the non-streaming path
+        remaining = "" if message != full_text else self._pending + (self._trailer or "")
+        return remaining, message, sentiment
+
+
+def sse_event(event, data):
+    """Formats one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
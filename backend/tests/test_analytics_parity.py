@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import analytics
+from benchmarks import analytics as bench
+from models import Base, Entry, Sentiment
+
+USERS = 3
+
+
+def seeded(tmp_path_factory, skip_partial_day):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('analytics') / 'parity.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    bench.seed(db, USERS, 400, 14, seed_value=15, skip_partial_day=skip_partial_day)
+    db.close()
+    return Session
+
+
+@pytest.fixture(scope="module")
+def Session(tmp_path_factory):
+    return seeded(tmp_path_factory, skip_partial_day=True)
+
+
+@pytest.mark.parametrize("user_id", range(1, USERS + 1))
+def test_insights_and_prediction_history_match_the_legacy_queries(Session, user_id):
+    # The legacy side is the original 168-hour query; the seed leaves the partial first day empty
+    db = Session()
+    try:
+        problems = bench.mismatches(
+            bench.legacy_insights(db, user_id), bench.new_insights(db, user_id),
+            bench.legacy_prediction_history(db, user_id), bench.new_prediction_history(db, user_id)
+        )
+    finally:
+        db.close()
+    assert problems == []
+
+
+def test_rollup_window_adds_exactly_the_partial_first_day(tmp_path_factory):
+    Session = seeded(tmp_path_factory, skip_partial_day=False)
+    db = Session()
+    try:
+        start, cutoff = bench.partial_day(datetime.utcnow())
+        for user_id in range(1, USERS + 1):
+            extra = db.query(Sentiment.intensity_score)\
+                .join(Entry, Sentiment.entry_id == Entry.id)\
+                .filter(Entry.user_id == user_id, Entry.created_at >= start, Entry.created_at < cutoff)\
+                .all()
+            assert extra, "the seed should put entries on the partial first day"
+            legacy = bench.legacy_insights(db, user_id)
+            summary, _ = bench.new_insights(db, user_id)
+            assert summary["count"] == legacy["count"] + len(extra)
+            total = legacy["mean"] * legacy["count"] + sum(score for score, in extra)
+            assert summary["mean"] == pytest.approx(total / summary["count"])
+    finally:
+        db.close()
+
+
+def test_user_without_entries_has_no_insights(Session):
+    db = Session()
+    try:
+        assert analytics.insights(db, USERS + 1) is None
+        assert analytics.prediction_history(db, USERS + 1) == []
+    finally:
+        db.close()
+
+
+def test_prediction_rows_are_the_latest_entries_plus_the_requested_ones(Session):
+    db = Session()
+    try:
+        rows = db.query(Entry.id, Entry.created_at, Sentiment.primary_emotion, Sentiment.intensity_score)\
+            .join(Sentiment, Entry.id == Sentiment.entry_id)\
+            .filter(Entry.user_id == 1)\
+            .order_by(Entry.created_at.asc(), Entry.id.asc())\
+            .all()
+        oldest = rows[0]
+        expected = [(created_at, emotion, intensity) for _, created_at, emotion, intensity in [oldest] + rows[-7:]]
+        assert analytics.prediction_rows(db, 1, 7, [oldest.id]) == expected
+    finally:
+        db.close()
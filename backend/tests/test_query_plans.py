@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import migrations
+from benchmarks import query_plans as bench
+from models import Base
+
+
+@pytest.fixture(scope="module")
+def Session(tmp_path_factory):
+    # An old database: data, but none of the indexes migrations 1-3 add, then upgraded
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    bench.seed(engine, 2000, 20, 60, seed_value=11)
+    migrations.upgrade(engine)
+    return sessionmaker(bind=engine)
+
+
+def test_migrations_restore_the_indexes(Session):
+    db = Session()
+    try:
+        with db.get_bind().connect() as conn:
+            names = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        db.close()
+    assert set(bench.NEW_INDEXES) <= names
+
+
+def test_per_user_queries_never_scan_the_big_tables(Session):
+    db = Session()
+    try:
+        scans = {label: bench.full_scans(bench.explain(db, query)) for label, query in bench.app_queries(db, 1)}
+    finally:
+        db.close()
+    assert {label: steps for label, steps in scans.items() if steps} == {}
@@ -0,0 +1,101 @@
+import re
+
+import pytest
+
+from safety import CRISIS_KEYWORDS, PhraseMatcher, normalize_text, safety_interceptor, scan_for_crisis
+from sentiment_engine import TriggerExtractor
+
+# The detector before the compiled matcher: one case-insensitive substring search per phrase
+LEGACY_KEYWORDS = [
+    r"hurt myself",
+    r"suicide",
+    r"kill myself",
+    r"end my life",
+    r"emergency",
+    r"overdose",
+    r"self-harm",
+    r"don't want to live",
+]
+
+
+def legacy_flags(text):
+    return any(re.search(pattern, text, re.IGNORECASE) for pattern in LEGACY_KEYWORDS)
+
+
+def variants(phrase):
+    """A legacy phrase as it turns up in real entries: inflected, run together, shouted, mid-sentence."""
+    return [
+        phrase,
+        phrase.upper(),
+        f"I think I {phrase}",
+        f"lately {phrase}ed",
+        f"{phrase}s",
+        f"{phrase}ing again",
+        f"{phrase}ff",
+        f"{phrase}eee",
+        f"about{phrase}",
+        f"({phrase})",
+        f"{phrase}!!!",
+    ]
+
+
+REGRESSIONS = [
+    "I overdosed on pills tonight",
+    "I was self-harming again",
+    "thinking about suicides",
+    "I am going to hurt myselff",
+    "end my lifeee",
+]
+
+
+@pytest.mark.parametrize("text", REGRESSIONS + [v for phrase in LEGACY_KEYWORDS for v in variants(phrase)])
+def test_flags_everything_the_legacy_detector_flagged(text):
+    assert legacy_flags(text)
+    assert safety_interceptor(text)[0], text
+
+
+@pytest.mark.parametrize("text", [
+    "I want to k1ll mys3lf",
+    "self—harm",
+    "SUICIDE!!",
+    "Quiero morir",
+    "j'ai envie de mourir",
+    "I dont want to live anymore",
+])
+def test_flags_obfuscated_and_translated_phrases(text):
+    assert scan_for_crisis(text)[0], text
+
+
+@pytest.mark.parametrize("text", [
+    "Had a calm day at work and went for a walk after dinner.",
+    "Talked to my sister about the move; feeling hopeful.",
+    "",
+])
+def test_benign_entries_pass(text):
+    assert safety_interceptor(text) == (False, None)
+
+
+def test_find_reports_canonical_phrases_once_in_order():
+    matcher = PhraseMatcher(CRISIS_KEYWORDS, word_boundaries=False)
+    assert matcher.find("Self harm, then thoughts of suicide, then self-harm again") == ["self-harm", "suicide"]
+
+
+def test_matcher_keeps_word_boundaries_unless_told_not_to():
+    assert PhraseMatcher(["son", "pain"]).find("for some reason, painting helps") == []
+    assert PhraseMatcher(["son", "pain"], word_boundaries=False).find("for some reason, painting helps") == ["son", "pain"]
+
+
+# Trigger keywords share the matcher; only the crisis check drops word boundaries
+@pytest.mark.parametrize("text", [
+    "I had a moment today",
+    "the current plan is different",
+    "for some reason",
+    "a classic lesson",
+    "painting calms me",
+])
+def test_trigger_keywords_do_not_match_inside_words(text):
+    assert TriggerExtractor().extract(text) == "Unknown"
+
+
+def test_normalize_text_folds_accents_leet_and_punctuation():
+    assert normalize_text("  Dón't   K1LL—mys3lf!! ") == "dont kill myself"
@@ -0,0 +1,39 @@
+import pytest
+
+from sentiment_engine import TRIGGER_KEYWORDS, TriggerExtractor
+
+extractor = TriggerExtractor()
+
+
+@pytest.mark.parametrize("text, triggers", [
+    ("My boss moved the deadline again.", "Work"),
+    ("Couldn't sleep, worrying about rent.", "Sleep, Money"),
+    ("We BROKE UP last night.", "Relationship"),
+    ("Mom called; my sister and dad came over after the exam.", "Family, School"),
+    ("Work was fine, but my family and my parents and my kids...", "Family, Work"),
+    ("Lonely at the office, lonely at home.", "Loneliness, Work"),
+])
+def test_extracts_the_most_mentioned_triggers(text, triggers):
+    assert extractor.extract(text) == triggers
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "A quiet walk by the river.",
+    "I had a moment today",
+    "the current plan is different",
+    "for some reason",
+    "a classic lesson",
+    "painting calms me",
+    "Homeworkers and bossanova",
+    "She was parentless in the story",
+    "The rental car broke down",
+])
+def test_words_merely_containing_a_keyword_are_not_triggers(text):
+    assert extractor.extract(text) == "Unknown"
+
+
+def test_every_keyword_names_its_trigger():
+    for name, phrases in TRIGGER_KEYWORDS.items():
+        for phrase in phrases:
+            assert extractor.extract(f"Today: {phrase}.") == name
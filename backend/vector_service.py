@@ -1,41 +1,190 @@
 import os
-import chromadb
-from chromadb.utils import embedding_functions
+import time
+from collections import defaultdict
+
+from retrieval_runtime import (get_collection, get_embedding_service, get_bm25_index, get_reranker, collection_version,
+                               embedding_stats)
+from cache import TTLCache
+from metrics import span
 
 # Configuration
-CHROMA_DB_DIR = os.path.join(os.path.dirname(__file__), "chroma_db")
-COLLECTION_NAME = "clinical_knowledge"
+RESULT_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "hybrid" (dense + BM25) or "dense"
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))  # Per retriever, before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "10"))  # Most (query, chunk) pairs scored per query
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_BATCH_SIZE = 4
+
+# Results depend on the collection, so their keys carry its version stamp.
+# Query embeddings only depend on the model and survive re-ingests.
+result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+embedding_cache = TTLCache(maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL)
+_cached_version = None
+
+
+def normalize_query(user_query):
+    """
+    Lower-cases and collapses whitespace. MiniLM's tokenizer is uncased and
+    ignores extra whitespace, so this does not change the embedding.
+    """
+    return " ".join(user_query.lower().split())
+
+
+def embed_query(user_query):
+    """
+    Returns the MiniLM embedding for a query (a NumPy vector), reusing a
+    cached one when possible. Concurrent callers share a forward pass.
+    """
+    key = normalize_query(user_query)
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_embedding_service().embed([key])[0]
+        embedding_cache.set(key, embedding)
+    return embedding
+
+
+def embed_queries(user_queries):
+    """Batch version of embed_query: all cache misses go through one forward pass."""
+    keys = [normalize_query(q) for q in user_queries]
+    embeddings = [embedding_cache.get(key) for key in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        fresh = get_embedding_service().embed([keys[i] for i in missing])
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+            embedding_cache.set(keys[i], embedding)
+    return embeddings
+
+
+def _to_contexts(ids, documents, metadatas):
+    return [
+        {"id": chunk_id, "content": doc, "source": meta.get("source", "Unknown Source")}
+        for chunk_id, doc, meta in zip(ids, documents, metadatas)
+    ]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merges ranked id lists: an id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] += 1 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def rerank(user_query, contexts, n_results):
+    """
+    Re-orders the leading candidates with the cross-encoder. Scores at most
+    RERANK_CANDIDATES pairs, in small batches, and stops once
+    RERANK_BUDGET_MS is spent; candidates it did not reach keep their fused
+    order behind the scored ones. Without a re-ranker this is a plain cut.
+    """
+    reranker = get_reranker()
+    if reranker is None or len(contexts) <= 1:
+        return contexts[:n_results]
+    candidates = contexts[:RERANK_CANDIDATES]
+    deadline = time.perf_counter() + RERANK_BUDGET_MS / 1000
+    scored = []
+    for start in range(0, len(candidates), RERANK_BATCH_SIZE):
+        batch = candidates[start:start + RERANK_BATCH_SIZE]
+        scores = reranker.predict([(user_query, c["content"]) for c in batch])
+        scored.extend(zip(scores, range(start, start + len(batch))))
+        if time.perf_counter() > deadline:
+            break
+    ranked = [contexts[i] for _, i in sorted(scored, key=lambda s: (-s[0], s[1]))]
+    return (ranked + contexts[len(scored):])[:n_results]
+
+
+def candidate_count(n_results):
+    """How many dense results to fetch: the final count, or a candidate pool when fusing or re-ranking."""
+    if RETRIEVAL_MODE == "hybrid" or get_reranker() is not None:
+        return max(n_results, RETRIEVAL_CANDIDATES)
+    return n_results
 
-# Initialize ChromaDB
-client = chromadb.PersistentClient(path=CHROMA_DB_DIR)
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
 
-collection = client.get_or_create_collection(
-    name=COLLECTION_NAME,
-    embedding_function=sentence_transformer_ef
-)
+def fuse(user_query, dense_contexts, n_results):
+    """
+    Combines the dense candidates with BM25 keyword hits through reciprocal
+    rank fusion, then re-ranks. Exact terms MiniLM blurs ("EMDR", "SSRIs")
+    still surface, so fewer chunks have to be sent to the model. Falls back
+    to dense order when the keyword index has not been built.
+    """
+    index = get_bm25_index() if RETRIEVAL_MODE == "hybrid" else None
+    if index is None:
+        return rerank(user_query, dense_contexts, n_results)
+    by_id = {c["id"]: c for c in dense_contexts}
+    keyword_hits = [chunk_id for chunk_id, _ in index.search(user_query, RETRIEVAL_CANDIDATES)]
+    for chunk_id in keyword_hits:
+        if chunk_id not in by_id:
+            by_id[chunk_id] = index.context(chunk_id)
+    fused = reciprocal_rank_fusion([[c["id"] for c in dense_contexts], keyword_hits])
+    return rerank(user_query, [by_id[chunk_id] for chunk_id in fused], n_results)
+
+
+def get_relevant_contexts(user_queries, n_results=3):
+    """
+    Batch version of get_relevant_context for bulk work such as imports: one
+    embedding pass and one Chroma query for all texts, bypassing the result
+    cache. Returns one list of contexts per query.
+    """
+    if not user_queries:
+        return []
+    results = get_collection().query(
+        query_embeddings=embed_queries(user_queries),
+        n_results=candidate_count(n_results)
+    )
+    if not results['documents']:
+        return [[] for _ in user_queries]
+    return [
+        fuse(query, _to_contexts(ids, docs, metas), n_results)
+        for query, ids, docs, metas in zip(user_queries, results['ids'], results['documents'], results['metadatas'])
+    ]
+
 
 def get_relevant_context(user_query, n_results=3):
     """
-    Searches the clinical_knowledge database and returns the top n_results 
+    Searches the clinical_knowledge database and returns the top n_results
     most relevant psychological insights.
     """
-    results = collection.query(
-        query_texts=[user_query],
-        n_results=n_results
-    )
-    
+    global _cached_version
+    version = collection_version()
+    if version != _cached_version:
+        # The collection was re-ingested; drop results computed against the old one
+        result_cache.clear()
+        _cached_version = version
+
+    key = (version, normalize_query(user_query), n_results)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return [dict(c) for c in cached]
+
+    with span("retrieval.embed"):
+        embedding = embed_query(user_query)
+    with span("retrieval.dense"):
+        results = get_collection().query(query_embeddings=[embedding], n_results=candidate_count(n_results))
+
     # Flatten the list of documents and metadatas, then return as a list of dicts
     if not results['documents'] or not results['documents'][0]:
         return []
-        
-    contexts = []
-    for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
-        contexts.append({
-            "content": doc,
-            "source": meta.get("source", "Unknown Source")
-        })
-    return contexts
+
+    with span("retrieval.fuse"):
+        contexts = fuse(user_query, _to_contexts(results['ids'][0], results['documents'][0], results['metadatas'][0]),
+                        n_results)
+    result_cache.set(key, contexts)
+    return [dict(c) for c in contexts]
+
+
+def cache_stats():
+    return {
+        "collection_version": _cached_version,
+        "results": result_cache.stats(),
+        "embeddings": embedding_cache.stats(),
+        "embedding_batches": embedding_stats()
+    }
 
 if __name__ == "__main__":
     # Test the search
@@ -5,7 +5,7 @@ import ClinicalBasis from './components/ClinicalBasis';
 import CrisisButton from './components/CrisisButton';
 import Typewriter from './components/Typewriter';
 import DeepDive from './components/DeepDive';
-import axios from 'axios';
+import { fetchDashboard } from './utils/dashboard';
 import {
     Sparkles,
     Info,
@@ -31,8 +31,8 @@ function App() {
 
     const fetchPrompts = async () => {
         try {
-            const res = await axios.get('http://127.0.0.1:8000/user/1/suggested-prompts');
-            setPrompts(res.data);
+            const dashboard = await fetchDashboard(1);
+            setPrompts(dashboard.suggested_prompts);
         } catch (err) {
             console.error("Failed to fetch prompts:", err);
         }
@@ -42,6 +42,11 @@ function App() {
         fetchPrompts();
     }, []);
 
+    const handlePartialResponse = (data) => {
+        setLastResponse(data);
+        setActiveTab('journal');
+    };
+
     const handleNewResponse = (data) => {
         setLastResponse(data);
         setActiveTab('journal'); // Switch to journal to show response
@@ -189,6 +194,7 @@ function App() {
 
                         <JournalInterface
                             onResponse={handleNewResponse}
+                            onPartialResponse={handlePartialResponse}
                             prompts={prompts}
                             refreshPrompts={fetchPrompts}
                         />
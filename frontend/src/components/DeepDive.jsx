@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { Search, BookOpen, Loader2, FileText, ChevronRight, Sparkles } from 'lucide-react';
-import axios from 'axios';
+import { streamSSE } from '../utils/sse';
 import Typewriter from './Typewriter';
 
 const DeepDive = () => {
@@ -19,9 +19,17 @@ const DeepDive = () => {
         setAnalysis(null);
 
         try {
-            const res = await axios.get(`http://127.0.0.1:8000/clinical/deep-dive?topic=${encodeURIComponent(topic)}`);
-            setAnalysis(res.data.analysis);
-            setSources(res.data.sources);
+            let streamedText = '';
+            await streamSSE(`http://127.0.0.1:8000/clinical/deep-dive/stream?topic=${encodeURIComponent(topic)}`, {}, (event, data) => {
+                if (event === 'token') {
+                    streamedText += data.text;
+                    setAnalysis(streamedText);
+                } else if (event === 'done') {
+                    setSources(data.sources);
+                } else if (event === 'error') {
+                    throw new Error(data.detail);
+                }
+            });
         } catch (err) {
             console.error("Deep dive failed:", err);
             setError("The synthesis engine encountered an error. Please try a different topic.");
@@ -1,8 +1,8 @@
 import React, { useState } from 'react';
 import { Heart, ShieldAlert, Sparkles, Send, Info } from 'lucide-react';
-import axios from 'axios';
+import { streamSSE } from '../utils/sse';
 
-const JournalInterface = ({ onResponse, prompts, refreshPrompts }) => {
+const JournalInterface = ({ onResponse, onPartialResponse, prompts, refreshPrompts }) => {
     const [entry, setEntry] = useState('');
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState(null);
@@ -20,19 +20,35 @@ const JournalInterface = ({ onResponse, prompts, refreshPrompts }) => {
                 ? `Prompt: ${selectedPrompt.prompt}\n\nReflection: ${entry}`
                 : entry;
 
-            const response = await axios.post('http://127.0.0.1:8000/journal/submit', {
-                user_id: 1,
-                content: finalContent
+            // Tokens are rendered as they arrive; sentiment and sources come with the final event
+            const timestamp = Date.now();
+            let streamedText = '';
+            let finalData = null;
+            await streamSSE('http://127.0.0.1:8000/journal/submit/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ user_id: 1, content: finalContent })
+            }, (event, data) => {
+                if (event === 'token') {
+                    streamedText += data.text;
+                    onPartialResponse({ response: streamedText, timestamp });
+                } else if (event === 'done') {
+                    // Keep the text already on screen so the typewriter does not restart
+                    finalData = { ...data, response: streamedText, timestamp };
+                } else if (event === 'crisis') {
+                    finalData = { ...data, timestamp };
+                } else if (event === 'error') {
+                    throw new Error(data.detail);
+                }
             });
-            onResponse(response.data);
+            if (!finalData) throw new Error('Stream ended before the analysis completed');
+
+            onResponse(finalData);
             setEntry('');
             setSelectedPrompt(null);
             refreshPrompts(); // Refresh prompts based on the new entry
         } catch (err) {
-            const errorMsg = err.response
-                ? `Error ${err.response.status}: ${JSON.stringify(err.response.data)}`
-                : err.message;
-            setError(`Connection issue: ${errorMsg}`);
+            setError(`Connection issue: ${err.message}`);
             console.error(err);
         } finally {
             setIsLoading(false);
@@ -3,17 +3,24 @@ import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContai
 import { TrendingUp, Smile, Calendar, Target, Activity, Download, Book, FileText } from 'lucide-react';
 import axios from 'axios';
 import { exportToPDF } from '../utils/pdfExport';
+import { downloadHistory } from '../utils/historyExport';
+import { fetchDashboard } from '../utils/dashboard';
 
 const JournalHistory = ({ refreshTrigger }) => {
     const [history, setHistory] = useState([]);
+    const [total, setTotal] = useState(0);
     const [isLoading, setIsLoading] = useState(true);
 
     useEffect(() => {
         const fetchHistory = async () => {
             try {
-                const res = await axios.get('http://127.0.0.1:8000/user/1/history');
-                if (Array.isArray(res.data)) {
-                    setHistory(res.data);
+                // Only the latest page is shown, and the AI responses are not rendered here
+                const res = await axios.get('http://127.0.0.1:8000/user/1/history', {
+                    params: { limit: 5, fields: 'id,created_at,content,sentiment', include_total: true }
+                });
+                if (Array.isArray(res.data?.items)) {
+                    setHistory(res.data.items);
+                    setTotal(res.data.total ?? res.data.items.length);
                 }
             } catch (err) {
                 console.error("Failed to fetch history:", err);
@@ -34,9 +41,18 @@ const JournalHistory = ({ refreshTrigger }) => {
                     <Book className="w-6 h-6 text-[#FFB347]" />
                     Clinical Notebook
                 </h3>
-                <span className="text-[10px] font-bold uppercase tracking-widest text-text-muted">
-                    {history.length} Saved Entries
-                </span>
+                <div className="flex items-center gap-4">
+                    <span className="text-[10px] font-bold uppercase tracking-widest text-text-muted">
+                        {total} Saved Entries
+                    </span>
+                    <button
+                        onClick={() => downloadHistory(1)}
+                        className="flex items-center gap-1 text-[10px] font-bold uppercase tracking-widest text-orange-600 hover:text-orange-700"
+                    >
+                        <Download className="w-3 h-3" />
+                        Export
+                    </button>
+                </div>
             </div>
 
             <div className="grid gap-6">
@@ -81,22 +97,8 @@ const JournalHistory = ({ refreshTrigger }) => {
     );
 };
 
-const MoodPrediction = ({ refreshTrigger }) => {
-    const [data, setData] = useState(null);
-    const [status, setStatus] = useState('loading');
-
-    useEffect(() => {
-        const fetchPrediction = async () => {
-            try {
-                const res = await axios.get('http://127.0.0.1:8000/user/1/mood-prediction');
-                setData(res.data);
-                setStatus(res.data.status);
-            } catch (err) {
-                console.error("Failed to fetch prediction:", err);
-            }
-        };
-        fetchPrediction();
-    }, [refreshTrigger]);
+const MoodPrediction = ({ data }) => {
+    const status = data ? data.status : 'loading';
 
     if (status === 'accumulating') return null;
 
@@ -159,6 +161,7 @@ const MoodPrediction = ({ refreshTrigger }) => {
 const MoodDashboard = ({ refreshTrigger }) => {
     const [data, setData] = useState([]);
     const [insights, setInsights] = useState(null);
+    const [prediction, setPrediction] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
     const [isExporting, setIsExporting] = useState(false);
 
@@ -180,14 +183,12 @@ const MoodDashboard = ({ refreshTrigger }) => {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [trendRes, insightRes] = await Promise.all([
-                    axios.get('http://127.0.0.1:8000/user/1/mood-trend'),
-                    axios.get('http://127.0.0.1:8000/user/1/insights')
-                ]);
-                if (Array.isArray(trendRes.data)) {
-                    setData(trendRes.data);
+                const dashboard = await fetchDashboard(1);
+                if (Array.isArray(dashboard.mood_trend)) {
+                    setData(dashboard.mood_trend);
                 }
-                setInsights(insightRes.data);
+                setInsights(dashboard.insights);
+                setPrediction(dashboard.mood_prediction);
             } catch (err) {
                 console.error("Failed to fetch dashboard data:", err);
             } finally {
@@ -327,7 +328,7 @@ const MoodDashboard = ({ refreshTrigger }) => {
             </div>
 
             {/* Prediction Section */}
-            <MoodPrediction refreshTrigger={refreshTrigger} />
+            <MoodPrediction data={prediction} />
 
             {/* Notebook Section */}
             <JournalHistory refreshTrigger={refreshTrigger} />
@@ -6,8 +6,11 @@ const Typewriter = ({ text, speed = 20, onComplete }) => {
     const containerRef = useRef(null);
 
     useEffect(() => {
-        setDisplayedText('');
-        setIndex(0);
+        // Streamed text only ever grows; keep typing from where we are instead of restarting
+        if (!text.startsWith(displayedText)) {
+            setDisplayedText('');
+            setIndex(0);
+        }
     }, [text]);
 
     useEffect(() => {
@@ -0,0 +1,16 @@
+import axios from 'axios';
+
+// Loads everything the dashboard and the prompt suggestions show in one
+// request. Callers that ask while a load is in flight share it. The response
+// carries an ETag with Cache-Control: no-cache, so the browser revalidates
+// its cached copy and an unchanged dashboard comes back as a bodyless 304.
+let pending = null;
+
+export const fetchDashboard = (userId = 1) => {
+    if (!pending) {
+        pending = axios.get(`http://127.0.0.1:8000/user/${userId}/dashboard`)
+            .then(res => res.data)
+            .finally(() => { pending = null; });
+    }
+    return pending;
+};
@@ -0,0 +1,21 @@
+// Downloads a user's full journal history as NDJSON. The server streams the
+// export in batches, so this works the same for ten entries or ten thousand.
+export const downloadHistory = async (userId, filename = 'journal-history.ndjson') => {
+    try {
+        const res = await fetch(`http://127.0.0.1:8000/user/${userId}/history?format=ndjson`);
+        if (!res.ok) {
+            throw new Error(`Error ${res.status}: ${await res.text()}`);
+        }
+
+        const url = URL.createObjectURL(await res.blob());
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = filename;
+        link.click();
+        URL.revokeObjectURL(url);
+        return true;
+    } catch (error) {
+        console.error('History export failed:', error);
+        return false;
+    }
+};
@@ -0,0 +1,32 @@
+// Reads a Server-Sent Events response from fetch() and calls onEvent(event, data)
+// for every frame. Used for endpoints that stream tokens as they are generated.
+export const streamSSE = async (url, options, onEvent) => {
+    const res = await fetch(url, options);
+    if (!res.ok || !res.body) {
+        throw new Error(`Error ${res.status}: ${await res.text()}`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach((line) => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+};